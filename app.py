@@ -2,8 +2,10 @@
 SSMP - Scholarship & Stipend Management Platform
 Main Application Entry Point
 """
+import os
 from flask import Flask
-from config import config
+from werkzeug.middleware.proxy_fix import ProxyFix
+from config import config, PLACEHOLDER_SECRET_KEY
 from extensions import db, login_manager, mail
 from models import User, Admin
 
@@ -15,21 +17,58 @@ def create_app(config_name='development'):
     # Load configuration
     app.config.from_object(config[config_name])
     
+    # Principals are trusted from the signed session cookie (routes/principals.py)
+    if app.config['REQUIRE_SECRET_KEY'] and app.config['SECRET_KEY'] in (None, '', PLACEHOLDER_SECRET_KEY):
+        raise RuntimeError('SECRET_KEY must be set to a random value (e.g. python -c "import secrets; print(secrets.token_hex(32))")')
+    
+    # Client address and scheme from the trusted reverse proxies
+    if app.config['TRUSTED_PROXY_HOPS']:
+        hops = app.config['TRUSTED_PROXY_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
     mail.init_app(app)
     
+    # Reports and analytics read from the replica when one is configured
+    from routes.read_replica import init_read_replica
+    init_read_replica(app)
+    
+    # Compile award rules once
+    from routes.award_policy import init_award_policy
+    init_award_policy(app)
+    
+    # Idempotency keys for approval requests
+    from routes.idempotency import init_idempotency
+    init_idempotency(app)
+    
+    # {% cache %} fragments in templates
+    from routes.fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
+    
     # User loader for Flask-Login
+    from routes.principals import cache_principal, load_cached_principal
+    
     @login_manager.user_loader
     def load_user(user_id):
+        # Served from the signed session unless expired or revoked
+        principal = load_cached_principal(user_id)
+        if principal is not None:
+            return principal
+        
         if user_id.startswith('admin_'):
             admin_id = int(user_id.replace('admin_', ''))
-            return db.session.get(Admin, admin_id)
+            user = db.session.get(Admin, admin_id)
         elif user_id.startswith('student_'):
             student_id = int(user_id.replace('student_', ''))
-            return db.session.get(User, student_id)
-        return None
+            user = db.session.get(User, student_id)
+        else:
+            return None
+        
+        if user:
+            cache_principal(user)
+        return user
     
     # Register blueprints
     from routes import auth_bp, main_bp, admin_bp, admin_scholarship_bp, admin_stipend_bp, student_bp, student_actions_bp
@@ -44,11 +83,19 @@ def create_app(config_name='development'):
     app.register_blueprint(student_actions_bp)
     app.register_blueprint(reports_bp)
     
+    # Register CLI commands
+    from routes.principals import revoke_principal_command
+    from routes.passwords import hash_passwords_command
+    from routes.budget import budget_cli
+    app.cli.add_command(revoke_principal_command)
+    app.cli.add_command(hash_passwords_command)
+    app.cli.add_command(budget_cli)
+    
     return app
 
 
-# Create the app instance
-app = create_app('development')
+# Create the app instance (FLASK_CONFIG=production under gunicorn, see gunicorn.conf.py)
+app = create_app(os.environ.get('FLASK_CONFIG', 'development'))
 
 
 if __name__ == '__main__':
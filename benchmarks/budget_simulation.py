@@ -0,0 +1,78 @@
+"""
+Budget Simulation Benchmark
+Times what-if scholarship projections for several candidate settings, row by row and vectorized,
+and the POST /admin/scholarships/simulate endpoint end to end
+
+Usage:
+    python benchmarks/budget_simulation.py [--students 50000] [--scenarios 8] [--iterations 20]
+"""
+import argparse
+from common import make_app, count_queries, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--scenarios', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app(students=args.students, departments=1)
+    statements = count_queries(app)
+
+    from extensions import db
+    from models import Department
+    from routes.roster import get_roster
+    from routes.budget_forecast import simulate_scholarships
+
+    policy = app.extensions['award_policy']
+    floors = [round(3.5 + 0.05 * i, 2) for i in range(args.scenarios)]
+    scenarios = [{'label': f'BUP Scholarship >= {floor}', 'rules': {'BUP Scholarship': {'min_gpa': floor}}}
+                 for floor in floors]
+    candidates = [(scenario['label'], policy.with_overrides(scenario['rules'])) for scenario in scenarios]
+
+    def row_by_row():
+        roster = get_roster(1)
+        budget = db.session.get(Department, 1).budget
+        students = list(zip(roster.rows(), policy.awarded_flags('scholarship', roster)))
+        for _, candidate in [('Current policy', policy)] + candidates:
+            remaining = budget
+            for student, awarded in students:
+                rule = None if awarded else candidate.evaluate(
+                    'scholarship', student.last_semester_gpa, student.last_completed_semester)
+                if rule and remaining >= rule.amount:
+                    remaining -= rule.amount
+
+    def vectorized():
+        simulate_scholarships(policy, get_roster(1), db.session.get(Department, 1).budget, candidates)
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'admin1@bup.edu.bd', 'password': 'admin'})
+
+    def endpoint():
+        response = client.post('/admin/scholarships/simulate', json={'scenarios': scenarios})
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    print(f'{args.students} students, current policy + {args.scenarios} scenarios, {args.iterations} runs per case\n')
+    print(f'{"projection":<14}{"queries":>8}{"ms/run":>10}')
+
+    with app.app_context():
+        for label, fn, iterations in (('row by row', row_by_row, 1),
+                                      ('vectorized', vectorized, args.iterations)):
+            fn()  # warm up (builds the roster snapshot)
+            statements.clear()
+            fn()
+            queries = len(statements)
+            _, ms = timed(fn, iterations)
+            print(f'{label:<14}{queries:>8}{ms:>10.2f}')
+
+    endpoint()
+    statements.clear()
+    endpoint()
+    queries = len(statements)
+    _, ms = timed(endpoint, args.iterations)
+    print(f'{"endpoint":<14}{queries:>8}{ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Cold Start Benchmark
+Time to first request and per-worker memory, with heavy libraries loaded lazily or preloaded in a forking master
+
+Each case runs in a fresh interpreter that imports app.py the way a WSGI
+server loads `app:app`, then serves GET /login and the admin dashboard
+(the first request that draws charts):
+
+    lazy       one worker process, matplotlib/openpyxl/reportlab load on first use
+    preloaded  a master imports the app and preload_heavy_modules(), then
+               forks a worker that serves the requests (gunicorn preload_app)
+
+RSS counts pages shared with the master; "private" (USS, Linux only) is
+what each extra worker really costs.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 3] [--baseline REV]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from startup import ROOT, export_revision
+
+PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, os.getcwd())
+preload = sys.argv[1] == 'preloaded'
+
+
+def memory_mb():
+    """(RSS, private) of this process in MB"""
+    values = {}
+    try:
+        with open('/proc/self/smaps_rollup') as rollup:
+            for line in rollup:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, None
+    return values.get('Rss'), values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+
+
+if preload:
+    from routes.preload import preload_heavy_modules
+    preload_heavy_modules()
+import app as module
+app = module.app
+ready_ms = (time.perf_counter() - start) * 1000
+
+# A department and its admin for the dashboard (not timed)
+from extensions import db
+from models import Admin, Department
+with app.app_context():
+    db.create_all()
+    db.session.add(Department(id=1, name='Department 1', faculty='FST', budget=1000000.0))
+    db.session.add(Admin(id=1, name='Admin 1', dept_id=1, email='admin1@bup.edu.bd', password='admin'))
+    db.session.commit()
+    db.engine.dispose()
+
+read, write = os.pipe()
+if preload and os.fork() != 0:
+    os.close(write)
+    with os.fdopen(read) as result:
+        print(result.read())
+    os.wait()
+    sys.exit(0)
+
+# The worker
+worker_start = time.perf_counter()
+client = app.test_client()
+client.get('/login')
+first_ms = (time.perf_counter() - worker_start) * 1000
+rss, private = memory_mb()
+
+client.post('/login', data={'email': 'admin1@bup.edu.bd', 'password': 'admin'})
+client.get('/dashboard')
+request_start = time.perf_counter()
+response = client.get('/admin/dashboard')
+dashboard_ms = (time.perf_counter() - request_start) * 1000
+dashboard_rss, dashboard_private = memory_mb()
+
+line = json.dumps({'ready_ms': ready_ms, 'first_ms': first_ms, 'rss': rss, 'private': private,
+                   'dashboard_status': response.status_code, 'dashboard_ms': dashboard_ms,
+                   'dashboard_rss': dashboard_rss, 'dashboard_private': dashboard_private})
+if preload:
+    with os.fdopen(write, 'w') as result:
+        result.write(line)
+    os._exit(0)
+print(line)
+'''
+
+
+def measure(tree, mode, runs):
+    """Median of each figure over runs fresh interpreters"""
+    results = []
+    for _ in range(runs):
+        env = dict(os.environ,
+                   DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ssmp-cold-'), 'cold.db'),
+                   SEND_EMAILS='False', LOGIN_RATE_LIMIT='False')
+        output = subprocess.run([sys.executable, '-c', PROBE, mode], cwd=tree, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(result[key] for result in results) if results[0][key] is not None else None
+            for key in results[0]}
+
+
+def megabytes(value):
+    return f'{value:>9.0f}' if value is not None else f'{"n/a":>9}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--baseline', help='git revision to compare with (lazy mode only), e.g. HEAD~1')
+    args = parser.parse_args()
+
+    cases = [('lazy', ROOT, 'lazy'), ('preloaded', ROOT, 'preloaded')]
+    if args.baseline:
+        cases.insert(0, (args.baseline, export_revision(args.baseline), 'lazy'))
+
+    print(f'medians of {args.runs} fresh interpreters; milliseconds and MB\n')
+    print(f'{"case":<12}{"ready":>8}{"1st req":>9}{"RSS":>9}{"private":>9}'
+          f'{"dashboard":>11}{"RSS":>9}{"private":>9}')
+    for label, tree, mode in cases:
+        result = measure(tree, mode, max(1, args.runs))
+        print(f'{label:<12}{result["ready_ms"]:>8.0f}{result["first_ms"]:>9.1f}{megabytes(result["rss"])}'
+              f'{megabytes(result["private"])}{result["dashboard_ms"]:>11.0f}{megabytes(result["dashboard_rss"])}'
+              f'{megabytes(result["dashboard_private"])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark Helpers
+Builds the app against a throwaway SQLite database seeded with synthetic students
+"""
+import os
+import random
+import secrets
+import sys
+import tempfile
+import time
+
+# Allow running as `python benchmarks/<name>.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_app(students=5000, departments=3, seed=42):
+    """Create an app on a fresh SQLite file with departments, one admin per department and synthetic students"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ssmp-bench-'), 'bench.db')
+    os.environ['SEND_EMAILS'] = 'False'
+    os.environ['LOGIN_RATE_LIMIT'] = 'False'
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+
+    from app import create_app
+    from extensions import db
+    from models import Department, Admin, User, AcademicRecord
+
+    app = create_app('production')
+    rng = random.Random(seed)
+
+    with app.app_context():
+        db.create_all()
+        for dept_id in range(1, departments + 1):
+            db.session.add(Department(id=dept_id, name=f'Department {dept_id}', faculty='FST', budget=10000000.0))
+            db.session.add(Admin(id=dept_id, name=f'Admin {dept_id}', dept_id=dept_id,
+                                 email=f'admin{dept_id}@bup.edu.bd', password='admin'))
+
+        for i in range(students):
+            student_id = 23524200000 + i
+            reg_no = 104201200000 + i
+            gpas = [round(rng.uniform(2.5, 4.0), 2) for _ in range(4)]
+            db.session.add(User(student_id=student_id, reg_no=reg_no, dept_id=i % departments + 1,
+                                name=f'STUDENT {i}', session='2022-2023',
+                                email=f'{student_id}@student.bup.edu.bd', password='admin'))
+            db.session.add(AcademicRecord(reg_no=reg_no, student_id=student_id,
+                                          cgpa=round(sum(gpas) / len(gpas), 2),
+                                          semester_1_gpa=gpas[0], semester_2_gpa=gpas[1],
+                                          semester_3_gpa=gpas[2], semester_4_gpa=gpas[3],
+                                          current_semester=5))
+        db.session.commit()
+
+    return app
+
+
+def count_queries(app):
+    """Return a list that collects every SQL statement the app's engine executes"""
+    from sqlalchemy import event
+    from extensions import db
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def timed(fn, iterations):
+    """Run fn iterations times and return (operations per second, mean milliseconds)"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed, elapsed / iterations * 1000
@@ -0,0 +1,75 @@
+"""
+Login Throughput Benchmark
+Compares the legacy three-query login lookup with the single UNION lookup
+
+Usage:
+    python benchmarks/login_throughput.py [--students 5000] [--iterations 2000]
+"""
+import argparse
+from common import make_app, count_queries, timed
+
+
+def legacy_lookup(email_or_id):
+    """The lookup auth.login used before resolve_principal: admin email, student email, student ID"""
+    from models import Admin, User
+
+    user = Admin.query.filter_by(email=email_or_id).first()
+    if not user:
+        user = User.query.filter_by(email=email_or_id).first()
+    if not user:
+        try:
+            user = User.query.filter_by(student_id=int(email_or_id)).first()
+        except ValueError:
+            pass
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app(students=args.students)
+    statements = count_queries(app)
+
+    from extensions import db
+    from routes.principals import resolve_principal
+
+    identifiers = {
+        'admin email': 'admin1@bup.edu.bd',
+        'student email': '23524200007@student.bup.edu.bd',
+        'student ID': '23524200007',
+        'unknown': 'nobody@bup.edu.bd',
+    }
+
+    print(f'{args.students} students, {args.iterations} lookups per case\n')
+    print(f'{"identifier":<15}{"lookup":<8}{"queries":>8}{"lookups/s":>12}{"ms/lookup":>11}')
+
+    with app.app_context():
+        for label, identifier in identifiers.items():
+            for name, lookup in (('legacy', legacy_lookup), ('union', resolve_principal)):
+                def run():
+                    lookup(identifier)
+                    db.session.expunge_all()
+
+                statements.clear()
+                run()
+                queries = len(statements)
+                rate, ms = timed(run, args.iterations)
+                print(f'{label:<15}{name:<8}{queries:>8}{rate:>12.0f}{ms:>11.3f}')
+
+    # End-to-end POST /login through the full request stack
+    client = app.test_client()
+    iterations = max(1, args.iterations // 4)
+
+    def login():
+        client.post('/login', data={'email': '23524200007', 'password': 'admin'})
+        client.get('/logout')
+
+    rate, ms = timed(login, iterations)
+    print(f'\nPOST /login + /logout (student ID): {rate:.0f} logins/s, {ms:.3f} ms each')
+
+
+if __name__ == '__main__':
+    main()
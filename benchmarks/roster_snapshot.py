@@ -0,0 +1,69 @@
+"""
+Roster Snapshot Benchmark
+Compares hydrating User + AcademicRecord ORM pairs with building and reusing a roster snapshot,
+and row-by-row scholarship tiers with the vectorized classifier
+
+Usage:
+    python benchmarks/roster_snapshot.py [--students 20000] [--iterations 20]
+"""
+import argparse
+from common import make_app, count_queries, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--departments', type=int, default=2)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app(students=args.students, departments=args.departments)
+    statements = count_queries(app)
+
+    from extensions import db
+    from models import AcademicRecord, User
+    from routes.roster import get_roster, load_roster
+
+    def orm_pairs():
+        pairs = db.session.query(User, AcademicRecord).join(
+            AcademicRecord, User.student_id == AcademicRecord.student_id
+        ).filter(User.dept_id == 1).all()
+        # What the eligibility scans read from every pair
+        [(record.get_last_completed_semester(), record.get_last_semester_gpa()) for _, record in pairs]
+        db.session.expunge_all()
+
+    def fresh_snapshot():
+        load_roster(1, 0)
+
+    def cached_snapshot():
+        get_roster(1)
+
+    policy = app.extensions['award_policy']
+
+    def row_tiers():
+        tiers = []
+        for student in get_roster(1).rows():
+            gpa = student.last_semester_gpa
+            tiers.append(15000 if gpa and gpa >= 3.9 else 9000 if gpa and gpa >= 3.8 else 0)
+
+    def vectorized_tiers():
+        roster = get_roster(1)
+        policy.classify('scholarship', roster.last_semester_gpa, roster.last_completed_semester)
+
+    print(f'{args.students // args.departments} students in the department, {args.iterations} runs per case\n')
+    print(f'{"source":<19}{"queries":>8}{"ms/run":>10}')
+
+    with app.app_context():
+        for label, fn in (('ORM pairs', orm_pairs), ('snapshot (build)', fresh_snapshot),
+                          ('snapshot (cached)', cached_snapshot), ('tiers row by row', row_tiers),
+                          ('tiers vectorized', vectorized_tiers)):
+            fn()  # warm up (the cached case builds here)
+            statements.clear()
+            fn()
+            queries = len(statements)
+            _, ms = timed(fn, args.iterations)
+            print(f'{label:<19}{queries:>8}{ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Startup Benchmark
+Import and route registration cost of the app, optionally against an earlier git revision
+
+Each measurement runs in a fresh interpreter. "import" is the route
+modules create_app() pulls in, "create_app" is building the app and
+registering its blueprints, and "walk" imports every module under routes/
+the way packaging, compileall or test collection touch them. The first
+run of each tree starts without bytecode (cold); the rest reuse it.
+
+Usage:
+    python benchmarks/startup.py [--runs 7] [--baseline REV]
+"""
+import argparse
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, os, pkgutil, sys, time
+sys.path.insert(0, os.getcwd())
+
+start = time.perf_counter()
+import routes, routes.reports
+import_ms = (time.perf_counter() - start) * 1000
+
+from app import create_app
+start = time.perf_counter()
+app = create_app('production')
+create_ms = (time.perf_counter() - start) * 1000
+
+rules = [(rule.rule, tuple(sorted(rule.methods))) for rule in app.url_map.iter_rules()]
+
+start = time.perf_counter()
+modules = 0
+for module in pkgutil.iter_modules(routes.__path__, 'routes.'):
+    try:
+        __import__(module.name)
+        modules += 1
+    except Exception:
+        pass
+walk_ms = (time.perf_counter() - start) * 1000
+
+source_bytes = sum(os.path.getsize(os.path.join('routes', name)) for name in os.listdir('routes') if name.endswith('.py'))
+print(json.dumps({'import_ms': import_ms, 'create_ms': create_ms, 'walk_ms': walk_ms, 'rules': len(rules),
+                  'duplicates': len(rules) - len(set(rules)), 'modules': modules, 'source_bytes': source_bytes}))
+'''
+
+
+def export_revision(revision):
+    """Extract a git revision of the project into a temporary directory"""
+    directory = tempfile.mkdtemp(prefix='ssmp-startup-')
+    archive = os.path.join(directory, 'tree.tar')
+    subprocess.run(['git', 'archive', '--format=tar', '-o', archive, revision], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tree:
+        tree.extractall(directory)
+    os.remove(archive)
+    return directory
+
+
+def measure(tree, runs):
+    """Run the probe runs times in tree; returns the cold run and the warm runs"""
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ssmp-startup-'), 'startup.db'),
+               PYTHONPYCACHEPREFIX=tempfile.mkdtemp(prefix='ssmp-pycache-'),
+               SECRET_KEY=os.environ.get('SECRET_KEY') or secrets.token_hex(32),
+               SEND_EMAILS='False')
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=tree, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results[0], results[1:]
+
+
+def report(label, cold, warm):
+    def median(key):
+        return statistics.median(result[key] for result in warm) if warm else cold[key]
+
+    print(f'{label:<12}{cold["import_ms"]:>10.0f}{median("import_ms"):>10.0f}{median("create_ms"):>12.1f}'
+          f'{median("walk_ms"):>10.1f}{cold["walk_ms"]:>11.1f}{cold["rules"]:>7}{cold["duplicates"]:>6}'
+          f'{cold["modules"]:>9}{cold["source_bytes"] / 1024:>9.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--baseline', help='git revision to compare with, e.g. HEAD~1')
+    args = parser.parse_args()
+
+    trees = [('current', ROOT)]
+    if args.baseline:
+        trees.insert(0, (args.baseline, export_revision(args.baseline)))
+
+    print(f'{args.runs} fresh interpreters per tree (milliseconds; medians of the warm runs)\n')
+    print(f'{"tree":<12}{"import":>10}{"import":>10}{"create_app":>12}{"walk":>10}{"walk":>11}'
+          f'{"rules":>7}{"dup":>6}{"modules":>9}{"KB src":>9}')
+    print(f'{"":<12}{"cold":>10}{"warm":>10}{"warm":>12}{"warm":>10}{"cold":>11}')
+    for label, tree in trees:
+        cold, warm = measure(tree, max(1, args.runs))
+        report(label, cold, warm)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Student Search Benchmark
+Times trigram index builds, lookups and typeahead suggestions for a large synthetic student body
+
+Usage:
+    python benchmarks/student_search.py [--students 100000] [--departments 10]
+"""
+import argparse
+import random
+import time
+import common  # noqa: F401 (puts the project on sys.path)
+from routes.search_index import StudentSearchIndex
+
+FIRST_NAMES = ['MD', 'ABDULLAH', 'SUMAIYA', 'TASNIM', 'FARHAN', 'NUSRAT', 'RAFIQ', 'AYESHA', 'TANVIR', 'JANNATUL',
+               'MAHMUD', 'SADIA', 'RAKIB', 'FARZANA', 'SHAHRIAR', 'NAFISA', 'IMRAN', 'TAHMINA', 'ARIF', 'MITHILA']
+LAST_NAMES = ['RAHMAN', 'HOSSAIN', 'ISLAM', 'AHMED', 'KHAN', 'CHOWDHURY', 'HASAN', 'AKTER', 'SARKER', 'KABIR',
+              'ALAM', 'SULTANA', 'UDDIN', 'HAQUE', 'MIA', 'BEGUM', 'ROY', 'DAS', 'SIDDIQUE', 'KARIM']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--departments', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rows = []
+    for i in range(args.students):
+        student_id = 23524200000 + i
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+        rows.append((student_id, i % args.departments + 1, name,
+                     f'{student_id}@student.bup.edu.bd', 104201200000 + i, '2022-2023'))
+
+    index = StudentSearchIndex()
+    start = time.perf_counter()
+    index.build(rows)
+    print(f'Built index for {len(index)} students in {time.perf_counter() - start:.2f} s\n')
+
+    queries = {
+        'prefix': 'tasn',
+        'full name': 'sumaiya rahman',
+        'typo': 'sumaya rahmn',
+        'email local part': '23524201234',
+        'no match': 'zzzz qqqq',
+    }
+    print(f'{"query":<18}{"text":<18}{"matches":>9}{"ms":>9}')
+    for label, text in queries.items():
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            ids, total = index.search(text, dept_id=1, limit=50)
+        ms = (time.perf_counter() - start) / args.repeat * 1000
+        print(f'{label:<18}{text:<18}{total:>9}{ms:>9.2f}')
+
+    # Typeahead: one request per keystroke that survives the client debounce
+    print(f'\n{"typeahead":<18}{"":<18}{"top-8":>9}{"ms":>9}')
+    for text in ('su', 'sum', 'suma', 'sumai', 'sumaiya', 'sumaiya r'):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            suggestions = index.suggest(text, dept_id=1, limit=8)
+        ms = (time.perf_counter() - start) / args.repeat * 1000
+        print(f'{"":<18}{text:<18}{len(suggestions):>9}{ms:>9.2f}')
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.upsert(23524200000 + i, 1, 'UPDATED NAME', f'{23524200000 + i}@student.bup.edu.bd', 104201200000 + i,
+                     '2022-2023')
+    print(f'\n1000 incremental updates: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
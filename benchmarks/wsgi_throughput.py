@@ -0,0 +1,140 @@
+"""
+WSGI Throughput Benchmark
+Requests per second of the Flask development server (python app.py) vs gunicorn with gunicorn.conf.py
+
+Both servers run the same app on a throwaway SQLite database and are
+driven by keep-alive HTTP clients on threads of this process, so on a
+machine with few cores the load generator competes with the server;
+compare the two rows, not the absolute numbers. Anonymous requests hit
+GET /login, logged-in ones GET /admin/students as a department admin.
+
+Usage:
+    python benchmarks/wsgi_throughput.py [--students 2000] [--clients 16] [--seconds 10] [--workers N]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from common import make_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEV_SERVER = '''
+import sys
+from app import app
+app.run(port=int(sys.argv[1]), debug=True, use_reloader=False)
+'''
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def login_cookie(port):
+    """Session cookie of a logged-in department admin"""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('POST', '/login', body='email=admin1%40bup.edu.bd&password=admin',
+                       headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def load(port, path, clients, seconds, cookie=None):
+    """Drive path from clients keep-alive connections; returns (requests/s, mean ms, errors)"""
+    headers = {'Cookie': cookie} if cookie else {}
+    counts = [0] * clients
+    errors = [0] * clients
+    latency = [0.0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[index] += 1
+                if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            latency[index] += time.perf_counter() - start
+            counts[index] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = sum(counts)
+    return total / elapsed, sum(latency) / max(total, 1) * 1000, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, help='gunicorn workers (default: gunicorn.conf.py, 2 x CPUs + 1)')
+    args = parser.parse_args()
+
+    make_app(students=args.students)
+    env = dict(os.environ, SEND_EMAILS='False', LOGIN_RATE_LIMIT='False',
+               RATE_LIMIT_STORAGE=os.path.join(os.path.dirname(os.environ['DATABASE_URL'][10:]), 'rate-limit.sqlite3'))
+
+    servers = {
+        'flask dev': lambda port: [sys.executable, '-c', DEV_SERVER, str(port)],
+        'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+                                  '--access-logfile', os.devnull, '--log-level', 'warning']
+                                 + (['--workers', str(args.workers)] if args.workers else []),
+    }
+
+    print(f'{os.cpu_count()} CPUs, {args.clients} clients, {args.seconds:g} s per case, {args.students} students\n')
+    print(f'{"server":<12}{"path":<18}{"req/s":>9}{"ms/req":>9}{"errors":>8}')
+    for name, command in servers.items():
+        port = free_port()
+        server_env = dict(env, FLASK_CONFIG='development' if name == 'flask dev' else 'production')
+        server = subprocess.Popen(command(port), cwd=ROOT, env=server_env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            cookie = login_cookie(port)
+            for path, session in (('/login', None), ('/admin/students', cookie)):
+                load(port, path, args.clients, min(2, args.seconds), session)  # warm up
+                rate, ms, errors = load(port, path, args.clients, args.seconds, session)
+                print(f'{name:<12}{path:<18}{rate:>9.0f}{ms:>9.1f}{errors:>8}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
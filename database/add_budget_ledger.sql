@@ -0,0 +1,61 @@
+-- Add the append-only budget ledger and its materialized balances, and store money as DECIMAL
+-- Run this script on databases created before budget_ledger was added to schema.sql.
+-- Existing history is carried over: one opening allocation per department (remaining budget
+-- plus everything already awarded) and one award entry per existing scholarship and stipend.
+
+USE ssmp;
+
+ALTER TABLE departments MODIFY budget DECIMAL(12, 2) NOT NULL;
+ALTER TABLE scholarships MODIFY amount DECIMAL(12, 2) NOT NULL;
+ALTER TABLE stipends MODIFY amount DECIMAL(12, 2) NOT NULL;
+
+CREATE TABLE IF NOT EXISTS budget_ledger (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    dept_id INT NOT NULL,
+    entry_type VARCHAR(20) NOT NULL,
+    award_kind VARCHAR(20),
+    student_id BIGINT,
+    semester VARCHAR(50),
+    amount DECIMAL(12, 2) NOT NULL,
+    note VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (dept_id) REFERENCES departments(id),
+    INDEX ix_budget_ledger_dept (dept_id, id),
+    CONSTRAINT ledger_entry_type_check CHECK (entry_type IN ('allocation', 'award', 'reversal'))
+);
+
+CREATE TABLE IF NOT EXISTS budget_balances (
+    dept_id INT NOT NULL,
+    semester VARCHAR(50) NOT NULL,
+    allocated DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    scholarships DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    stipends DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    reversed DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    balance DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    last_entry_id BIGINT NOT NULL DEFAULT 0,
+    materialized_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dept_id, semester),
+    FOREIGN KEY (dept_id) REFERENCES departments(id)
+);
+
+-- Opening allocations: what each department had before any of its awards
+INSERT INTO budget_ledger (dept_id, entry_type, amount, note, created_at)
+SELECT d.id, 'allocation',
+       d.budget
+       + COALESCE((SELECT SUM(sc.amount) FROM scholarships sc JOIN students s ON s.student_id = sc.student_id WHERE s.dept_id = d.id), 0)
+       + COALESCE((SELECT SUM(st.amount) FROM stipends st JOIN students s ON s.student_id = st.student_id WHERE s.dept_id = d.id), 0),
+       'Opening budget (reconstructed)', d.created_at
+FROM departments d;
+
+-- Awards made so far, in award order
+INSERT INTO budget_ledger (dept_id, entry_type, award_kind, student_id, semester, amount, note, created_at)
+SELECT s.dept_id, 'award', a.kind, a.student_id, a.semester, -a.amount, a.type, a.awarded_at
+FROM (
+    SELECT 'scholarship' AS kind, student_id, semester, amount, type, awarded_at FROM scholarships
+    UNION ALL
+    SELECT 'stipend' AS kind, student_id, semester, amount, type, awarded_at FROM stipends
+) a
+JOIN students s ON s.student_id = a.student_id
+ORDER BY a.awarded_at;
+
+-- Then build budget_balances: flask budget materialize
@@ -0,0 +1,24 @@
+-- Add idempotency keys for approve/reject requests and block double awards at the database level
+-- Run this script on databases created before idempotency_keys was added to schema.sql.
+-- The unique constraints fail if a student already holds two scholarships (or two stipends) for
+-- one semester; find those first with:
+--   SELECT student_id, semester, COUNT(*) FROM scholarships GROUP BY student_id, semester HAVING COUNT(*) > 1;
+--   SELECT student_id, semester, COUNT(*) FROM stipends GROUP BY student_id, semester HAVING COUNT(*) > 1;
+-- and withdraw the extra ones with: flask --app app budget reverse-award <kind> <id>
+
+USE ssmp;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(150) NOT NULL,
+    `key` VARCHAR(100) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,
+    status_code INT,
+    response_body TEXT,
+    created_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (scope, `key`),
+    INDEX ix_idempotency_keys_expires_at (expires_at)
+);
+
+ALTER TABLE scholarships ADD CONSTRAINT uq_scholarship_student_semester UNIQUE (student_id, semester);
+ALTER TABLE stipends ADD CONSTRAINT uq_stipend_student_semester UNIQUE (student_id, semester);
@@ -0,0 +1,10 @@
+-- Add revocation counters for session-cached logins
+-- Run this script on databases created before principal_versions was added to schema.sql
+
+USE ssmp;
+
+CREATE TABLE IF NOT EXISTS principal_versions (
+    principal_id VARCHAR(32) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,15 @@
+-- Add change counters for cached department roster snapshots
+-- Run this script on databases created before roster_versions was added to schema.sql
+
+USE ssmp;
+
+CREATE TABLE IF NOT EXISTS roster_versions (
+    dept_id INT PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (dept_id) REFERENCES departments(id)
+);
+
+-- One counter per department, so the first roster edits never race to create it
+INSERT IGNORE INTO roster_versions (dept_id, version)
+SELECT id, 0 FROM departments;
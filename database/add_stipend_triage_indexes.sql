@@ -0,0 +1,9 @@
+-- Add indexes behind the stipend triage queue (GET /admin/stipends/queue)
+-- Run this script on databases created before these indexes were added to schema.sql.
+-- Pending applications are found by status, and each applicant's most recent income
+-- record is read through (student_id, date).
+
+USE ssmp;
+
+CREATE INDEX ix_applications_status_student ON applications (status, student_id);
+CREATE INDEX ix_income_records_student_date ON income_records (student_id, date);
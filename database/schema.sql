@@ -6,7 +6,7 @@ create table if not exists departments (
     id int primary key auto_increment,
     name varchar(100) unique not null,
     faculty varchar(100) not null,
-    budget float not null,
+    budget decimal(12, 2) not null,
     created_at timestamp default current_timestamp,
     updated_at timestamp default current_timestamp on update current_timestamp,
     constraint dept_budget_check check (budget >= 0)
@@ -76,6 +76,7 @@ create table if not exists income_records (
     source varchar(255) not null,
     family_member int not null,
     date timestamp default current_timestamp,
+    index ix_income_records_student_date (student_id, date),
     foreign key (student_id) references students(student_id) on delete cascade,
     constraint income_amount_check check (amount >= 0),
     constraint family_member_check check (family_member >= 0)
@@ -90,6 +91,7 @@ create table if not exists applications (
     status varchar(100) not null,
     created_at timestamp default current_timestamp,
     updated_at timestamp default current_timestamp on update current_timestamp,
+    index ix_applications_status_student (status, student_id),
     foreign key (student_id) references students(student_id)
 );
 
@@ -99,10 +101,11 @@ create table if not exists scholarships (
     student_id bigint not null,
     student_name varchar(100) not null,
     type varchar(100) not null,
-    amount float not null,
+    amount decimal(12, 2) not null,
     semester varchar(50) not null,
     awarded_at timestamp default current_timestamp,
-    foreign key (student_id) references students(student_id)
+    foreign key (student_id) references students(student_id),
+    constraint uq_scholarship_student_semester unique (student_id, semester)
 );
 
 -- Stipend table
@@ -111,10 +114,70 @@ create table if not exists stipends (
     student_id bigint not null,
     student_name varchar(100) not null,
     type varchar(100) not null,
-    amount float not null,
+    amount decimal(12, 2) not null,
     semester varchar(50) not null,
     awarded_at timestamp default current_timestamp,
-    foreign key (student_id) references students(student_id)
+    foreign key (student_id) references students(student_id),
+    constraint uq_stipend_student_semester unique (student_id, semester)
+);
+
+-- Principal versions table (revocation counters for session-cached logins)
+create table if not exists principal_versions (
+    principal_id varchar(32) primary key,
+    version int not null default 0,
+    updated_at timestamp default current_timestamp on update current_timestamp
+);
+
+-- Roster versions table (change counters for cached department roster snapshots)
+create table if not exists roster_versions (
+    dept_id int primary key,
+    version int not null default 0,
+    updated_at timestamp default current_timestamp on update current_timestamp,
+    foreign key (dept_id) references departments(id)
+);
+
+-- Budget ledger table (append-only: allocations add, awards subtract, reversals add back)
+create table if not exists budget_ledger (
+    id bigint primary key auto_increment,
+    dept_id int not null,
+    entry_type varchar(20) not null,
+    award_kind varchar(20),
+    student_id bigint,
+    semester varchar(50),
+    amount decimal(12, 2) not null,
+    note varchar(255),
+    created_at timestamp default current_timestamp,
+    foreign key (dept_id) references departments(id),
+    index ix_budget_ledger_dept (dept_id, id),
+    constraint ledger_entry_type_check check (entry_type in ('allocation', 'award', 'reversal'))
+);
+
+-- Budget balances table (ledger totals per department and semester, rebuilt from budget_ledger)
+create table if not exists budget_balances (
+    dept_id int not null,
+    semester varchar(50) not null,
+    allocated decimal(12, 2) not null default 0,
+    scholarships decimal(12, 2) not null default 0,
+    stipends decimal(12, 2) not null default 0,
+    reversed decimal(12, 2) not null default 0,
+    balance decimal(12, 2) not null default 0,
+    last_entry_id bigint not null default 0,
+    materialized_at timestamp default current_timestamp,
+    primary key (dept_id, semester),
+    foreign key (dept_id) references departments(id)
+);
+
+-- Idempotency keys table (stored results of approve/reject requests, replayed on retries)
+create table if not exists idempotency_keys (
+    scope varchar(150) not null,
+    `key` varchar(100) not null,
+    fingerprint varchar(64) not null,
+    status_code int,
+    response_body text,
+    created_at datetime not null,
+    expires_at datetime not null,
+    primary key (scope, `key`),
+    index ix_idempotency_keys_expires_at (expires_at)
 );
 
 insert into departments (id, name, faculty, budget) values
@@ -122,6 +185,14 @@ insert into departments (id, name, faculty, budget) values
 (2, 'Information and Communication Technology', 'FST', 200000.00),
 (3, 'Environmental Science', 'FST', 200000.00);
 
+insert into budget_ledger (dept_id, entry_type, amount, note) values
+(1, 'allocation', 200000.00, 'Opening budget'),
+(2, 'allocation', 200000.00, 'Opening budget'),
+(3, 'allocation', 200000.00, 'Opening budget');
+
+insert into roster_versions (dept_id, version)
+select id, 0 from departments;
+
 insert into students (student_id, reg_no, dept_id, name, session, email, password) values
 (2252421061,104201220061,1, 'LUTFUL AHMED NADIM', '2021-2022', '2252421061@student.bup.edu.bd', 'admin'),
 (2252421086,104201220086,1, 'MAINUL HASSAN ASIF', '2021-2022', '2252421086@student.bup.edu.bd', 'admin'),
@@ -2,11 +2,35 @@
 Flask Extensions
 Initialize extensions here to avoid circular imports
 """
+from flask import current_app, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import LoginManager
 from flask_mail import Mail
 
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs made inside replica_reads() to the read
+    replica when one is configured and fresh enough (routes/read_replica.py);
+    other reads use the primary. Flushes and DML inside replica_reads()
+    raise: what they would write may come from the replica's lagging data.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica_reads = has_app_context() and g.get('_replica_reads')
+        if replica_reads and (self._flushing or getattr(clause, 'is_dml', False)):
+            raise RuntimeError('Database write inside replica_reads(); read-only views must not write')
+        if bind is None and replica_reads and (clause is None or getattr(clause, 'is_select', False)):
+            replica = current_app.extensions.get('read_replica')
+            engine = replica.engine_for_reads() if replica is not None else None
+            if engine is not None:
+                g._replica_used = True
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 mail = Mail()
@@ -0,0 +1,64 @@
+"""
+Gunicorn Configuration
+Production server for app:app - run `gunicorn` from the project root (this file is picked up automatically)
+with SECRET_KEY set in the environment or .env; the app refuses to load without it
+
+Every setting can be overridden with the usual gunicorn flags or
+GUNICORN_CMD_ARGS. Reloading:
+    kill -HUP <master>     restart workers gracefully (config changes; code stays preloaded)
+    kill -USR2 <master>    start a new master with new code, then
+    kill -WINCH <old>      stop the old workers and kill -TERM <old> the old master
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Production settings unless FLASK_CONFIG says otherwise
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+# Writable matplotlib cache, so the font list is built once instead of in every new worker
+os.environ.setdefault('MPLCONFIGDIR', os.path.join(tempfile.gettempdir(), 'ssmp-matplotlib'))
+
+wsgi_app = 'app:app'
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# Processes for CPU work (charts, roster math), threads to overlap MySQL and SMTP waits
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Load the app once in the master; workers fork from it and share its memory copy-on-write
+preload_app = True
+
+timeout = 60  # seconds; exports and first chart renders can take a few
+graceful_timeout = 30  # seconds in-flight requests get to finish on reload or shutdown
+keepalive = 5
+
+# Recycle workers now and then (staggered), cheap since they fork from the preloaded master
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Master, app loaded, before the first fork: import the chart and export libraries once"""
+    from routes.preload import preload_heavy_modules
+    preload_heavy_modules()
+
+
+def post_fork(server, worker):
+    """New worker: drop database connections (primary and replica) inherited from the master and open its own pool"""
+    from extensions import db
+
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+        try:
+            connections = [db.engine.connect() for _ in range(min(threads, getattr(db.engine.pool, 'size', lambda: 1)()))]
+            for connection in connections:
+                connection.close()
+        except Exception as e:
+            worker.log.warning(f"Could not pre-open database connections: {str(e)}")
@@ -12,7 +12,7 @@ class Department(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     faculty = db.Column(db.String(100), nullable=False)
-    budget = db.Column(db.Float, nullable=False)
+    budget = db.Column(db.Numeric(12, 2), nullable=False)  # spendable balance; history is in budget_ledger
     created_at = db.Column(db.TIMESTAMP)
     updated_at = db.Column(db.TIMESTAMP)
     
@@ -121,12 +121,13 @@ class AcademicRecord(db.Model):
 class Scholarship(db.Model):
     """Scholarship Model"""
     __tablename__ = 'scholarships'
+    __table_args__ = (db.UniqueConstraint('student_id', 'semester', name='uq_scholarship_student_semester'),)
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     student_id = db.Column(db.BigInteger, nullable=False)
     student_name = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
     semester = db.Column(db.String(50), nullable=False)
     awarded_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
     
@@ -137,12 +138,13 @@ class Scholarship(db.Model):
 class Stipend(db.Model):
     """Stipend Model"""
     __tablename__ = 'stipends'
+    __table_args__ = (db.UniqueConstraint('student_id', 'semester', name='uq_stipend_student_semester'),)
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     student_id = db.Column(db.BigInteger, nullable=False)
     student_name = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)
     semester = db.Column(db.String(50), nullable=False)
     awarded_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
     
@@ -153,6 +155,7 @@ class Stipend(db.Model):
 class IncomeRecord(db.Model):
     """Income Record Model"""
     __tablename__ = 'income_records'
+    __table_args__ = (db.Index('ix_income_records_student_date', 'student_id', 'date'),)
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     student_id = db.Column(db.BigInteger, nullable=False)
@@ -168,6 +171,7 @@ class IncomeRecord(db.Model):
 class Application(db.Model):
     """Application Model"""
     __tablename__ = 'applications'
+    __table_args__ = (db.Index('ix_applications_status_student', 'status', 'student_id'),)
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     student_id = db.Column(db.BigInteger, nullable=False)
@@ -179,3 +183,80 @@ class Application(db.Model):
     
     def __repr__(self):
         return f'<Application {self.student_id} - {self.type} - {self.status}>'
+
+
+class PrincipalVersion(db.Model):
+    """Principal Version Model - revocation counters for session-cached logins"""
+    __tablename__ = 'principal_versions'
+    
+    principal_id = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<PrincipalVersion {self.principal_id} - {self.version}>'
+
+
+class RosterVersion(db.Model):
+    """Roster Version Model - per-department change counters for cached roster snapshots"""
+    __tablename__ = 'roster_versions'
+    
+    dept_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<RosterVersion {self.dept_id} - {self.version}>'
+
+
+class BudgetEntry(db.Model):
+    """Budget Ledger Model - append-only money movements of a department budget"""
+    __tablename__ = 'budget_ledger'
+    __table_args__ = (db.Index('ix_budget_ledger_dept', 'dept_id', 'id'),)
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    dept_id = db.Column(db.Integer, nullable=False)
+    entry_type = db.Column(db.String(20), nullable=False)  # 'allocation', 'award' or 'reversal'
+    award_kind = db.Column(db.String(20), nullable=True)  # 'scholarship' or 'stipend' for awards and reversals
+    student_id = db.Column(db.BigInteger, nullable=True)
+    semester = db.Column(db.String(50), nullable=True)
+    amount = db.Column(db.Numeric(12, 2), nullable=False)  # signed: allocations and reversals add, awards subtract
+    note = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<BudgetEntry {self.dept_id} - {self.entry_type} {self.amount}>'
+
+
+class BudgetBalance(db.Model):
+    """Budget Balance Model - ledger totals per department and semester, materialized from budget_ledger"""
+    __tablename__ = 'budget_balances'
+    
+    dept_id = db.Column(db.Integer, primary_key=True)
+    semester = db.Column(db.String(50), primary_key=True)  # '' for entries without a semester (allocations)
+    allocated = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    scholarships = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # net of reversals
+    stipends = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # net of reversals
+    reversed = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    balance = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    last_entry_id = db.Column(db.BigInteger, nullable=False, default=0)
+    materialized_at = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<BudgetBalance {self.dept_id} {self.semester!r} - {self.balance}>'
+
+
+class IdempotencyKey(db.Model):
+    """Idempotency Key Model - stored results of approval requests, replayed when a client retries with the same key"""
+    __tablename__ = 'idempotency_keys'
+    
+    scope = db.Column(db.String(150), primary_key=True)  # principal ID and endpoint
+    key = db.Column(db.String(100), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = db.Column(db.Integer, nullable=True)  # None while the first request is still running
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope} {self.key} - {self.status_code}>'
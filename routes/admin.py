@@ -2,11 +2,15 @@
 Admin Routes
 Handles admin dashboard and student management
 """
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+import hashlib
+import time
+from flask import Blueprint, current_app, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
-from models import AcademicRecord, Admin, User, Department, Scholarship, Stipend
+from models import AcademicRecord, Admin, User, Department
 from extensions import db
 from routes.analytics import get_admin_dashboard_data
+from routes.gpa_charts import gpa_series, schedule_charts
+from routes.student_search import paginate_students, suggest_students, suggestion_version
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -42,33 +46,69 @@ def students():
         flash('Access denied. Admin privileges required.', 'danger')
         return redirect(url_for('main.dashboard'))
     
-    # Get search query
+    # Get search query and page position
     search_query = request.args.get('search', '').strip()
-    
-    # Base query for students in admin's department
-    students_query = User.query.filter_by(dept_id=current_user.dept_id)
-    
-    # Apply search filter if provided
-    if search_query:
-        students_query = students_query.filter(
-            db.or_(
-                User.name.ilike(f'%{search_query}%'),
-                User.email.ilike(f'%{search_query}%'),
-                User.student_id.like(f'%{search_query}%'),
-                User.reg_no.like(f'%{search_query}%'),
-                User.session.ilike(f'%{search_query}%')
-            )
-        )
-    
-    # Execute query
-    students = students_query.all()
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    per_page = request.args.get('per_page', type=int)
+    start = request.args.get('start', 0, type=int)
+    count_mode = request.args.get('count')
+    if count_mode not in ('exact', 'estimate', 'none'):
+        count_mode = None
+    
+    # One page of students in admin's department, ordered by student ID
+    page = paginate_students(current_user.dept_id, search_query,
+                             after=after, before=before, per_page=per_page, count_mode=count_mode, start=start)
     
     return render_template('admin_students.html',
                          admin=current_user,
-                         students=students,
+                         students=page['students'],
+                         page=page,
                          search_query=search_query)
 
 
+@admin_bp.route('/api/students/suggest')
+@login_required
+def suggest():
+    """Typeahead for the students search box - top matches (id, name, session) as JSON"""
+    # Check if user is admin
+    if not isinstance(current_user, Admin):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    started = time.perf_counter()
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', current_app.config['SUGGEST_LIMIT'], type=int)
+    limit = max(1, min(limit, current_app.config['SUGGEST_MAX_LIMIT']))
+    
+    # Index-backed answers can be revalidated without running the search
+    version = suggestion_version()
+    etag = None
+    if version is not None:
+        key = f'{version}|{current_user.dept_id}|{limit}|{query.lower()}'
+        etag = hashlib.sha1(key.encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.max_age = current_app.config['SUGGEST_MAX_AGE']
+            return response
+    
+    response = jsonify({
+        'success': True,
+        'query': query,
+        'students': suggest_students(current_user.dept_id, query, limit)
+    })
+    if etag:
+        response.set_etag(etag)
+    else:
+        response.add_etag()
+    response = response.make_conditional(request)
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['SUGGEST_MAX_AGE']
+    response.headers['Server-Timing'] = f'suggest;dur={(time.perf_counter() - started) * 1000:.1f}'
+    return response
+
+
 @admin_bp.route('/student/<student_id>')
 @login_required
 def view_student(student_id):
@@ -154,6 +194,9 @@ def update_academic_record(student_id):
         
         db.session.commit()
         
+        # Render the student's new charts in the background before they next open /academics
+        schedule_charts(gpa_series(academic_record))
+        
         return jsonify({
             'success': True,
             'message': 'Academic record updated successfully',
@@ -166,49 +209,3 @@ def update_academic_record(student_id):
             'success': False,
             'message': f'Error updating academic record: {str(e)}'
         }), 400
-
-
-@admin_bp.route('/scholarships/view')
-@login_required
-def view_scholarships():
-    """Admin view scholarships page - displays all awarded scholarships"""
-    # Check if user is admin
-    if not isinstance(current_user, Admin):
-        flash('Access denied. Admin privileges required.', 'danger')
-        return redirect(url_for('main.dashboard'))
-    
-    # Get department info
-    department = current_user.get_department()
-    
-    # Get all awarded scholarships for students in this department
-    scholarships = db.session.query(Scholarship, User).join(
-        User, Scholarship.student_id == User.student_id
-    ).filter(User.dept_id == current_user.dept_id).order_by(Scholarship.awarded_at.desc()).all()
-    
-    return render_template('admin_scholarships_view.html',
-                         admin=current_user,
-                         department=department,
-                         scholarships=scholarships)
-
-
-@admin_bp.route('/stipends/view')
-@login_required
-def view_stipends():
-    """Admin view stipends page - displays all awarded stipends"""
-    # Check if user is admin
-    if not isinstance(current_user, Admin):
-        flash('Access denied. Admin privileges required.', 'danger')
-        return redirect(url_for('main.dashboard'))
-    
-    # Get department info
-    department = current_user.get_department()
-    
-    # Get all awarded stipends for students in this department
-    stipends = db.session.query(Stipend, User).join(
-        User, Stipend.student_id == User.student_id
-    ).filter(User.dept_id == current_user.dept_id).order_by(Stipend.awarded_at.desc()).all()
-    
-    return render_template('admin_stipends_view.html',
-                         admin=current_user,
-                         department=department,
-                         stipends=stipends)
@@ -2,15 +2,35 @@
 Admin Scholarship Routes
 Handles scholarship management and approval
 """
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+import time
+import numpy as np
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from models import AcademicRecord, Admin, User, Department, Scholarship
 from extensions import db
-from routes.email_utils import send_scholarship_approval_email
+from routes.email_utils import send_scholarship_approval_email, queue_email
+from routes.roster import get_roster
+from routes.eligibility import NO_TIER
+from routes.award_policy import get_award_policy
+from routes.budget_forecast import simulate_scholarships
+from routes.budget import debit, debit_in_order, record_award, retry_on_conflict
+from routes.idempotency import idempotent
+from routes.conditional import conditional, department_awards_version, department_version
 
 admin_scholarship_bp = Blueprint('admin_scholarship', __name__, url_prefix='/admin')
 
 
+def classify_roster_scholarships(roster):
+    """
+    Scholarship tier and amount for every student on a roster snapshot
+
+    Based on the LAST COMPLETED semester GPA; students without a completed
+    semester or already holding an excluding award for it get NO_TIER.
+    """
+    policy = get_award_policy()
+    return policy.classify('scholarship', roster.last_semester_gpa, roster.last_completed_semester,
+                           awarded=policy.awarded_flags('scholarship', roster))
+
 
 @admin_scholarship_bp.route('/scholarships')
 @login_required
@@ -24,61 +44,37 @@ def admin_scholarships():
     # Get department info
     department = current_user.get_department()
     
-    # Get all students from admin's department with their academic records
-    students = db.session.query(User, AcademicRecord).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == current_user.dept_id).all()
-    
-    # Filter eligible students and calculate scholarship amounts based on LAST COMPLETED semester
-    eligible_students = []
-    total_scholarship_amount = 0
+    # The table is rebuilt by the template only when its cached fragment for this version is missing
+    table_version = department_version(current_user.dept_id, ('scholarship', 'stipend'))
+    dept_id = current_user.dept_id
     
-    for student, academic_record in students:
-        scholarship_type = None
-        scholarship_amount = 0
-        last_semester_gpa = academic_record.get_last_semester_gpa()
-        last_completed_semester = academic_record.get_last_completed_semester()
-        
-        # Skip if no completed semester yet
-        if last_completed_semester <= 0:
-            continue
+    def load_eligible_students():
+        """(eligible students by last semester GPA, highest first; total amount)"""
+        # Classify the whole department roster at once
+        roster = get_roster(dept_id)
+        tiers, amounts = classify_roster_scholarships(roster)
         
-        # Check eligibility based on LAST COMPLETED semester GPA
-        if last_semester_gpa and last_semester_gpa >= 3.9:
-            scholarship_type = "Chancellor Scholarship"
-            scholarship_amount = 15000
-        elif last_semester_gpa and last_semester_gpa >= 3.8:
-            scholarship_type = "BUP Scholarship"
-            scholarship_amount = 9000
+        eligible = np.flatnonzero(tiers != NO_TIER)
+        eligible = eligible[np.argsort(-roster.last_semester_gpa[eligible], kind='stable')]
         
-        # Only add if eligible
-        if scholarship_type:
-            # Check if already awarded for the last completed semester
-            semester_name = f"Semester {last_completed_semester}"
-            existing_scholarship = Scholarship.query.filter_by(
-                student_id=student.student_id,
-                semester=semester_name
-            ).first()
-            
-            if not existing_scholarship:
-                eligible_students.append({
-                    'student': student,
-                    'academic_record': academic_record,
-                    'scholarship_type': scholarship_type,
-                    'scholarship_amount': scholarship_amount,
-                    'last_semester_gpa': last_semester_gpa,
-                    'last_completed_semester': last_completed_semester
-                })
-                total_scholarship_amount += scholarship_amount
-    
-    # Sort eligible students by last semester GPA in descending order (highest first)
-    eligible_students.sort(key=lambda x: x['last_semester_gpa'] or 0, reverse=True)
+        eligible_students = []
+        for i in eligible:
+            student = roster.row(i)
+            eligible_students.append({
+                'student': student,
+                'academic_record': student,
+                'scholarship_type': get_award_policy().tier_type('scholarship', tiers[i]),
+                'scholarship_amount': int(amounts[i]),
+                'last_semester_gpa': student.last_semester_gpa,
+                'last_completed_semester': student.last_completed_semester
+            })
+        return eligible_students, int(amounts.sum())
     
     return render_template('admin_scholarships.html',
                          admin=current_user,
                          department=department,
-                         eligible_students=eligible_students,
-                         total_scholarship_amount=total_scholarship_amount)
+                         load_eligible_students=load_eligible_students,
+                         table_version=table_version)
 
 
 @admin_scholarship_bp.route('/scholarship/<student_id>')
@@ -118,12 +114,10 @@ def admin_view_scholarship(student_id):
     if academic_record:
         last_semester_gpa = academic_record.get_last_semester_gpa()
         last_completed_semester = academic_record.get_last_completed_semester()
-        if last_semester_gpa and last_semester_gpa >= 3.9:
-            scholarship_type = "Chancellor Scholarship"
-            scholarship_amount = 15000
-        elif last_semester_gpa and last_semester_gpa >= 3.8:
-            scholarship_type = "BUP Scholarship"
-            scholarship_amount = 9000
+        rule = get_award_policy().evaluate('scholarship', last_semester_gpa, last_completed_semester)
+        if rule:
+            scholarship_type = rule.type
+            scholarship_amount = rule.amount
     
     return render_template('admin_scholarship_detail.html',
                          admin=current_user,
@@ -138,6 +132,8 @@ def admin_view_scholarship(student_id):
 
 @admin_scholarship_bp.route('/scholarship/approve/<student_id>', methods=['POST'])
 @login_required
+@idempotent
+@retry_on_conflict
 def approve_scholarship(student_id):
     """Approve scholarship for a student"""
     # Check if user is admin
@@ -160,36 +156,27 @@ def approve_scholarship(student_id):
         return jsonify({'success': False, 'message': 'Academic record not found'}), 404
     
     # Calculate scholarship based on LAST COMPLETED semester
-    scholarship_type = None
-    scholarship_amount = 0
+    policy = get_award_policy()
     last_semester_gpa = academic_record.get_last_semester_gpa()
     last_completed_semester = academic_record.get_last_completed_semester()
     
     if last_completed_semester <= 0:
         return jsonify({'success': False, 'message': 'Student has no completed semester'}), 400
     
-    if last_semester_gpa and last_semester_gpa >= 3.9:
-        scholarship_type = "Chancellor Scholarship"
-        scholarship_amount = 15000
-    elif last_semester_gpa and last_semester_gpa >= 3.8:
-        scholarship_type = "BUP Scholarship"
-        scholarship_amount = 9000
-    else:
+    rule = policy.evaluate('scholarship', last_semester_gpa, last_completed_semester)
+    if not rule:
         return jsonify({'success': False, 'message': 'Student not eligible'}), 400
+    scholarship_type = rule.type
+    scholarship_amount = rule.amount
     
     # Check if already awarded for last completed semester
     semester_name = f"Semester {last_completed_semester}"
-    existing_scholarship = Scholarship.query.filter_by(
-        student_id=student_id,
-        semester=semester_name
-    ).first()
-    
-    if existing_scholarship:
-        return jsonify({'success': False, 'message': 'Scholarship already awarded'}), 400
+    if policy.has_blocking_award('scholarship', student_id, semester_name):
+        return jsonify({'success': False, 'message': 'An award has already been made for this semester'}), 400
     
-    # Check department budget
-    department = current_user.get_department()
-    if department.budget < scholarship_amount:
+    # Take the amount from the department budget if it still covers it (atomic check-and-debit)
+    if not debit(current_user.dept_id, scholarship_amount):
+        db.session.rollback()
         return jsonify({'success': False, 'message': 'Insufficient department budget'}), 400
     
     # Create scholarship
@@ -201,121 +188,78 @@ def approve_scholarship(student_id):
         semester=semester_name
     )
     
-    # Update department budget
-    department.budget -= scholarship_amount
-    
     db.session.add(scholarship)
+    record_award(current_user.dept_id, 'scholarship', scholarship)
     db.session.commit()
     
-    # Send email notification
-    try:
-        send_scholarship_approval_email(
-            student.email,
-            student.name,
-            scholarship_type,
-            scholarship_amount,
-            semester_name
-        )
-    except Exception as e:
-        print(f"Failed to send email to {student.email}: {str(e)}")
+    # Email the student in the background; the response does not wait for SMTP
+    queue_email(send_scholarship_approval_email,
+                student.email, student.name, scholarship_type, scholarship_amount, semester_name)
     
     return jsonify({
         'success': True,
         'message': 'Scholarship approved successfully',
-        'remaining_budget': department.budget
+        'remaining_budget': float(current_user.get_department().budget)
     })
 
 
 @admin_scholarship_bp.route('/scholarship/approve-all', methods=['POST'])
 @login_required
+@idempotent
+@retry_on_conflict
 def approve_all_scholarships():
     """Approve all eligible scholarships"""
     # Check if user is admin
     if not isinstance(current_user, Admin):
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
-    # Get department info
-    department = current_user.get_department()
-    
-    # Get all students from admin's department with their academic records
-    students = db.session.query(User, AcademicRecord).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == current_user.dept_id).all()
+    # Classify the whole department roster at once
+    roster = get_roster(current_user.dept_id)
+    tiers, amounts = classify_roster_scholarships(roster)
     
-    approved_count = 0
-    total_amount = 0
+    # Lock the budget row only now and pay awards in roster order while it lasts
+    paid = debit_in_order(current_user.dept_id, amounts)
     
-    for student, academic_record in students:
-        scholarship_type = None
-        scholarship_amount = 0
-        last_semester_gpa = academic_record.get_last_semester_gpa()
-        last_completed_semester = academic_record.get_last_completed_semester()
+    approved = []
+    for i in np.flatnonzero(paid):
+        student = roster.row(i)
+        scholarship_type = get_award_policy().tier_type('scholarship', tiers[i])
+        scholarship_amount = int(amounts[i])
+        semester_name = f"Semester {student.last_completed_semester}"
         
-        # Skip if no completed semester
-        if last_completed_semester <= 0:
-            continue
-        
-        # Check eligibility based on LAST COMPLETED semester GPA
-        if last_semester_gpa and last_semester_gpa >= 3.9:
-            scholarship_type = "Chancellor Scholarship"
-            scholarship_amount = 15000
-        elif last_semester_gpa and last_semester_gpa >= 3.8:
-            scholarship_type = "BUP Scholarship"
-            scholarship_amount = 9000
-        
-        # Only process if eligible
-        if scholarship_type:
-            # Check if already awarded for the last completed semester
-            semester_name = f"Semester {last_completed_semester}"
-            existing_scholarship = Scholarship.query.filter_by(
-                student_id=student.student_id,
-                semester=semester_name
-            ).first()
-            
-            if not existing_scholarship:
-                # Check if we have enough budget
-                if department.budget >= scholarship_amount:
-                    # Create scholarship
-                    scholarship = Scholarship(
-                        student_id=student.student_id,
-                        student_name=student.name,
-                        type=scholarship_type,
-                        amount=scholarship_amount,
-                        semester=semester_name
-                    )
-                    
-                    # Update department budget
-                    department.budget -= scholarship_amount
-                    total_amount += scholarship_amount
-                    
-                    db.session.add(scholarship)
-                    approved_count += 1
-                    
-                    # Send email notification
-                    try:
-                        send_scholarship_approval_email(
-                            student.email,
-                            student.name,
-                            scholarship_type,
-                            scholarship_amount,
-                            semester_name
-                        )
-                    except Exception as e:
-                        print(f"Failed to send email to {student.email}: {str(e)}")
+        # Create scholarship
+        scholarship = Scholarship(
+            student_id=student.student_id,
+            student_name=student.name,
+            type=scholarship_type,
+            amount=scholarship_amount,
+            semester=semester_name
+        )
+        db.session.add(scholarship)
+        record_award(current_user.dept_id, 'scholarship', scholarship)
+        approved.append((student, scholarship_type, scholarship_amount, semester_name))
     
     db.session.commit()
     
+    # Email the students in the background once the budget row is released
+    for student, scholarship_type, scholarship_amount, semester_name in approved:
+        queue_email(send_scholarship_approval_email,
+                    student.email, student.name, scholarship_type, scholarship_amount, semester_name)
+    
+    approved_count = len(approved)
     return jsonify({
         'success': True,
         'message': f'{approved_count} scholarships approved successfully',
         'approved_count': approved_count,
-        'total_amount': total_amount,
-        'remaining_budget': department.budget
+        'total_amount': int(amounts[paid].sum()),
+        'remaining_budget': float(current_user.get_department().budget)
     })
 
 
 @admin_scholarship_bp.route('/scholarship/approve-multiple', methods=['POST'])
 @login_required
+@idempotent
+@retry_on_conflict
 def approve_multiple_scholarships():
     """Approve multiple selected scholarships"""
     # Check if user is admin
@@ -329,94 +273,96 @@ def approve_multiple_scholarships():
     if not student_ids:
         return jsonify({'success': False, 'message': 'No students selected'}), 400
     
-    # Get department info
-    department = current_user.get_department()
-    
-    approved_count = 0
-    total_amount = 0
-    failed_students = []
+    # Classify the department roster once (GPA rules alone, so each failure gets its reason)
+    policy = get_award_policy()
+    roster = get_roster(current_user.dept_id)
+    tiers, amounts = policy.classify('scholarship', roster.last_semester_gpa, roster.last_completed_semester)
+    awarded = policy.awarded_flags('scholarship', roster)
     
+    selected = []
     for student_id in student_ids:
-        # Get student
-        student = User.query.filter_by(student_id=student_id).first()
-        
-        if not student or student.dept_id != current_user.dept_id:
-            failed_students.append(f"Student {student_id}: Not found or wrong department")
-            continue
-        
-        # Get academic record
-        academic_record = AcademicRecord.query.filter_by(student_id=student_id).first()
-        
-        if not academic_record:
-            failed_students.append(f"Student {student_id}: No academic record")
+        try:
+            selected.append(int(student_id))
+        except (TypeError, ValueError):
+            selected.append(-1)
+    positions = roster.positions(selected)
+    
+    # Department students without an academic record are not on the roster
+    missing = [student_id for student_id, position in zip(selected, positions) if position < 0]
+    in_department = {student_id for student_id, in db.session.query(User.student_id).filter(
+        User.dept_id == current_user.dept_id, User.student_id.in_(missing)
+    )} if missing else set()
+    
+    # Per requested ID: a failure reason, or the position of its award in `candidates`
+    outcomes = []
+    candidates = []
+    approved_ids = set()
+    
+    for student_id, selected_id, position in zip(student_ids, selected, positions):
+        if position < 0:
+            if selected_id in in_department:
+                outcomes.append("No academic record")
+            else:
+                outcomes.append("Not found or wrong department")
             continue
         
         # Calculate scholarship based on LAST COMPLETED semester
-        scholarship_type = None
-        scholarship_amount = 0
-        last_semester_gpa = academic_record.get_last_semester_gpa()
-        last_completed_semester = academic_record.get_last_completed_semester()
+        student = roster.row(position)
         
-        if last_completed_semester <= 0:
-            failed_students.append(f"Student {student_id}: No completed semester")
+        if student.last_completed_semester <= 0:
+            outcomes.append("No completed semester")
             continue
         
-        if last_semester_gpa and last_semester_gpa >= 3.9:
-            scholarship_type = "Chancellor Scholarship"
-            scholarship_amount = 15000
-        elif last_semester_gpa and last_semester_gpa >= 3.8:
-            scholarship_type = "BUP Scholarship"
-            scholarship_amount = 9000
-        else:
-            failed_students.append(f"Student {student_id}: Not eligible")
+        if tiers[position] == NO_TIER:
+            outcomes.append("Not eligible")
             continue
+        scholarship_type = policy.tier_type('scholarship', tiers[position])
+        scholarship_amount = int(amounts[position])
         
-        # Check if already awarded for last completed semester
-        semester_name = f"Semester {last_completed_semester}"
-        existing_scholarship = Scholarship.query.filter_by(
-            student_id=student_id,
-            semester=semester_name
-        ).first()
-        
-        if existing_scholarship:
-            failed_students.append(f"Student {student_id}: Already awarded")
+        # Check if already awarded for last completed semester (or earlier in this request)
+        semester_name = f"Semester {student.last_completed_semester}"
+        if awarded[position] or selected_id in approved_ids:
+            outcomes.append("Already awarded")
             continue
         
-        # Check department budget
-        if department.budget < scholarship_amount:
+        approved_ids.add(selected_id)
+        outcomes.append(len(candidates))
+        candidates.append((student, scholarship_type, scholarship_amount, semester_name))
+    
+    # Lock the budget row only now and pay in request order while it lasts
+    paid = debit_in_order(current_user.dept_id, [candidate[2] for candidate in candidates])
+    
+    approved = []
+    failed_students = []
+    for student_id, outcome in zip(student_ids, outcomes):
+        if isinstance(outcome, str):
+            failed_students.append(f"Student {student_id}: {outcome}")
+        elif not paid[outcome]:
             failed_students.append(f"Student {student_id}: Insufficient budget")
-            continue
-        
-        # Create scholarship
-        scholarship = Scholarship(
-            student_id=student_id,
-            student_name=student.name,
-            type=scholarship_type,
-            amount=scholarship_amount,
-            semester=semester_name
-        )
-        
-        # Update department budget
-        department.budget -= scholarship_amount
-        total_amount += scholarship_amount
-        
-        db.session.add(scholarship)
-        approved_count += 1
-        
-        # Send email notification
-        try:
-            send_scholarship_approval_email(
-                student.email,
-                student.name,
-                scholarship_type,
-                scholarship_amount,
-                semester_name
+        else:
+            student, scholarship_type, scholarship_amount, semester_name = candidates[outcome]
+            
+            # Create scholarship
+            scholarship = Scholarship(
+                student_id=student.student_id,
+                student_name=student.name,
+                type=scholarship_type,
+                amount=scholarship_amount,
+                semester=semester_name
             )
-        except Exception as e:
-            print(f"Failed to send email to {student.email}: {str(e)}")
+            db.session.add(scholarship)
+            record_award(current_user.dept_id, 'scholarship', scholarship)
+            approved.append(candidates[outcome])
     
     db.session.commit()
     
+    # Email the students in the background once the budget row is released
+    for student, scholarship_type, scholarship_amount, semester_name in approved:
+        queue_email(send_scholarship_approval_email,
+                    student.email, student.name, scholarship_type, scholarship_amount, semester_name)
+    
+    approved_count = len(approved)
+    total_amount = sum(candidate[2] for candidate in approved)
     message = f'{approved_count} scholarship(s) approved successfully'
     if failed_students:
         message += f'. {len(failed_students)} failed.'
@@ -426,19 +372,71 @@ def approve_multiple_scholarships():
         'message': message,
         'approved_count': approved_count,
         'total_amount': total_amount,
-        'remaining_budget': department.budget,
+        'remaining_budget': float(current_user.get_department().budget),
         'failed_students': failed_students
     })
 
 
+@admin_scholarship_bp.route('/scholarships/simulate', methods=['POST'])
+@login_required
+def simulate_scholarship_budget():
+    """What-if projection of approve-all under alternative scholarship settings"""
+    # Check if user is admin
+    if not isinstance(current_user, Admin):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    started = time.perf_counter()
+    data = request.get_json(silent=True) or {}
+    scenarios = data.get('scenarios', [])
+    
+    if not isinstance(scenarios, list):
+        return jsonify({'success': False, 'message': 'scenarios must be a list'}), 400
+    
+    max_scenarios = current_app.config['SIMULATION_MAX_SCENARIOS']
+    if len(scenarios) > max_scenarios:
+        return jsonify({'success': False, 'message': f'At most {max_scenarios} scenarios per request'}), 400
+    
+    # Compile each scenario as a copy of the policy with its overrides applied
+    policy = get_award_policy()
+    candidates = []
+    for number, scenario in enumerate(scenarios, start=1):
+        label = f'Scenario {number}'
+        try:
+            if not isinstance(scenario, dict) or not isinstance(scenario.get('rules', {}), dict):
+                raise ValueError('a scenario is an object with a label and rules {award type: changes}')
+            label = str(scenario.get('label') or label)
+            overrides = scenario.get('rules', {})
+            if any(policy.rule(award_type) is None or policy.rule(award_type).kind != 'scholarship'
+                   for award_type in overrides):
+                raise ValueError('only scholarship types can be changed')
+            candidates.append((label, policy.with_overrides(overrides)))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'{label}: {e}'}), 400
+    
+    # Project every setting over the cached roster in one pass
+    department = current_user.get_department()
+    roster = get_roster(current_user.dept_id)
+    results = simulate_scholarships(policy, roster, department.budget, candidates)
+    
+    response = jsonify({
+        'success': True,
+        'budget': float(department.budget),
+        'students': len(roster),
+        'scenarios': results
+    })
+    response.headers['Server-Timing'] = f'simulate;dur={(time.perf_counter() - started) * 1000:.1f}'
+    return response
+
+
 @admin_scholarship_bp.route('/scholarships/view')
 @login_required
+@conditional(department_awards_version, 'scholarship')
 def admin_view_scholarships():
     """Admin view scholarships page - displays all awarded scholarships"""
     # Check if user is admin
     if not isinstance(current_user, Admin):
         flash('Access denied. Admin privileges required.', 'danger')
-        return redirect(url_for('admin_scholarship.dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     # Get department info
     department = current_user.get_department()
@@ -2,19 +2,57 @@
 Admin Stipend Routes
 Handles stipend application management and approval
 """
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from models import AcademicRecord, Admin, User, Department, Stipend, Application, IncomeRecord
 from extensions import db
-from routes.email_utils import send_stipend_approval_email, send_stipend_rejection_email
+from sqlalchemy import and_, or_, update
+from routes.email_utils import send_stipend_approval_email, send_stipend_rejection_email, queue_email
+from routes.award_policy import get_award_policy
+from routes.budget import debit, debit_in_order, record_award, record_awards, retry_on_conflict
+from routes.idempotency import idempotent
+from routes.stipend_triage import parse_cursor, stipend_queue
+from routes.conditional import conditional, department_awards_version, department_version
 
 admin_stipend_bp = Blueprint('admin_stipend', __name__, url_prefix='/admin')
 
 
+def lock_pending(application_ids):
+    """
+    Lock the applications that are still Pending (SELECT ... FOR UPDATE)
+
+    Of two concurrent decisions on the same application only the first
+    finds it Pending; the other waits for its commit, then finds it decided.
+
+    Returns:
+        set: IDs of the locked, still pending applications
+    """
+    return {application_id for application_id, in db.session.query(Application.id).filter(
+        Application.id.in_(set(application_ids)),
+        Application.status == 'Pending'
+    ).with_for_update()}
+
+
+def claim_pending(application_ids, status):
+    """
+    Move applications that are still Pending to `status` in one conditional UPDATE
+
+    Returns:
+        set: IDs of the applications that moved (the others were no longer Pending)
+    """
+    claimed = lock_pending(application_ids)
+    if claimed:
+        db.session.execute(update(Application).where(
+            Application.id.in_(claimed),
+            Application.status == 'Pending'
+        ).values(status=status).execution_options(synchronize_session=False))
+    return claimed
+
+
 @admin_stipend_bp.route('/stipends/applications')
 @login_required
 def admin_stipend_applications():
-    """Admin view for pending stipend applications"""
+    """Admin view for pending stipend applications, highest triage priority first"""
     # Check if user is admin
     if not isinstance(current_user, Admin):
         flash('Access denied. Admin privileges required.', 'danger')
@@ -23,41 +61,52 @@ def admin_stipend_applications():
     # Get department info
     department = current_user.get_department()
     
-    # Get pending applications for students in admin's department
-    applications = db.session.query(Application).join(
-        User, Application.student_id == User.student_id
-    ).filter(
-        User.dept_id == current_user.dept_id,
-        Application.status == 'Pending'
-    ).all()
-    
-    applications_data = []
-    for app in applications:
-        # Get student info
-        student = User.query.filter_by(student_id=app.student_id).first()
-        
-        # Get academic record
-        academic_record = AcademicRecord.query.filter_by(student_id=app.student_id).first()
-        
-        # Get the most recent income record for this student
-        income = IncomeRecord.query.filter_by(student_id=app.student_id).order_by(IncomeRecord.date.desc()).first()
-        
-        amount = 6000
-        if app.type == "Vice Chancellor Stipend":
-            amount = 12000
-            
-        applications_data.append({
-            'application': app,
-            'student': student,
-            'academic_record': academic_record,
-            'income': income,
-            'amount': amount
-        })
+    # One page of the department's pending applications, ranked in SQL (a bad cursor restarts from the top)
+    try:
+        after = parse_cursor(request.args.get('after')) if request.args.get('after') else None
+    except ValueError:
+        after = None
+    page = stipend_queue(current_user.dept_id, after=after, per_page=request.args.get('per_page', type=int))
     
     return render_template('admin_stipend_applications.html',
                          admin=current_user,
                          department=department,
-                         applications=applications_data)
+                         applications=page['applications'],
+                         page=page)
+
+
+@admin_stipend_bp.route('/stipends/queue')
+@login_required
+def stipend_queue_api():
+    """JSON page of the triage queue: pending applications, highest priority first"""
+    # Check if user is admin
+    if not isinstance(current_user, Admin):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    # Keyset cursor from the previous page's next_after
+    try:
+        after = parse_cursor(request.args.get('after')) if request.args.get('after') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': "after must be '<priority>:<application id>'"}), 400
+    
+    page = stipend_queue(current_user.dept_id, after=after, per_page=request.args.get('per_page', type=int))
+    
+    return jsonify({
+        'success': True,
+        'applications': [{
+            'id': item['application'].id,
+            'student_id': item['application'].student_id,
+            'student_name': item['student_name'],
+            'type': item['application'].type,
+            'semester': item['application'].semester,
+            'amount': item['amount'],
+            'last_semester_gpa': item['last_semester_gpa'],
+            'per_capita_income': item['per_capita_income'],
+            'priority': item['priority']
+        } for item in page['applications']],
+        'per_page': page['per_page'],
+        'next_after': page['next_after']
+    })
 
 
 @admin_stipend_bp.route('/stipends/application/<application_id>')
@@ -90,10 +139,8 @@ def admin_stipend_detail(application_id):
     # Get income record
     income = IncomeRecord.query.filter_by(student_id=application.student_id).order_by(IncomeRecord.date.desc()).first()
     
-    # Calculate amount
-    amount = 6000
-    if application.type == "Vice Chancellor Stipend":
-        amount = 12000
+    # Calculate amount (None for a type no longer offered)
+    amount = get_award_policy().amount(application.type)
     
     # Get last semester GPA
     last_semester_gpa = academic_record.get_last_semester_gpa() if academic_record else None
@@ -112,6 +159,8 @@ def admin_stipend_detail(application_id):
 
 @admin_stipend_bp.route('/stipends/approve/<application_id>', methods=['POST'])
 @login_required
+@idempotent
+@retry_on_conflict
 def approve_stipend_application(application_id):
     """Approve a stipend application"""
     # Check if user is admin
@@ -131,14 +180,36 @@ def approve_stipend_application(application_id):
     if not student or student.dept_id != current_user.dept_id:
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
+    if application.status != 'Pending':
+        return jsonify({'success': False, 'message': f'Application is already {application.status.lower()}'}), 400
+    
+    # Types retired from AWARD_POLICY can no longer be awarded
+    policy = get_award_policy()
+    rule = policy.rule(application.type)
+    if rule is None or rule.kind != 'stipend':
+        return jsonify({'success': False, 'message': f'{application.type} is no longer offered'}), 400
+    
+    # Re-check eligibility for the requested stipend (GPA, semester, no other award) in one query
+    still_eligible = db.session.query(User.student_id).join(
+        AcademicRecord, User.student_id == AcademicRecord.student_id
+    ).filter(
+        User.student_id == application.student_id,
+        policy.sql_predicate('stipend', award_type=application.type)
+    ).first()
+    if not still_eligible:
+        return jsonify({'success': False, 'message': f'Student is no longer eligible for {application.type}'}), 400
+    
     # Determine amount
-    amount = 6000
-    if application.type == "Vice Chancellor Stipend":
-        amount = 12000
+    amount = rule.amount
     
-    # Check budget
-    department = current_user.get_department()
-    if department.budget < amount:
+    # Decide it only if no concurrent approve/reject got there first
+    if not claim_pending([application_id], 'Approved'):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Application has already been decided'}), 409
+    
+    # Take the amount from the department budget if it still covers it (atomic check-and-debit)
+    if not debit(current_user.dept_id, amount):
+        db.session.rollback()
         return jsonify({'success': False, 'message': 'Insufficient department budget'}), 400
     
     # Create Stipend
@@ -150,27 +221,14 @@ def approve_stipend_application(application_id):
         semester=application.semester
     )
     
-    # Update Application status
-    application.status = 'Approved'
-    
-    # Update budget
-    department.budget -= amount
-    
     db.session.add(stipend)
+    record_award(current_user.dept_id, 'stipend', stipend)
     db.session.commit()
     db.session.refresh(stipend)
     
-    # Send email notification
-    try:
-        send_stipend_approval_email(
-            student.email,
-            student.name,
-            application.type,
-            amount,
-            application.semester
-        )
-    except Exception as e:
-        print(f"Failed to send email to {student.email}: {str(e)}")
+    # Email the student in the background; the response does not wait for SMTP
+    queue_email(send_stipend_approval_email,
+                student.email, student.name, application.type, amount, application.semester)
     
     return jsonify({
         'success': True,
@@ -180,6 +238,8 @@ def approve_stipend_application(application_id):
 
 @admin_stipend_bp.route('/stipends/reject/<application_id>', methods=['POST'])
 @login_required
+@idempotent
+@retry_on_conflict
 def reject_stipend_application(application_id):
     """Reject a stipend application"""
     # Check if user is admin
@@ -199,21 +259,19 @@ def reject_stipend_application(application_id):
     if not student or student.dept_id != current_user.dept_id:
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
-    # Update Application status
-    application.status = 'Rejected'
+    if application.status != 'Pending':
+        return jsonify({'success': False, 'message': f'Application is already {application.status.lower()}'}), 400
+    
+    # Update Application status unless a concurrent approve/reject got there first
+    if not claim_pending([application_id], 'Rejected'):
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Application has already been decided'}), 409
     
     db.session.commit()
     
-    # Send email notification
-    try:
-        send_stipend_rejection_email(
-            student.email,
-            student.name,
-            application.type,
-            application.semester
-        )
-    except Exception as e:
-        print(f"Failed to send email to {student.email}: {str(e)}")
+    # Email the student in the background; the response does not wait for SMTP
+    queue_email(send_stipend_rejection_email,
+                student.email, student.name, application.type, application.semester)
     
     return jsonify({
         'success': True,
@@ -221,14 +279,174 @@ def reject_stipend_application(application_id):
     })
 
 
+@admin_stipend_bp.route('/stipends/batch', methods=['POST'])
+@login_required
+@idempotent
+@retry_on_conflict
+def batch_stipend_applications():
+    """Approve or reject many stipend applications in one transaction, with a result per application"""
+    # Check if user is admin
+    if not isinstance(current_user, Admin):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    # Get action and application IDs from request
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    application_ids = data.get('applicationIds', [])
+    
+    if action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'message': "action must be 'approve' or 'reject'"}), 400
+    
+    if not application_ids or not isinstance(application_ids, list):
+        return jsonify({'success': False, 'message': 'No applications selected'}), 400
+    
+    max_size = current_app.config['STIPEND_BATCH_MAX_SIZE']
+    if len(application_ids) > max_size:
+        return jsonify({'success': False, 'message': f'At most {max_size} applications per request'}), 400
+    
+    selected = []
+    for application_id in application_ids:
+        try:
+            selected.append(int(application_id))
+        except (TypeError, ValueError):
+            selected.append(None)
+    
+    # Load the applications with their students and current eligibility in one query
+    policy = get_award_policy()
+    still_eligible = or_(*[
+        and_(Application.type == rule.type, policy.sql_predicate('stipend', award_type=rule.type))
+        for rule in policy.rules('stipend')
+    ])
+    rows = db.session.query(Application, User.name, User.email, User.dept_id, still_eligible).join(
+        User, Application.student_id == User.student_id
+    ).outerjoin(
+        AcademicRecord, User.student_id == AcademicRecord.student_id
+    ).filter(
+        Application.id.in_({application_id for application_id in selected if application_id is not None})
+    ).all()
+    found = {row[0].id: row for row in rows}
+    
+    # Per requested ID: a failure reason, or the position of its decision in `candidates`
+    outcomes = []
+    candidates = []
+    seen_ids = set()
+    approved_semesters = set()
+    
+    for application_id in selected:
+        row = found.get(application_id)
+        if row is None or row.dept_id != current_user.dept_id:
+            outcomes.append('Application not found')
+            continue
+        application, name, email, _, eligible = row
+        
+        if application_id in seen_ids:
+            outcomes.append('Listed more than once')
+            continue
+        seen_ids.add(application_id)
+        
+        if application.status != 'Pending':
+            outcomes.append(f'Application is already {application.status.lower()}')
+            continue
+        
+        if action == 'approve':
+            rule = policy.rule(application.type)
+            if rule is None or rule.kind != 'stipend':
+                outcomes.append(f'{application.type} is no longer offered')
+                continue
+            if not eligible:
+                outcomes.append(f'Student is no longer eligible for {application.type}')
+                continue
+            if (application.student_id, application.semester) in approved_semesters:
+                outcomes.append('Another application for this semester is approved in this batch')
+                continue
+            approved_semesters.add((application.student_id, application.semester))
+        
+        outcomes.append(len(candidates))
+        candidates.append((application, name, email))
+    
+    # Lock the candidates still pending; any other was decided by a concurrent request since it was read
+    pending = lock_pending([application.id for application, _, _ in candidates])
+    
+    # Approvals are paid in request order while the budget lasts (budget row locked only from here)
+    if action == 'approve':
+        paid = debit_in_order(current_user.dept_id, [
+            policy.amount(application.type) if application.id in pending else 0
+            for application, _, _ in candidates
+        ])
+    else:
+        paid = [True] * len(candidates)
+    
+    results = []
+    awards = []
+    notifications = []
+    decided_ids = set()
+    total_amount = 0
+    for application_id, requested_id, outcome in zip(selected, application_ids, outcomes):
+        if isinstance(outcome, str):
+            results.append({'id': requested_id, 'success': False, 'message': outcome})
+            continue
+        if application_id not in pending:
+            results.append({'id': requested_id, 'success': False, 'message': 'Application has already been decided'})
+            continue
+        if not paid[outcome]:
+            results.append({'id': requested_id, 'success': False, 'message': 'Insufficient department budget'})
+            continue
+        
+        application, name, email = candidates[outcome]
+        decided_ids.add(application_id)
+        if action == 'approve':
+            amount = policy.amount(application.type)
+            awards.append({
+                'student_id': application.student_id,
+                'student_name': name,
+                'type': application.type,
+                'amount': amount,
+                'semester': application.semester
+            })
+            total_amount += amount
+            notifications.append((send_stipend_approval_email, email, name, application.type, amount, application.semester))
+        else:
+            notifications.append((send_stipend_rejection_email, email, name, application.type, application.semester))
+        results.append({'id': requested_id, 'success': True,
+                        'message': 'Approved' if action == 'approve' else 'Rejected'})
+    
+    # Only the applications decided here change status (they are locked and still pending)
+    claim_pending(decided_ids, 'Approved' if action == 'approve' else 'Rejected')
+    
+    # Stipends and their ledger entries are inserted in bulk
+    record_awards(current_user.dept_id, 'stipend', awards)
+    db.session.commit()
+    
+    # Notifications go out in the background after the commit
+    for send, *args in notifications:
+        queue_email(send, *args)
+    
+    processed_count = len(notifications)
+    failed_count = len(results) - processed_count
+    message = f"{processed_count} application(s) {'approved' if action == 'approve' else 'rejected'}"
+    if failed_count:
+        message += f'. {failed_count} failed.'
+    
+    return jsonify({
+        'success': True,
+        'message': message,
+        'processed_count': processed_count,
+        'failed_count': failed_count,
+        'total_amount': total_amount,
+        'remaining_budget': float(current_user.get_department().budget),
+        'results': results
+    })
+
+
 @admin_stipend_bp.route('/stipends/view')
 @login_required
+@conditional(department_awards_version, 'stipend')
 def admin_view_stipends():
     """Admin view stipends page - displays all awarded stipends"""
     # Check if user is admin
     if not isinstance(current_user, Admin):
         flash('Access denied. Admin privileges required.', 'danger')
-        return redirect(url_for('admin_stipend.dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     # Get department info
     department = current_user.get_department()
@@ -259,44 +477,31 @@ def application_history():
     # Get filter from query params
     status_filter = request.args.get('status', 'all')
     
-    # Get all applications for students in admin's department
-    applications_query = db.session.query(Application).join(
-        User, Application.student_id == User.student_id
-    ).filter(User.dept_id == current_user.dept_id)
-    
-    # Apply status filter if not 'all'
-    if status_filter != 'all':
-        applications_query = applications_query.filter(Application.status == status_filter.capitalize())
+    # Rows are loaded by the template only when its cached fragment for this version is missing
+    history_version = department_version(current_user.dept_id, applications=True)
+    dept_id = current_user.dept_id
     
-    applications = applications_query.order_by(Application.created_at.desc()).all()
-    
-    applications_data = []
-    for app in applications:
-        # Get student info
-        student = User.query.filter_by(student_id=app.student_id).first()
-        
-        # Get academic record
-        academic_record = AcademicRecord.query.filter_by(student_id=app.student_id).first()
+    def load_applications():
+        """Applications with their students in one query, newest first"""
+        applications_query = db.session.query(Application, User).join(
+            User, Application.student_id == User.student_id
+        ).filter(User.dept_id == dept_id)
         
-        # Get the most recent income record for this student
-        income = IncomeRecord.query.filter_by(student_id=app.student_id).order_by(IncomeRecord.date.desc()).first()
+        # Apply status filter if not 'all'
+        if status_filter != 'all':
+            applications_query = applications_query.filter(Application.status == status_filter.capitalize())
         
-        amount = 6000
-        if app.type == "Vice Chancellor Stipend":
-            amount = 12000
-            
-        applications_data.append({
-            'application': app,
-            'student': student,
-            'academic_record': academic_record,
-            'income': income,
-            'amount': amount
-        })
+        policy = get_award_policy()
+        return [
+            {'application': app, 'student': student, 'amount': policy.amount(app.type)}
+            for app, student in applications_query.order_by(Application.created_at.desc()).all()
+        ]
     
     return render_template('admin_stipend_history.html',
                          admin=current_user,
                          department=department,
-                         applications=applications_data,
+                         load_applications=load_applications,
+                         history_version=history_version,
                          status_filter=status_filter)
 
 
@@ -2,98 +2,82 @@
 Analytics Module
 Handles all dashboard analytics and chart generation
 """
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import io
 import base64
+import numpy as np
 from extensions import db
-from models import User, AcademicRecord, Scholarship, Stipend
+from models import User, Scholarship, Stipend
+from routes.roster import get_roster
+from routes.eligibility import NO_TIER
+from routes.award_policy import get_award_policy
+from routes.budget import budget_summary
+from routes.read_replica import read_replica
+
+
+def _new_axes():
+    """A 10x6 figure and its axes; matplotlib is imported on the first chart, not at startup"""
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(10, 6))
+    return figure, figure.subplots()
+
+
+def _encode(figure):
+    """PNG of a figure as base64 for an <img> data URI"""
+    img = io.BytesIO()
+    figure.savefig(img, format='png', bbox_inches='tight', dpi=100)
+    return base64.b64encode(img.getvalue()).decode()
 
 
 def generate_cgpa_distribution_chart(dept_id):
     """Generate CGPA distribution histogram"""
-    cgpas = []
-    academic_records = db.session.query(AcademicRecord).select_from(User).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == dept_id).all()
-    
-    for record in academic_records:
-        if record.cgpa:
-            cgpas.append(record.cgpa)
-    
-    plt.figure(figsize=(10, 6))
-    plt.hist(cgpas, bins=15, color='#4caf50', edgecolor='white',linewidth =2, alpha=1)
-    plt.xlabel('CGPA', fontsize=12)
-    plt.ylabel('Number of Students', fontsize=12)
-    plt.grid(axis='y', alpha=0.3, linestyle='--')
-    plt.xticks(fontsize=10)
-    plt.yticks(fontsize=10)
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-    img.seek(0)
-    plot_data = base64.b64encode(img.getvalue()).decode()
-    plt.close()
-    
-    return plot_data, cgpas
+    roster = get_roster(dept_id)
+    cgpas = roster.cgpa[np.nan_to_num(roster.cgpa) != 0].tolist()
+    
+    figure, axes = _new_axes()
+    axes.hist(cgpas, bins=15, color='#4caf50', edgecolor='white',linewidth =2, alpha=1)
+    axes.set_xlabel('CGPA', fontsize=12)
+    axes.set_ylabel('Number of Students', fontsize=12)
+    axes.grid(axis='y', alpha=0.3, linestyle='--')
+    axes.tick_params(axis='x', labelsize=10)
+    axes.tick_params(axis='y', labelsize=10)
+    
+    return _encode(figure), cgpas
 
 
 def generate_last_semester_gpa_chart(dept_id):
     """Generate last semester GPA distribution histogram"""
-    last_semester_gpas = []
-    academic_records = db.session.query(AcademicRecord).select_from(User).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == dept_id).all()
-    
-    for record in academic_records:
-        last_gpa = record.get_last_semester_gpa()
-        if last_gpa:
-            last_semester_gpas.append(last_gpa)
-    
-    plt.figure(figsize=(10, 6))
-    plt.hist(last_semester_gpas, bins=15, color='#2196f3', edgecolor='white',linewidth =2, alpha=1)
-    plt.xlabel('Last Semester GPA', fontsize=12)
-    plt.ylabel('Number of Students', fontsize=12)
-    plt.grid(axis='y', alpha=0.3, linestyle='--')
-    plt.xticks(fontsize=10)
-    plt.yticks(fontsize=10)
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-    img.seek(0)
-    plot_data = base64.b64encode(img.getvalue()).decode()
-    plt.close()
-    
-    return plot_data, last_semester_gpas
+    roster = get_roster(dept_id)
+    gpas = roster.last_semester_gpa
+    last_semester_gpas = gpas[np.nan_to_num(gpas) != 0].tolist()
+    
+    figure, axes = _new_axes()
+    axes.hist(last_semester_gpas, bins=15, color='#2196f3', edgecolor='white',linewidth =2, alpha=1)
+    axes.set_xlabel('Last Semester GPA', fontsize=12)
+    axes.set_ylabel('Number of Students', fontsize=12)
+    axes.grid(axis='y', alpha=0.3, linestyle='--')
+    axes.tick_params(axis='x', labelsize=10)
+    axes.tick_params(axis='y', labelsize=10)
+    
+    return _encode(figure), last_semester_gpas
 
 
 def generate_budget_utilization_chart(dept_id, remaining_budget):
     """Generate budget utilization pie chart"""
-    spent_scholarships = db.session.query(db.func.sum(Scholarship.amount)).select_from(User).join(
-        Scholarship, User.student_id == Scholarship.student_id
-    ).filter(User.dept_id == dept_id).scalar() or 0
-    
-    spent_stipends = db.session.query(db.func.sum(Stipend.amount)).select_from(User).join(
-        Stipend, User.student_id == Stipend.student_id
-    ).filter(User.dept_id == dept_id).scalar() or 0
+    # Spend comes from the materialized budget ledger balances
+    summary = budget_summary(dept_id)
+    spent_scholarships = summary['scholarships']
+    spent_stipends = summary['stipends']
     
-    plt.figure(figsize=(10, 6))
+    figure, axes = _new_axes()
     labels = ['Remaining Budget', 'Scholarships Spent', 'Stipends Spent']
-    sizes = [remaining_budget, spent_scholarships, spent_stipends]
+    sizes = [float(remaining_budget), float(spent_scholarships), float(spent_stipends)]
     colors = ['#e0e0e0', '#4caf50', '#2196f3']
     explode = (0.05, 0, 0)
     
-    plt.pie(sizes, explode=explode, labels=labels, colors=colors, autopct='%1.1f%%',
-            shadow=True, startangle=140, textprops={'fontsize': 11})
-    
-    img = io.BytesIO()
-    plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-    img.seek(0)
-    plot_data = base64.b64encode(img.getvalue()).decode()
-    plt.close()
+    axes.pie(sizes, explode=explode, labels=labels, colors=colors, autopct='%1.1f%%',
+             shadow=True, startangle=140, textprops={'fontsize': 11})
     
-    return plot_data, spent_scholarships, spent_stipends
+    return _encode(figure), spent_scholarships, spent_stipends
 
 
 def generate_awards_breakdown_chart(dept_id):
@@ -106,33 +90,59 @@ def generate_awards_breakdown_chart(dept_id):
         Stipend, User.student_id == Stipend.student_id
     ).filter(User.dept_id == dept_id).count()
     
-    plt.figure(figsize=(10, 6))
+    figure, axes = _new_axes()
     categories = ['Scholarships', 'Stipends']
     counts = [scholarship_count, stipend_count]
-    bars = plt.bar(categories, counts, color=['#4caf50', '#2196f3'], width=0.5)
+    bars = axes.bar(categories, counts, color=['#4caf50', '#2196f3'], width=0.5)
     
     # Add value labels on top of bars
     for bar in bars:
         height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width()/2., height,
-                f'{int(height)}',
-                ha='center', va='bottom', fontsize=12, fontweight='bold')
+        axes.text(bar.get_x() + bar.get_width()/2., height,
+                  f'{int(height)}',
+                  ha='center', va='bottom', fontsize=12, fontweight='bold')
     
-    plt.ylabel('Count', fontsize=12)
-    plt.xlabel('Award Type', fontsize=12)
-    plt.grid(axis='y', alpha=0.3, linestyle='--')
-    plt.xticks(fontsize=11)
-    plt.yticks(fontsize=10)
+    axes.set_ylabel('Count', fontsize=12)
+    axes.set_xlabel('Award Type', fontsize=12)
+    axes.grid(axis='y', alpha=0.3, linestyle='--')
+    axes.tick_params(axis='x', labelsize=11)
+    axes.tick_params(axis='y', labelsize=10)
     
-    img = io.BytesIO()
-    plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-    img.seek(0)
-    plot_data = base64.b64encode(img.getvalue()).decode()
-    plt.close()
+    return _encode(figure), scholarship_count, stipend_count
+
+
+def get_projected_spend(dept_id):
+    """
+    Projected award spend for each student's last completed semester
     
-    return plot_data, scholarship_count, stipend_count
+    Scholarships every eligible student is due, plus stipends at the highest
+    tier for the remaining students eligible to apply. Students already
+    holding an award for the semester are left out.
+    
+    Returns:
+        dict: projected scholarship/stipend amounts and counts
+    """
+    policy = get_award_policy()
+    roster = get_roster(dept_id)
+    
+    scholarship_tiers, scholarship_amounts = policy.classify(
+        'scholarship', roster.last_semester_gpa, roster.last_completed_semester,
+        awarded=policy.awarded_flags('scholarship', roster)
+    )
+    stipend_tiers, stipend_amounts = policy.classify(
+        'stipend', roster.last_semester_gpa, roster.last_completed_semester,
+        awarded=policy.awarded_flags('stipend', roster) | (scholarship_tiers != NO_TIER)
+    )
+    
+    return {
+        'projected_scholarships': float(scholarship_amounts.sum()),
+        'projected_scholarship_count': int(np.count_nonzero(scholarship_tiers != NO_TIER)),
+        'projected_stipends': float(stipend_amounts.sum()),
+        'projected_stipend_count': int(np.count_nonzero(stipend_tiers != NO_TIER))
+    }
 
 
+@read_replica
 def get_admin_dashboard_data(dept_id, remaining_budget):
     """
     Generate all analytics data for admin dashboard
@@ -157,9 +167,11 @@ def get_admin_dashboard_data(dept_id, remaining_budget):
     avg_cgpa = round(sum(cgpas)/len(cgpas), 2) if cgpas else 0
     avg_last_gpa = round(sum(last_semester_gpas)/len(last_semester_gpas), 2) if last_semester_gpas else 0
     total_spent = spent_scholarships + spent_stipends
+    projected = get_projected_spend(dept_id)
     
     return {
         'stats': {
+            **projected,
             'total_students': total_students,
             'avg_cgpa': avg_cgpa,
             'avg_last_gpa': avg_last_gpa,
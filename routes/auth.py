@@ -4,8 +4,11 @@ Handles login, logout, and user authentication
 """
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from models import User, Admin
+from models import Admin
 from extensions import db
+from routes.principals import cache_principal, clear_cached_principal, resolve_principal
+from routes.passwords import verify_password
+from routes.rate_limit import check_login_rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -22,28 +25,19 @@ def login():
         password = request.form.get('password')
         remember = True if request.form.get('remember') else False
         
-        user = None
+        # Throttle per IP and per identifier before touching the database
+        retry_after = check_login_rate_limit(email_or_id)
+        if retry_after:
+            flash(f'Too many login attempts. Please try again in {retry_after} seconds.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
         
-        # First, try to find admin by email
-        user = Admin.query.filter_by(email=email_or_id).first()
+        # Admin email, student email or student ID - resolved in a single query
+        user = resolve_principal(email_or_id)
         
-        # If no admin found, try to find student by email
-        if not user:
-            user = User.query.filter_by(email=email_or_id).first()
-        
-        # If still not found, try by student ID
-        if not user:
-            try:
-                student_id = int(email_or_id)
-                user = User.query.filter_by(student_id=student_id).first()
-            except ValueError:
-                # Not a valid number, skip ID lookup
-                pass
-        
-        # Direct password comparison (plain text)
-        # TODO: Implement password hashing for security
-        if user and user.password == password:
+        # Hashed (or legacy plaintext, rehashed in the background) password check
+        if user and verify_password(user, password):
             login_user(user, remember=remember)
+            cache_principal(user)
             flash('Login successful!', 'success')
             
             # Redirect based on user type
@@ -66,5 +60,6 @@ def login():
 def logout():
     """Handle user logout"""
     logout_user()
+    clear_cached_principal()
     flash('You have been logged out.', 'info')
     return redirect(url_for('main.home'))
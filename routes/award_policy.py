@@ -0,0 +1,224 @@
+"""
+Award Policy
+Compiles the AWARD_POLICY table into a per-student evaluator, roster classifier and SQL predicates
+"""
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import String, and_, case, cast, exists, literal, or_
+from models import AcademicRecord, Scholarship, Stipend, User
+from extensions import db
+from routes.eligibility import NO_TIER, classify, awarded_semesters, prior_award_flags
+
+# Award kind -> table its awards are stored in
+AWARD_MODELS = {'scholarship': Scholarship, 'stipend': Stipend}
+
+MAX_SEMESTER = 8
+
+AwardRule = namedtuple('AwardRule', ['kind', 'type', 'min_gpa', 'amount', 'first_semester', 'last_semester'])
+
+
+class AwardPolicy:
+    """
+    Compiled award rules
+
+    Rules of each kind are kept lowest minimum GPA first; a student gets
+    the highest rule whose GPA floor and semester window they meet. A
+    student already holding an award of a kind listed in `exclusive[kind]`
+    for the semester gets nothing of that kind.
+    """
+
+    def __init__(self, rules, exclusive):
+        self._rules = {kind: tuple(sorted((rule for rule in rules if rule.kind == kind), key=lambda rule: rule.min_gpa))
+                       for kind in AWARD_MODELS}
+        self._by_type = {rule.type: rule for rule in rules}
+        self._exclusive = {kind: tuple(exclusive.get(kind, (kind,))) for kind in AWARD_MODELS}
+
+    def rules(self, kind):
+        """Rules of one kind, lowest minimum GPA first"""
+        return self._rules[kind]
+
+    def rule(self, award_type):
+        """Rule for an award type name (None if unknown)"""
+        return self._by_type.get(award_type)
+
+    def min_gpa(self, kind):
+        """Lowest GPA that qualifies for any award of a kind"""
+        return self._rules[kind][0].min_gpa
+
+    def amount(self, award_type):
+        """Amount paid for an award type (None if the type is no longer offered)"""
+        rule = self.rule(award_type)
+        return rule.amount if rule else None
+
+    def blocking_kinds(self, kind):
+        """Award kinds whose entries for a semester rule out another award of this kind"""
+        return self._exclusive[kind]
+
+    def blocking_models(self, kind):
+        """Award tables whose entries for a semester rule out another award of this kind"""
+        return [AWARD_MODELS[other] for other in self._exclusive[kind]]
+
+    def qualifies(self, rule, gpa, semester):
+        """Whether a last-semester GPA and completed semester meet one rule"""
+        return bool(gpa) and gpa >= rule.min_gpa and rule.first_semester <= semester <= rule.last_semester
+
+    def evaluate(self, kind, gpa, semester):
+        """
+        Best award of a kind for one student
+
+        Args:
+            gpa: last completed semester GPA (None if not graded)
+            semester: last completed semester number
+
+        Returns:
+            AwardRule or None
+        """
+        for rule in reversed(self._rules[kind]):
+            if self.qualifies(rule, gpa, semester):
+                return rule
+        return None
+
+    def has_blocking_award(self, kind, student_id, semester_name):
+        """Whether a student already holds an award that rules out this kind for a semester"""
+        return any(
+            db.session.query(model.id).filter_by(student_id=student_id, semester=semester_name).first()
+            for model in self.blocking_models(kind)
+        )
+
+    def awarded_flags(self, kind, roster):
+        """Per roster student, whether an excluding award exists for their last completed semester"""
+        pairs = set()
+        for model in self.blocking_models(kind):
+            pairs |= awarded_semesters(model, roster.dept_id)
+        return prior_award_flags(roster.student_ids, roster.last_completed_semester, pairs)
+
+    def classify(self, kind, gpas, semesters, awarded=None):
+        """Vectorized evaluate(): (tier index array into rules(kind), amount array)"""
+        return classify(gpas, self._rules[kind], semesters=semesters, awarded=awarded)
+
+    def tier_type(self, kind, tier):
+        """Award type name for a tier index from classify() (None for NO_TIER)"""
+        return self._rules[kind][tier].type if tier != NO_TIER else None
+
+    def with_overrides(self, overrides):
+        """
+        A copy of the policy with some award types' settings replaced
+
+        Args:
+            overrides: {award type: {'min_gpa', 'amount', 'semesters'}} (any subset of fields)
+
+        Raises:
+            ValueError: for an unknown award type or field, or an invalid value
+        """
+        table = [
+            {'kind': rule.kind, 'type': rule.type, 'min_gpa': rule.min_gpa, 'amount': rule.amount,
+             'semesters': (rule.first_semester, rule.last_semester)}
+            for rule in self._by_type.values()
+        ]
+        entries = {entry['type']: entry for entry in table}
+        for award_type, fields in overrides.items():
+            if award_type not in entries:
+                raise ValueError(f'Unknown award type {award_type!r}')
+            unknown = set(fields) - {'min_gpa', 'amount', 'semesters'}
+            if unknown:
+                raise ValueError(f"Award rule {award_type!r}: unknown field {', '.join(sorted(unknown))}")
+            entries[award_type].update(fields)
+        return compile_award_policy(table, self._exclusive)
+
+    def sql_predicate(self, kind, award_type=None):
+        """
+        SQL condition over students joined to academic_records, true where
+        the student qualifies for an award of a kind (or one award_type) for
+        their last completed semester and holds no excluding award for it
+        """
+        gpa = last_semester_gpa_expression()
+        semester = AcademicRecord.current_semester - 1
+        rules = [self._by_type[award_type]] if award_type else self._rules[kind]
+
+        qualifies = or_(*[
+            and_(gpa >= rule.min_gpa, semester.between(rule.first_semester, rule.last_semester))
+            for rule in rules
+        ])
+        semester_name = literal('Semester ', String) + cast(semester, String)
+        not_awarded = [
+            ~exists().where(model.student_id == User.student_id, model.semester == semester_name)
+            for model in self.blocking_models(kind)
+        ]
+        return and_(qualifies, *not_awarded)
+
+    def sql_amount(self, kind):
+        """SQL expression for the amount of the best qualifying award of a kind (0 if none)"""
+        gpa = last_semester_gpa_expression()
+        semester = AcademicRecord.current_semester - 1
+        return case(
+            *[(and_(gpa >= rule.min_gpa, semester.between(rule.first_semester, rule.last_semester)), rule.amount)
+              for rule in reversed(self._rules[kind])],
+            else_=0
+        )
+
+
+def last_semester_gpa_expression():
+    """SQL for AcademicRecord.get_last_semester_gpa()"""
+    return case(
+        {semester + 1: getattr(AcademicRecord, f'semester_{semester}_gpa') for semester in range(1, MAX_SEMESTER + 1)},
+        value=AcademicRecord.current_semester,
+        else_=None
+    )
+
+
+def compile_award_policy(table, exclusive):
+    """
+    Validate the AWARD_POLICY table and build an AwardPolicy
+
+    Args:
+        table: list of dicts with kind, type, min_gpa, amount and optional
+               semesters (first, last completed semester the rule applies to)
+        exclusive: {kind: award kinds that rule it out for the same semester}
+
+    Raises:
+        ValueError: if a rule is malformed
+    """
+    rules = []
+    for entry in table:
+        kind = entry.get('kind')
+        if kind not in AWARD_MODELS:
+            raise ValueError(f"Award rule {entry!r}: kind must be one of {', '.join(AWARD_MODELS)}")
+
+        try:
+            first, last = entry.get('semesters', (1, MAX_SEMESTER))
+            rule = AwardRule(kind, entry['type'], float(entry['min_gpa']), int(entry['amount']), int(first), int(last))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Award rule {entry!r}: needs a type, a numeric min_gpa and amount, '
+                             f'and semesters as (first, last)')
+
+        if not 0 < rule.min_gpa <= 4:
+            raise ValueError(f'Award rule {rule.type!r}: min_gpa must be in (0, 4]')
+        if rule.amount <= 0:
+            raise ValueError(f'Award rule {rule.type!r}: amount must be positive')
+        if not 1 <= rule.first_semester <= rule.last_semester <= MAX_SEMESTER:
+            raise ValueError(f'Award rule {rule.type!r}: semesters must lie within 1-{MAX_SEMESTER}')
+        if any(existing.type == rule.type for existing in rules):
+            raise ValueError(f'Award rule {rule.type!r} is defined twice')
+        rules.append(rule)
+
+    for kind in AWARD_MODELS:
+        if not any(rule.kind == kind for rule in rules):
+            raise ValueError(f'AWARD_POLICY has no {kind} rules')
+    for kind, others in exclusive.items():
+        if kind not in AWARD_MODELS or any(other not in AWARD_MODELS for other in others):
+            raise ValueError(f'AWARD_EXCLUSIVE: unknown award kind in {kind!r}: {others!r}')
+
+    return AwardPolicy(rules, exclusive)
+
+
+def init_award_policy(app):
+    """Compile the app's award policy once and expose it to templates as award_policy"""
+    policy = compile_award_policy(app.config['AWARD_POLICY'], app.config['AWARD_EXCLUSIVE'])
+    app.extensions['award_policy'] = policy
+    app.jinja_env.globals['award_policy'] = policy
+    return policy
+
+
+def get_award_policy():
+    """Return the compiled policy of the current app"""
+    return current_app.extensions['award_policy']
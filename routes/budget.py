@@ -0,0 +1,383 @@
+"""
+Department Budget
+Atomic budget debits for award approvals, the append-only budget ledger and its materialized balances
+"""
+import random
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from functools import wraps
+import click
+import numpy as np
+from flask import current_app, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from models import BudgetBalance, BudgetEntry, Department, User
+from extensions import db
+from routes.award_policy import AWARD_MODELS
+from routes.budget_forecast import fund_in_order
+from routes.student_snapshot import mark_students_changed
+
+# MySQL: lock wait timeout, deadlock
+RETRYABLE_ERROR_CODES = (1205, 1213)
+
+CENT = Decimal('0.01')
+
+BALANCE_FIELDS = ('allocated', 'scholarships', 'stipends', 'reversed', 'balance')
+
+
+def to_money(value):
+    """Round an amount to a Decimal with two places (None counts as 0)"""
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def debit(dept_id, amount):
+    """
+    Take amount from a department's budget with one conditional UPDATE
+
+    The check and the write are a single statement, so two approvals can
+    never both spend the same money. The department row stays locked until
+    the caller commits: call this last, right before the commit.
+
+    Returns:
+        bool: False (and nothing changed) if the budget does not cover amount
+    """
+    amount = to_money(amount)
+    if amount <= 0:
+        return True
+    result = db.session.execute(
+        update(Department)
+        .where(Department.id == dept_id, Department.budget >= amount)
+        .values(budget=Department.budget - amount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def debit_in_order(dept_id, amounts):
+    """
+    Pay awards in order while the budget lasts, as one debit
+
+    Locks the department row (SELECT ... FOR UPDATE) so the plan is made
+    against the latest balance; the lock is held until the caller commits.
+
+    Args:
+        amounts: award amounts in approval order (0 for no award)
+
+    Returns:
+        numpy.ndarray: bool per award, True where it was paid
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    available = db.session.query(Department.budget).filter_by(id=dept_id).with_for_update().scalar() or 0
+    paid = fund_in_order(amounts, available)
+    if not debit(dept_id, amounts[paid].sum()):
+        return np.zeros(amounts.shape, dtype=bool)
+    return paid
+
+
+def is_conflict(error):
+    """Whether an OperationalError is a deadlock/lock timeout worth retrying"""
+    code = error.orig.args[0] if getattr(error.orig, 'args', None) else None
+    return code in RETRYABLE_ERROR_CODES or 'database is locked' in str(error.orig)
+
+
+def retry_on_conflict(view):
+    """
+    Re-run an approval view when the database aborts it over a lock conflict
+
+    The session is rolled back before each retry, so the view starts over
+    from fresh reads. Views must send emails only after their commit.
+    A duplicate award (unique student/semester per award table) made by a
+    concurrent request is answered with 409 instead.
+    """
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        attempts = current_app.config['BUDGET_RETRY_ATTEMPTS']
+        for attempt in range(1, attempts + 1):
+            try:
+                return view(*args, **kwargs)
+            except IntegrityError as e:
+                db.session.rollback()
+                print(f"Duplicate award blocked in {view.__name__}: {str(e.orig)}")
+                return jsonify({'success': False, 'message': 'An award has already been made for this semester'}), 409
+            except OperationalError as e:
+                db.session.rollback()
+                if attempt == attempts or not is_conflict(e):
+                    raise
+                print(f"Budget conflict in {view.__name__}, retrying ({attempt}/{attempts - 1})")
+                time.sleep(random.uniform(0, current_app.config['BUDGET_RETRY_BACKOFF'] * 2 ** attempt))
+    return decorated_view
+
+
+def credit(dept_id, amount):
+    """Add amount to a department's budget (one UPDATE)"""
+    db.session.execute(
+        update(Department)
+        .where(Department.id == dept_id)
+        .values(budget=Department.budget + to_money(amount))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def award_entry(dept_id, kind, student_id, semester, amount, award_type):
+    """Column values of the ledger entry for one award"""
+    return dict(
+        dept_id=dept_id,
+        entry_type='award',
+        award_kind=kind,
+        student_id=student_id,
+        semester=semester,
+        amount=-to_money(amount),
+        note=award_type
+    )
+
+
+def balance_changes(db_session, entries):
+    """
+    Queue the budget_balances changes of new ledger entries for the commit
+
+    The caller's transaction already holds the department row (debit/credit),
+    so the rows are updated by one writer at a time.
+    """
+    changes = db_session.info.setdefault('budget_balance_changes', {})
+    for entry in entries:
+        amount = to_money(entry['amount'])
+        delta = changes.setdefault((entry['dept_id'], entry.get('semester') or ''),
+                                   {field: Decimal('0.00') for field in BALANCE_FIELDS})
+        if entry['entry_type'] == 'allocation':
+            delta['allocated'] += amount
+        if entry['entry_type'] == 'reversal':
+            delta['reversed'] += amount
+        if entry.get('award_kind') == 'scholarship':
+            delta['scholarships'] -= amount
+        elif entry.get('award_kind') == 'stipend':
+            delta['stipends'] -= amount
+        delta['balance'] += amount
+
+
+def record_award(dept_id, kind, award):
+    """Append the ledger entry for a new Scholarship/Stipend, in the same transaction as its debit"""
+    entry = award_entry(dept_id, kind, award.student_id, award.semester, award.amount, award.type)
+    db.session.add(BudgetEntry(**entry))
+    balance_changes(db.session, [entry])
+
+
+def record_awards(dept_id, kind, awards):
+    """
+    Insert many new awards of a kind and their ledger entries, one executemany per table
+
+    Args:
+        awards: dicts of Scholarship/Stipend column values (student_id, student_name, type, amount, semester)
+    """
+    if not awards:
+        return
+    db.session.execute(insert(AWARD_MODELS[kind]), awards)
+    mark_students_changed(db.session, {award['student_id'] for award in awards})
+    entries = [
+        award_entry(dept_id, kind, award['student_id'], award['semester'], award['amount'], award['type'])
+        for award in awards
+    ]
+    db.session.execute(insert(BudgetEntry), entries)
+    balance_changes(db.session, entries)
+
+
+def allocate(dept_id, amount, note=None):
+    """Add money to a department's budget and record the allocation (caller commits)"""
+    amount = to_money(amount)
+    if amount <= 0:
+        raise ValueError('Allocation amount must be positive')
+    credit(dept_id, amount)
+    entry = dict(dept_id=dept_id, entry_type='allocation', amount=amount, note=note)
+    db.session.add(BudgetEntry(**entry))
+    balance_changes(db.session, [entry])
+
+
+def reverse_award(kind, award_id, note=None):
+    """
+    Withdraw an award: delete it, return its amount to the budget and record the reversal (caller commits)
+
+    Raises:
+        ValueError: if the award does not exist
+    """
+    award = db.session.get(AWARD_MODELS[kind], award_id)
+    if not award:
+        raise ValueError(f'No {kind} with id {award_id}')
+    dept_id = db.session.query(User.dept_id).filter_by(student_id=award.student_id).scalar()
+
+    credit(dept_id, award.amount)
+    entry = dict(
+        dept_id=dept_id,
+        entry_type='reversal',
+        award_kind=kind,
+        student_id=award.student_id,
+        semester=award.semester,
+        amount=to_money(award.amount),
+        note=note or award.type
+    )
+    db.session.add(BudgetEntry(**entry))
+    balance_changes(db.session, [entry])
+    db.session.delete(award)
+    return award
+
+
+def ledger_totals(dept_id):
+    """A department's ledger totals as unsaved BudgetBalance rows, from one grouped scan of its entries"""
+    totals = db.session.query(
+        BudgetEntry.semester,
+        db.func.sum(case((BudgetEntry.entry_type == 'allocation', BudgetEntry.amount), else_=0)),
+        db.func.sum(case((BudgetEntry.award_kind == 'scholarship', -BudgetEntry.amount), else_=0)),
+        db.func.sum(case((BudgetEntry.award_kind == 'stipend', -BudgetEntry.amount), else_=0)),
+        db.func.sum(case((BudgetEntry.entry_type == 'reversal', BudgetEntry.amount), else_=0)),
+        db.func.sum(BudgetEntry.amount),
+        db.func.max(BudgetEntry.id)
+    ).filter(BudgetEntry.dept_id == dept_id).group_by(BudgetEntry.semester).all()
+
+    # Every row records the newest entry of the whole department: all entries up to it are counted
+    last_entry_id = max((row[6] for row in totals), default=0)
+    now = datetime.now()
+    return [
+        BudgetBalance(dept_id=dept_id, semester=semester or '', allocated=to_money(allocated),
+                      scholarships=to_money(scholarships), stipends=to_money(stipends),
+                      reversed=to_money(reversed_amount), balance=to_money(balance),
+                      last_entry_id=last_entry_id, materialized_at=now)
+        for semester, allocated, scholarships, stipends, reversed_amount, balance, _ in totals
+    ]
+
+
+def replace_balances(dept_id):
+    """Rebuild a department's budget_balances rows from its ledger in the current transaction (caller commits)"""
+    # Approvals hold the department row while they write the ledger, so none commit in between
+    db.session.query(Department.id).filter_by(id=dept_id).with_for_update().scalar()
+    balances = ledger_totals(dept_id)
+    BudgetBalance.query.filter_by(dept_id=dept_id).delete()
+    db.session.add_all(balances)
+    return balances
+
+
+def materialize_balances(dept_id):
+    """
+    Recompute a department's budget_balances rows from its ledger, in their own commit
+
+    Approvals keep the rows current; this repairs drift and builds the rows
+    of departments whose ledger predates them.
+    """
+    try:
+        balances = replace_balances(dept_id)
+        db.session.commit()
+    except (IntegrityError, OperationalError) as e:
+        db.session.rollback()
+        print(f"Budget balances for department {dept_id} not saved: {str(e)}")
+        balances = ledger_totals(dept_id)
+    return balances
+
+
+def apply_balance_changes(db_session, changes):
+    """
+    Add queued ledger changes to their budget_balances rows, one UPDATE per department and semester
+
+    A semester without a row gets one; a department without any rows is
+    built from its whole ledger instead (this transaction's entries included).
+    Updated rows move last_entry_id to the department's newest entry, which
+    is this transaction's own since it holds the department row.
+    """
+    # The queued entries added through the ORM get their ids
+    db_session.flush()
+
+    rebuilt = set()
+    for (dept_id, semester), delta in sorted(changes.items()):
+        if dept_id in rebuilt:
+            continue
+        newest = db.select(db.func.max(BudgetEntry.id)).where(BudgetEntry.dept_id == dept_id).scalar_subquery()
+        result = db_session.execute(
+            update(BudgetBalance)
+            .where(BudgetBalance.dept_id == dept_id, BudgetBalance.semester == semester)
+            .values({**{field: getattr(BudgetBalance, field) + amount for field, amount in delta.items()},
+                     'last_entry_id': newest})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            continue
+        if db_session.query(BudgetBalance.dept_id).filter_by(dept_id=dept_id).first():
+            db_session.execute(insert(BudgetBalance).values(dept_id=dept_id, semester=semester, last_entry_id=newest, **delta))
+        else:
+            replace_balances(dept_id)
+            rebuilt.add(dept_id)
+
+
+@db.event.listens_for(Session, 'before_commit')
+def _apply_balance_changes(db_session):
+    changes = db_session.info.pop('budget_balance_changes', None)
+    if changes:
+        apply_balance_changes(db_session, changes)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _forget_balance_changes(db_session):
+    db_session.info.pop('budget_balance_changes', None)
+
+
+def get_balances(dept_id):
+    """
+    Ledger totals of a department, one BudgetBalance per semester
+
+    Read-only: the rows are updated in the transactions that write the
+    ledger. A department whose rows were never built (run `flask budget
+    materialize`) is totalled from its ledger without saving.
+    """
+    return BudgetBalance.query.filter_by(dept_id=dept_id).all() or ledger_totals(dept_id)
+
+
+def budget_summary(dept_id):
+    """Department totals (allocated, scholarships, stipends, reversed, balance) summed over its balance rows"""
+    summary = {field: Decimal('0.00') for field in BALANCE_FIELDS}
+    for balance in get_balances(dept_id):
+        for field in summary:
+            summary[field] += to_money(getattr(balance, field))
+    return summary
+
+
+@click.group('budget')
+def budget_cli():
+    """Department budget ledger commands"""
+
+
+@budget_cli.command('allocate')
+@click.argument('dept_id', type=int)
+@click.argument('amount')
+@click.option('--note', default=None, help='Reason recorded in the ledger')
+@with_appcontext
+def allocate_command(dept_id, amount, note):
+    """Add AMOUNT to department DEPT_ID's budget"""
+    allocate(dept_id, amount, note)
+    db.session.commit()
+    click.echo(f'Allocated {to_money(amount):,.2f} to department {dept_id}')
+
+
+@budget_cli.command('reverse-award')
+@click.argument('kind', type=click.Choice(sorted(AWARD_MODELS)))
+@click.argument('award_id', type=int)
+@click.option('--note', default=None, help='Reason recorded in the ledger')
+@with_appcontext
+def reverse_award_command(kind, award_id, note):
+    """Withdraw a scholarship/stipend and return its amount to the budget"""
+    try:
+        award = reverse_award(kind, award_id, note)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f'Reversed {kind} {award_id} ({award.type}, {to_money(award.amount):,.2f})')
+
+
+@budget_cli.command('materialize')
+@with_appcontext
+def materialize_command():
+    """Rebuild budget_balances for every department (e.g. from cron) and report ledger drift"""
+    for department in Department.query.order_by(Department.id).all():
+        balances = materialize_balances(department.id)
+        ledger_balance = sum((to_money(balance.balance) for balance in balances), Decimal('0.00'))
+        line = f'Department {department.id}: ledger balance {ledger_balance:,.2f}'
+        if balances and ledger_balance != to_money(department.budget):
+            line += f' (departments.budget is {to_money(department.budget):,.2f})'
+        click.echo(line)
@@ -0,0 +1,83 @@
+"""
+Budget Forecast
+What-if projections of scholarship spend against the department budget under alternative award settings
+"""
+import numpy as np
+from routes.eligibility import NO_TIER, classify_many
+
+
+def fund_in_order(amounts, budget):
+    """
+    Which awards approve-all would pay
+
+    Awards are paid in roster order while the remaining budget covers
+    them; one that does not fit is skipped and later, smaller awards may
+    still be paid. Each pass pays an affordable prefix and drops every
+    award larger than what is left, so it ends after at most one pass
+    per distinct amount.
+
+    Args:
+        amounts: award amounts in roster order (0 for no award)
+        budget: budget available before approval
+
+    Returns:
+        numpy.ndarray: bool per award, True where it would be paid
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    paid = np.zeros(amounts.shape, dtype=bool)
+    pending = np.flatnonzero(amounts > 0)
+    remaining = float(budget)
+
+    while len(pending):
+        spent = np.cumsum(amounts[pending])
+        covered = int(np.searchsorted(spent, remaining, side='right'))
+        paid[pending[:covered]] = True
+        if covered == len(pending):
+            break
+        if covered:
+            remaining -= spent[covered - 1]
+        rest = pending[covered:]
+        pending = rest[amounts[rest] <= remaining]
+
+    return paid
+
+
+def simulate_scholarships(policy, roster, budget, scenarios):
+    """
+    Project scholarship approvals for the current policy and each scenario
+
+    Args:
+        policy: the app's AwardPolicy (projected first, as 'Current policy')
+        roster: department RosterSnapshot
+        budget: department budget remaining
+        scenarios: list of (label, AwardPolicy) alternatives
+
+    Returns:
+        list: one dict per setting with eligible and funded counts, spend,
+              per-type counts and the budget left after approval
+    """
+    settings = [('Current policy', policy)] + list(scenarios)
+    rule_sets = [candidate.rules('scholarship') for _, candidate in settings]
+
+    # Exclusions come from awards already made, which no scenario changes
+    awarded = policy.awarded_flags('scholarship', roster)
+    tiers, amounts = classify_many(roster.last_semester_gpa, rule_sets,
+                                   semesters=roster.last_completed_semester, awarded=awarded)
+
+    results = []
+    for (label, _), rules, tier, amount in zip(settings, rule_sets, tiers, amounts):
+        paid = fund_in_order(amount, budget)
+        funded_spend = int(amount[paid].sum())
+        counts = np.bincount(tier[tier != NO_TIER], minlength=len(rules))
+        results.append({
+            'label': label,
+            'rules': [{'type': rule.type, 'min_gpa': rule.min_gpa, 'amount': rule.amount} for rule in reversed(rules)],
+            'eligible_count': int(np.count_nonzero(tier != NO_TIER)),
+            'by_type': {rule.type: int(count) for rule, count in zip(rules, counts)},
+            'projected_spend': int(amount.sum()),
+            'funded_count': int(np.count_nonzero(paid)),
+            'funded_spend': funded_spend,
+            'unfunded_count': int(np.count_nonzero((tier != NO_TIER) & ~paid)),
+            'remaining_budget': float(budget) - funded_spend
+        })
+    return results
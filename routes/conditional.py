@@ -0,0 +1,146 @@
+"""
+Conditional Responses
+ETag revalidation for read-mostly pages: one cheap version query answers If-None-Match with 304 before the view runs
+"""
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import case, func, select
+from models import Admin, Application, Department, RosterVersion, Scholarship, Stipend, User
+from extensions import db
+
+AWARD_TABLES = {'scholarship': Scholarship, 'stipend': Stipend}
+
+
+def _award_columns(model, *conditions):
+    """Scalar subqueries: number of awards, newest id and newest awarded_at (deletions change the count)"""
+    def scalar(column):
+        return select(column).where(*conditions).scalar_subquery()
+    return scalar(func.count(model.id)), scalar(func.max(model.id)), scalar(func.max(model.awarded_at))
+
+
+def _newest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def student_pages_version():
+    """
+    Version of the current student's academic record and awards
+
+    Returns:
+        (token, last_modified) or None for admins
+    """
+    if isinstance(current_user, Admin):
+        return None
+    student_id = current_user.student_id
+    columns = [select(RosterVersion.version).where(RosterVersion.dept_id == current_user.dept_id).scalar_subquery()]
+    for model in AWARD_TABLES.values():
+        columns.extend(_award_columns(model, model.student_id == student_id))
+    row = db.session.execute(select(*columns)).one()
+    return tuple(row), _newest(row[3], row[6])
+
+
+def department_awards_version(kind):
+    """
+    Version of the current admin's department awards of one kind and its budget
+
+    Returns:
+        (token, last_modified) or None for students
+    """
+    if not isinstance(current_user, Admin):
+        return None
+    model = AWARD_TABLES[kind]
+    dept_id = current_user.dept_id
+    in_department = model.student_id.in_(select(User.student_id).where(User.dept_id == dept_id))
+    row = db.session.execute(select(
+        select(RosterVersion.version).where(RosterVersion.dept_id == dept_id).scalar_subquery(),
+        select(Department.budget).where(Department.id == dept_id).scalar_subquery(),
+        *_award_columns(model, in_department)
+    )).one()
+    return tuple(row), row[4]
+
+
+def department_version(dept_id, kinds=(), applications=False):
+    """
+    One query: a department's roster version, counters of its awards of some kinds and, optionally, of its applications
+
+    Used as fragment cache keys; status changes of applications move the pending and approved counts.
+    """
+    in_department = select(User.student_id).where(User.dept_id == dept_id)
+    columns = [select(RosterVersion.version).where(RosterVersion.dept_id == dept_id).scalar_subquery()]
+    for kind in kinds:
+        model = AWARD_TABLES[kind]
+        columns.extend(_award_columns(model, model.student_id.in_(in_department)))
+    if applications:
+        def scalar(column):
+            return select(column).where(Application.student_id.in_(in_department)).scalar_subquery()
+        columns.extend([
+            scalar(func.count(Application.id)),
+            scalar(func.max(Application.id)),
+            scalar(func.sum(case((Application.status == 'Pending', 1), else_=0))),
+            scalar(func.sum(case((Application.status == 'Approved', 1), else_=0))),
+            scalar(func.max(Application.updated_at))
+        ])
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def deployment_salt():
+    """Changes with the award policy and templates, so a deploy does not revalidate old pages"""
+    app = current_app._get_current_object()
+    salt = app.extensions.get('conditional_salt')
+    if salt is None:
+        mtimes = [
+            os.path.getmtime(os.path.join(folder, name))
+            for folder, _, names in os.walk(os.path.join(app.root_path, app.template_folder))
+            for name in names
+        ]
+        content = f"{app.config.get('AWARD_POLICY')!r}|{max(mtimes, default=0)}"
+        salt = app.extensions.setdefault('conditional_salt', hashlib.sha1(content.encode()).hexdigest())
+    return salt
+
+
+def _revalidate_only(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Stored by the browser, but checked with the server on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+
+def conditional(version, *args):
+    """
+    Serve a GET page with an ETag and answer a matching If-None-Match with 304 without running the view
+
+    version(*args) returns a cheap (token, last_modified) for what the page
+    shows, or None to always run the view. The ETag also covers the
+    user, URL and display name. Requests with flash messages waiting are
+    rendered normally so the messages are shown. If-Modified-Since alone
+    is not honoured: deleting an award does not move the newest timestamp.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_view(*view_args, **view_kwargs):
+            if not current_app.config.get('CONDITIONAL_RESPONSES', True) or session.get('_flashes'):
+                return view(*view_args, **view_kwargs)
+            current = version(*args)
+            if current is None:
+                return view(*view_args, **view_kwargs)
+
+            token, last_modified = current
+            key = f'{deployment_salt()}|{current_user.get_id()}|{current_user.name}|{request.full_path}|{token!r}'
+            etag = hashlib.sha1(key.encode()).hexdigest()
+            if request.if_none_match.contains(etag):
+                return _revalidate_only(current_app.response_class(status=304), etag, last_modified)
+
+            response = current_app.make_response(view(*view_args, **view_kwargs))
+            if response.status_code == 200:
+                _revalidate_only(response, etag, last_modified)
+            return response
+        return decorated_view
+    return decorator
@@ -0,0 +1,32 @@
+"""
+Version Counters
+Atomic increments of per-key change counters (principal_versions, roster_versions)
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, sqlite
+
+
+def increment_counters(db_session, model, keys):
+    """
+    Add 1 to the version of each key in one upsert, creating missing rows at 1
+
+    Runs in the caller's transaction. Two transactions creating the same
+    key both succeed instead of one failing with a duplicate key.
+
+    Args:
+        model: counter model with a single-column primary key and a version column
+        keys: primary key values
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    key_column = model.__mapper__.primary_key[0]
+    rows = [{key_column.name: key, 'version': 1} for key in keys]
+
+    if db_session.get_bind(model.__mapper__).dialect.name == 'mysql':
+        statement = mysql.insert(model).values(rows).on_duplicate_key_update(
+            version=model.version + 1, updated_at=func.current_timestamp())
+    else:
+        statement = sqlite.insert(model).values(rows).on_conflict_do_update(
+            index_elements=[key_column], set_={'version': model.version + 1, 'updated_at': func.current_timestamp()})
+    db_session.execute(statement)
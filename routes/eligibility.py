@@ -0,0 +1,112 @@
+"""
+Award Eligibility
+Vectorized award tier classification over roster columns
+"""
+import numpy as np
+from models import User
+from extensions import db
+
+# Tier index for "not eligible"
+NO_TIER = -1
+
+
+def classify(gpas, rules, semesters=None, awarded=None):
+    """
+    Classify students into award tiers
+
+    Args:
+        gpas: last-semester GPAs (NaN/None for ungraded)
+        rules: award rules of one kind, lowest min_gpa first (AwardPolicy.rules)
+        semesters: optional last completed semester per student, checked against each rule's window
+        awarded: optional bool array, True for students already holding an excluding award for the semester
+
+    Returns:
+        tuple: (tier index array into rules, NO_TIER where not eligible; amount array, 0 where not eligible)
+    """
+    gpas = np.nan_to_num(np.asarray(gpas, dtype=np.float64), nan=-1.0)
+    tier = np.full(gpas.shape, NO_TIER, dtype=np.int64)
+
+    # Later (higher) rules overwrite earlier ones
+    for index, rule in enumerate(rules):
+        eligible = gpas >= rule.min_gpa
+        if semesters is not None:
+            semesters = np.asarray(semesters)
+            eligible &= (semesters >= rule.first_semester) & (semesters <= rule.last_semester)
+        tier[eligible] = index
+
+    if awarded is not None:
+        tier[np.asarray(awarded, dtype=bool)] = NO_TIER
+
+    # NO_TIER (-1) indexes the trailing zero
+    amounts = np.array([rule.amount for rule in rules] + [0], dtype=np.float64)[tier]
+    return tier, amounts
+
+
+def classify_many(gpas, rule_sets, semesters=None, awarded=None):
+    """
+    classify() for several alternative rule sets at once
+
+    Args:
+        rule_sets: K lists of award rules of one kind, each lowest min_gpa first
+                   and all of the same length
+
+    Returns:
+        tuple: (K x N tier array, K x N amount array)
+    """
+    gpas = np.nan_to_num(np.asarray(gpas, dtype=np.float64), nan=-1.0)
+    min_gpas = np.array([[rule.min_gpa for rule in rules] for rules in rule_sets], dtype=np.float64)
+    firsts = np.array([[rule.first_semester for rule in rules] for rules in rule_sets], dtype=np.int64)
+    lasts = np.array([[rule.last_semester for rule in rules] for rules in rule_sets], dtype=np.int64)
+    tier = np.full((len(rule_sets), gpas.shape[0]), NO_TIER, dtype=np.int64)
+
+    # One pass per tier position, each comparing every scenario against every student
+    for index in range(min_gpas.shape[1]):
+        eligible = gpas[None, :] >= min_gpas[:, index, None]
+        if semesters is not None:
+            semesters = np.asarray(semesters)
+            eligible &= (semesters[None, :] >= firsts[:, index, None]) & (semesters[None, :] <= lasts[:, index, None])
+        tier[eligible] = index
+
+    if awarded is not None:
+        tier[:, np.asarray(awarded, dtype=bool)] = NO_TIER
+
+    # NO_TIER (-1) indexes each row's trailing zero
+    table = np.array([[rule.amount for rule in rules] + [0] for rules in rule_sets], dtype=np.float64)
+    amounts = np.take_along_axis(table, tier % table.shape[1], axis=1)
+    return tier, amounts
+
+
+def semester_number(semester_name):
+    """'Semester 4' -> 4 (None if the name has another form)"""
+    try:
+        return int(str(semester_name).rsplit(' ', 1)[-1])
+    except ValueError:
+        return None
+
+
+def awarded_semesters(model, dept_id):
+    """(student_id, semester) pairs already holding a Scholarship/Stipend in a department"""
+    rows = db.session.query(model.student_id, model.semester).join(
+        User, model.student_id == User.student_id
+    ).filter(User.dept_id == dept_id).all()
+    return {(student_id, semester) for student_id, semester in rows}
+
+
+def prior_award_flags(student_ids, semesters, awarded):
+    """
+    Whether each student already holds an award for the given semester
+
+    Args:
+        student_ids: int array
+        semesters: int array of semester numbers, aligned with student_ids
+        awarded: iterable of (student_id, semester name) pairs
+
+    Returns:
+        numpy.ndarray: bool per student
+    """
+    keys = [student_id * 100 + number for student_id, name in awarded
+            if (number := semester_number(name)) is not None]
+    student_keys = np.asarray(student_ids, dtype=np.int64) * 100 + np.asarray(semesters, dtype=np.int64)
+    if not keys:
+        return np.zeros(student_keys.shape, dtype=bool)
+    return np.isin(student_keys, np.array(keys, dtype=np.int64))
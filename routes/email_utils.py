@@ -2,10 +2,41 @@
 Email Utility Functions
 Handles sending email notifications
 """
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from flask_mail import Message
 from flask import current_app
 from extensions import mail
 
+_outbox_lock = threading.Lock()
+
+
+def queue_email(send, *args):
+    """
+    Send a notification on a background thread so the request can return first
+
+    Args:
+        send: one of the send_*_email functions
+        *args: its arguments
+    """
+    app = current_app._get_current_object()
+    with _outbox_lock:
+        outbox, pid = app.extensions.get('email_outbox', (None, None))
+        if outbox is None or pid != os.getpid():
+            # Recreated after a fork; the pool's threads do not survive it
+            outbox = ThreadPoolExecutor(max_workers=app.config['EMAIL_QUEUE_WORKERS'], thread_name_prefix='email')
+            app.extensions['email_outbox'] = (outbox, os.getpid())
+
+    def deliver():
+        with app.app_context():
+            try:
+                send(*args)
+            except Exception as e:
+                print(f"Failed to send queued email to {args[0]}: {str(e)}")
+
+    outbox.submit(deliver)
+
 
 def send_scholarship_approval_email(student_email, student_name, scholarship_type, amount, semester):
     """Send email notification when scholarship is approved"""
@@ -0,0 +1,166 @@
+"""
+Template Fragment Cache
+{% cache key, ttl %}...{% endcache %} for Jinja, backed by an in-process LRU, a directory or Redis
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from routes.conditional import deployment_salt
+
+
+class MemoryStore:
+    """Bounded LRU of rendered fragments in this worker"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileSystemStore:
+    """Fragments as files in a directory shared by all workers (first line: expiry time)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as fragment:
+                expires = float(fragment.readline())
+                if expires < time.time():
+                    return None
+                return fragment.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ttl):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as fragment:
+            fragment.write(f'{time.time() + ttl}\n{value}')
+        os.replace(temporary, self._path(key))
+
+
+class RedisStore:
+    """Fragments in Redis (or any server speaking its protocol); needs the redis package"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("FRAGMENT_CACHE_STORE = 'redis' needs the redis package (pip install redis)")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(f'fragment:{key}')
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(f'fragment:{key}', int(ttl), value.encode('utf-8'))
+
+
+class NullStore:
+    """Caching turned off: every fragment is rendered"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+
+def build_fragment_store(config):
+    """
+    Store named by FRAGMENT_CACHE_STORE: 'memory', 'filesystem', 'redis' or 'none'
+
+    Raises:
+        ValueError: for an unknown store name
+    """
+    store = config.get('FRAGMENT_CACHE_STORE', 'memory')
+    if store == 'memory':
+        return MemoryStore(config.get('FRAGMENT_CACHE_SIZE', 1000))
+    if store == 'filesystem':
+        return FileSystemStore(config['FRAGMENT_CACHE_DIR'])
+    if store == 'redis':
+        return RedisStore(config['FRAGMENT_CACHE_REDIS_URL'])
+    if store == 'none':
+        return NullStore()
+    raise ValueError(f"Unknown FRAGMENT_CACHE_STORE {store!r}")
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache key %}...{% endcache %} or {% cache key, ttl %}...{% endcache %}
+
+    The body is rendered once per key and served from the store until ttl
+    (default FRAGMENT_CACHE_TTL) seconds pass. Keys should include the
+    version counters of the data the body shows, so writes start a new
+    entry instead of waiting out the ttl. The template name and line are
+    added automatically, and so is the deployment salt (award policy and
+    template modification times), so a deploy never serves old markup.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=NullStore(), fragment_cache_ttl=300)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        args.append(nodes.Const(f'{parser.name}:{lineno}'))
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', args), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, ttl, location, caller):
+        environment = self.environment
+        store = environment.fragment_cache
+        # Keys are hashed, so any repr-able value (tuples of counters, snapshot rows) can be used
+        digest = hashlib.sha1(f'{deployment_salt()}|{location}|{key!r}'.encode()).hexdigest()
+
+        value = store.get(digest)
+        if value is None:
+            value = caller()
+            store.set(digest, str(value), ttl or environment.fragment_cache_ttl)
+        return Markup(value)
+
+
+def init_fragment_cache(app):
+    """Enable {% cache %} in the app's templates with the configured store"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = build_fragment_store(app.config)
+    app.jinja_env.fragment_cache_ttl = app.config.get('FRAGMENT_CACHE_TTL', 300)
@@ -0,0 +1,228 @@
+"""
+GPA Charts
+Content-addressed cache of the /academics charts, rendered on a background thread
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+# Bump when the chart drawing changes, so cached images are not reused
+CHART_STYLE = 1
+
+CHART_NAMES = ('progression', 'bar')
+
+# The graded semesters of one academic record, as drawn
+GpaSeries = namedtuple('GpaSeries', ['semesters', 'gpas', 'cgpa'])
+
+
+def gpa_series(academic_record):
+    """Semester labels and GPAs of the completed semesters that have a GPA, and the CGPA"""
+    semesters = []
+    gpas = []
+    for i in range(1, academic_record.current_semester):
+        gpa = getattr(academic_record, f'semester_{i}_gpa', None)
+        if gpa is not None:
+            semesters.append(f'S{i}')
+            gpas.append(gpa)
+    return GpaSeries(tuple(semesters), tuple(gpas), academic_record.cgpa)
+
+
+def chart_key(series):
+    """SHA-256 of everything the charts show; identical records share their images"""
+    content = f'{CHART_STYLE}|{series.semesters!r}|{series.gpas!r}|{series.cgpa!r}'
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _png(figure):
+    image = io.BytesIO()
+    figure.savefig(image, format='png', bbox_inches='tight', dpi=100)
+    return image.getvalue()
+
+
+def render_gpa_charts(series):
+    """
+    Draw the progression line chart and the semester bar chart
+
+    Uses matplotlib's object API (no pyplot state), so it is safe off the
+    request thread.
+
+    Returns:
+        dict: {'progression': PNG bytes, 'bar': PNG bytes}
+    """
+    # Imported here so workers that never draw a chart do not load matplotlib
+    from matplotlib.figure import Figure
+    
+    semesters, gpas, cgpa = series
+
+    # Calculate dynamic y-axis limits
+    y_min = max(0, min(gpas) - 0.1)  # Add padding below lowest
+    y_max = min(4.0, max(gpas) + 0.1)  # Add padding above highest
+
+    # Line chart - GPA Progression
+    figure = Figure(figsize=(7, 4))
+    axes = figure.subplots()
+    axes.plot(semesters, gpas, marker='o', linewidth=2, markersize=8, color='#2196f3')
+    axes.axhline(y=cgpa, color='#4caf50', linestyle='--', label=f'CGPA: {cgpa:.2f}')
+    axes.set_xlabel('Semester', fontsize=10)
+    axes.set_ylabel('GPA', fontsize=10)
+    axes.set_ylim(y_min, y_max)
+    axes.legend(fontsize=9)
+    axes.grid(axis='y', alpha=0.3, linestyle='--')
+    progression = _png(figure)
+
+    # Bar chart - Semester Comparison
+    figure = Figure(figsize=(7, 4))
+    axes = figure.subplots()
+    colors = ['#4caf50' if gpa >= 3.8 else '#2196f3' if gpa >= 3.5 else '#ff9800' if gpa >= 3.0 else '#f44336' for gpa in gpas]
+    bars = axes.bar(semesters, gpas, color=colors, alpha=0.8)
+    axes.axhline(y=cgpa, color='#9c27b0', linestyle='--', linewidth=2, label=f'CGPA: {cgpa:.2f}')
+
+    # Add value labels on top of bars
+    for bar, gpa in zip(bars, gpas):
+        axes.text(bar.get_x() + bar.get_width() / 2., bar.get_height(), f'{gpa:.2f}',
+                  ha='center', va='bottom', fontsize=9, fontweight='bold')
+
+    axes.set_xlabel('Semester', fontsize=10)
+    axes.set_ylabel('GPA', fontsize=10)
+    axes.set_ylim(y_min, y_max)
+    axes.legend(fontsize=9)
+    axes.grid(axis='y', alpha=0.3, linestyle='--')
+    bar_chart = _png(figure)
+
+    return {'progression': progression, 'bar': bar_chart}
+
+
+class ChartCache:
+    """
+    Rendered charts by content key: a bounded LRU in memory, optionally
+    backed by a directory shared by all workers
+    """
+
+    def __init__(self, max_entries, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, f'{key}-{name}.png')
+
+    def get(self, key):
+        """{name: PNG bytes} for a key, or None if it has not been rendered"""
+        with self._lock:
+            charts = self._entries.get(key)
+            if charts is not None:
+                self._entries.move_to_end(key)
+                return charts
+
+        if not self.directory:
+            return None
+        try:
+            charts = {}
+            for name in CHART_NAMES:
+                with open(self._path(key, name), 'rb') as image:
+                    charts[name] = image.read()
+        except OSError:
+            return None
+        self._remember(key, charts)
+        return charts
+
+    def put(self, key, charts):
+        """Store rendered charts (files are written whole, then renamed into place)"""
+        if self.directory:
+            for name, png in charts.items():
+                handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(handle, 'wb') as image:
+                    image.write(png)
+                os.replace(temporary, self._path(key, name))
+        self._remember(key, charts)
+
+    def _remember(self, key, charts):
+        with self._lock:
+            self._entries[key] = charts
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def get_chart_cache():
+    """This app's chart cache (GPA_CHART_CACHE_SIZE entries, GPA_CHART_CACHE_DIR on disk if set)"""
+    cache = current_app.extensions.get('gpa_charts')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault('gpa_charts', ChartCache(
+            config['GPA_CHART_CACHE_SIZE'], config.get('GPA_CHART_CACHE_DIR')
+        ))
+    return cache
+
+
+_renderer_lock = threading.Lock()
+
+
+def _renderer(app):
+    state = app.extensions.get('gpa_chart_renderer')
+    if state is None or state['pid'] != os.getpid():
+        with _renderer_lock:
+            state = app.extensions.get('gpa_chart_renderer')
+            if state is None or state['pid'] != os.getpid():
+                # Recreated after a fork; the pool's threads do not survive it
+                state = {
+                    'pid': os.getpid(),
+                    'executor': ThreadPoolExecutor(max_workers=app.config['GPA_CHART_RENDER_WORKERS'],
+                                                   thread_name_prefix='gpa-chart'),
+                    'pending': {}
+                }
+                app.extensions['gpa_chart_renderer'] = state
+    return state
+
+
+def _lookup(series):
+    """(key, cached charts or None, Future of the render started or joined when not cached)"""
+    key = chart_key(series)
+    cache = get_chart_cache()
+    charts = cache.get(key)
+    if charts is not None:
+        return key, charts, None
+
+    state = _renderer(current_app._get_current_object())
+    with _renderer_lock:
+        future = state['pending'].get(key)
+        if future is None:
+            def render():
+                try:
+                    charts = render_gpa_charts(series)
+                    cache.put(key, charts)
+                    return charts
+                finally:
+                    with _renderer_lock:
+                        state['pending'].pop(key, None)
+            future = state['pending'][key] = state['executor'].submit(render)
+    return key, None, future
+
+
+def schedule_charts(series):
+    """Start rendering a series' charts in the background unless they are cached; returns their key"""
+    if not series.gpas:
+        return chart_key(series)
+    key, _, _ = _lookup(series)
+    return key
+
+
+def get_chart(series, name):
+    """
+    PNG bytes of one chart, waiting up to GPA_CHART_RENDER_TIMEOUT seconds for a render in progress
+
+    Raises:
+        concurrent.futures.TimeoutError: if the render does not finish in time
+    """
+    _, charts, future = _lookup(series)
+    if charts is None:
+        charts = future.result(timeout=current_app.config['GPA_CHART_RENDER_TIMEOUT'])
+    return charts[name]
@@ -0,0 +1,134 @@
+"""
+Idempotent Requests
+Replays the stored result of an approval request when the client retries it with the same Idempotency-Key
+"""
+import hashlib
+import random
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import IdempotencyKey
+from extensions import db
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 100
+
+# Share of new keys that also delete expired ones
+PRUNE_PROBABILITY = 0.01
+
+
+def new_idempotency_key():
+    """Random key for a page to send with the approval requests it makes"""
+    return uuid.uuid4().hex
+
+
+def request_fingerprint():
+    """SHA-256 of the request method, path and body, to tell a retry from a different request under the same key"""
+    digest = hashlib.sha256(f'{request.method} {request.full_path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def claim_key(scope, key, fingerprint):
+    """
+    Record that a request with this key has started
+
+    Runs on its own connection and commits at once, so concurrent retries
+    see it and the view's own rollbacks cannot undo it. Expired keys and
+    keys whose first request died before storing a result are taken over.
+
+    Returns:
+        IdempotencyKey row of an earlier request, or None if this request claimed the key
+    """
+    table = IdempotencyKey.__table__
+    now = datetime.now()
+    stale_pending = now - timedelta(seconds=current_app.config['IDEMPOTENCY_PENDING_TIMEOUT'])
+
+    with db.engine.begin() as connection:
+        if random.random() < PRUNE_PROBABILITY:
+            connection.execute(delete(table).where(table.c.expires_at < now))
+
+        connection.execute(delete(table).where(
+            table.c.scope == scope, table.c.key == key,
+            (table.c.expires_at < now) | (table.c.status_code.is_(None) & (table.c.created_at < stale_pending))
+        ))
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(insert(table).values(
+                scope=scope, key=key, fingerprint=fingerprint, created_at=now,
+                expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+            ))
+        return None
+    except IntegrityError:
+        with db.engine.connect() as connection:
+            return connection.execute(select(table).where(table.c.scope == scope, table.c.key == key)).first()
+
+
+def store_result(scope, key, response):
+    """Keep the response for replays; server errors release the key so the request can be retried"""
+    table = IdempotencyKey.__table__
+    where = (table.c.scope == scope) & (table.c.key == key)
+    with db.engine.begin() as connection:
+        if response is None or response.status_code >= 500:
+            connection.execute(delete(table).where(where))
+        else:
+            connection.execute(update(table).where(where).values(
+                status_code=response.status_code, response_body=response.get_data(as_text=True)
+            ))
+
+
+def replay(row, fingerprint):
+    """Response for a retried key: the stored result, or why it cannot be given"""
+    if row.fingerprint != fingerprint:
+        return jsonify({'success': False, 'message': f'{HEADER} was already used for a different request'}), 422
+
+    if row.status_code is None:
+        response = jsonify({'success': False, 'message': 'This request is still being processed'})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    response = current_app.response_class(row.response_body, status=row.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Make a JSON approval view safe to retry
+
+    Requests carrying an Idempotency-Key header run once per key, admin and
+    endpoint; repeats within IDEMPOTENCY_TTL get the first result back
+    without running the view again. Requests without the header run as usual.
+    """
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'message': f'{HEADER} is limited to {MAX_KEY_LENGTH} characters'}), 400
+
+        scope = f'{current_user.get_id()}:{request.endpoint}'
+        fingerprint = request_fingerprint()
+        earlier = claim_key(scope, key, fingerprint)
+        if earlier is not None:
+            return replay(earlier, fingerprint)
+
+        response = None
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        finally:
+            store_result(scope, key, response)
+        return response
+    return decorated_view
+
+
+def init_idempotency(app):
+    """Let templates mint keys for the approval requests they send"""
+    app.jinja_env.globals['idempotency_key'] = new_idempotency_key
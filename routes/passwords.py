@@ -0,0 +1,158 @@
+"""
+Password Hashing
+Hashes and verifies passwords on a bounded thread pool and upgrades legacy plaintext rows
+"""
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import Admin, User
+from extensions import db
+from routes.principals import principal_key, revoke_principals
+
+# Prefixes written by werkzeug for the methods we support
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """Return this worker's hashing pool (recreated after a fork)"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('PASSWORD_HASH_WORKERS', 2),
+                    thread_name_prefix='password-hash'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def is_password_hash(stored):
+    """Whether a stored password is a werkzeug hash rather than legacy plaintext"""
+    return stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    """Normalized method string as written into hashes (e.g. 'scrypt' -> 'scrypt:32768:8:1')"""
+    return generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+
+
+def needs_rehash(stored, method):
+    """Whether a stored password is plaintext or hashed with a different method/cost"""
+    return not is_password_hash(stored) or stored.split('$', 1)[0] != _method_prefix(method)
+
+
+def hash_password(password, method=None):
+    """Hash a password with the configured method (runs on the calling thread)"""
+    return generate_password_hash(password, method=method or current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def check_password(stored, password):
+    """Compare a candidate password with a stored hash or legacy plaintext value"""
+    if is_password_hash(stored):
+        return check_password_hash(stored, password)
+    return hmac.compare_digest(stored.encode(), password.encode())
+
+
+def verify_password(user, password):
+    """
+    Check a login password for an admin/student
+
+    Verification runs on the bounded hashing pool so a burst of logins
+    cannot occupy every CPU. Plaintext or outdated hashes are rehashed
+    in the background after a successful check.
+
+    Returns:
+        bool: True if the password matches
+    """
+    if not password:
+        return False
+
+    stored = user.password
+    if not get_hash_executor().submit(check_password, stored, password).result():
+        return False
+
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if current_app.config.get('PASSWORD_REHASH_ON_LOGIN', True) and needs_rehash(stored, method):
+        schedule_rehash(user, stored, password, method)
+    return True
+
+
+def schedule_rehash(user, stored, password, method):
+    """Replace a user's stored password with a fresh hash on the hashing pool"""
+    app = current_app._get_current_object()
+    model = type(user)
+    pk_column = model.__mapper__.primary_key[0]
+    pk = inspect(user).identity[0]
+
+    def rehash():
+        try:
+            new_hash = hash_password(password, method)
+            with app.app_context():
+                # Only replace the value we verified, never a password changed in the meantime
+                result = db.session.execute(
+                    db.update(model).where(pk_column == pk, model.password == stored).values(password=new_hash)
+                )
+                if result.rowcount:
+                    revoke_principals(db.session, [principal_key(model, pk)])
+                db.session.commit()
+        except Exception as e:
+            print(f"Failed to rehash password for {model.__tablename__} {pk}: {str(e)}")
+
+    get_hash_executor().submit(rehash)
+
+
+def legacy_password_filter(model):
+    """SQL filter matching rows whose password is still plaintext"""
+    return db.and_(*[model.password.notlike(f'{prefix}%') for prefix in HASH_PREFIXES])
+
+
+@click.command('hash-passwords')
+@click.option('--batch-size', default=500, show_default=True, help='Rows hashed and committed per batch')
+@with_appcontext
+def hash_passwords_command(batch_size):
+    """Hash every remaining plaintext admin and student password in batches"""
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    executor = get_hash_executor()
+
+    for model in (Admin, User):
+        pk_column = model.__mapper__.primary_key[0]
+        last_pk = None
+        converted = 0
+
+        while True:
+            query = db.select(pk_column, model.password).where(legacy_password_filter(model))
+            if last_pk is not None:
+                query = query.where(pk_column > last_pk)
+            rows = db.session.execute(query.order_by(pk_column).limit(batch_size)).all()
+            if not rows:
+                break
+
+            hashes = executor.map(lambda row: hash_password(row[1], method), rows)
+            hashed = []
+            for (pk, plaintext), new_hash in zip(rows, hashes):
+                result = db.session.execute(
+                    db.update(model).where(pk_column == pk, model.password == plaintext).values(password=new_hash)
+                )
+                if result.rowcount:
+                    hashed.append(principal_key(model, pk))
+            revoke_principals(db.session, hashed)
+            db.session.commit()
+
+            last_pk = rows[-1][0]
+            converted += len(rows)
+            click.echo(f'{model.__tablename__}: {converted} passwords hashed')
+
+        click.echo(f'{model.__tablename__}: done ({converted} converted)')
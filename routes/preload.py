@@ -0,0 +1,30 @@
+"""
+Preload
+Imports the libraries only charts and exports use, ahead of time in a server that forks workers from a loaded master
+"""
+import importlib
+
+# Imported on first use by routes/analytics.py, routes/gpa_charts.py and routes/reports.py
+HEAVY_MODULES = (
+    'matplotlib.figure',
+    'matplotlib.backends.backend_agg',
+    'openpyxl',
+    'openpyxl.styles',
+    'reportlab.platypus',
+    'reportlab.lib.styles',
+)
+
+
+def preload_heavy_modules():
+    """
+    Import HEAVY_MODULES and load matplotlib's font list once
+
+    Call in the master before forking (e.g. gunicorn with preload_app), so
+    workers share the loaded modules copy-on-write instead of each paying
+    for them on its first chart or export. Worker processes started
+    without a loaded master should not call this.
+    """
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    from matplotlib import font_manager
+    font_manager.findfont('DejaVu Sans')
@@ -0,0 +1,205 @@
+"""
+Principal Lookup & Cache
+Resolves login identifiers and serves the logged-in admin/student from the signed session
+"""
+import threading
+import time
+import click
+from flask import current_app, session
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, inspect, literal, null, union_all
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import Admin, User, PrincipalVersion
+from extensions import db
+from routes.counters import increment_counters
+
+SESSION_KEY = '_principal'
+
+# Columns kept in the session for each principal type (never the password)
+CACHED_FIELDS = {
+    'admin': ('id', 'name', 'dept_id', 'email'),
+    'student': ('student_id', 'reg_no', 'dept_id', 'name', 'session', 'email'),
+}
+PRINCIPAL_MODELS = {'admin': Admin, 'student': User}
+
+# Changing any of these revokes the principal's cached copies
+REVOKING_FIELDS = ('password', 'dept_id', 'email')
+
+# Revocation counters shared by all requests in this worker
+_versions = {}
+_versions_loaded_at = 0.0
+_versions_lock = threading.Lock()
+
+
+def get_principal_versions():
+    """Return {principal_id: version}, re-read from the database at most every PRINCIPAL_VERSION_TTL seconds"""
+    global _versions, _versions_loaded_at
+    ttl = current_app.config.get('PRINCIPAL_VERSION_TTL', 5)
+    if time.monotonic() - _versions_loaded_at >= ttl:
+        with _versions_lock:
+            if time.monotonic() - _versions_loaded_at >= ttl:
+                rows = db.session.query(PrincipalVersion.principal_id, PrincipalVersion.version).all()
+                _versions = dict(rows)
+                _versions_loaded_at = time.monotonic()
+    return _versions
+
+
+def cache_principal(user):
+    """Store the non-secret columns of a freshly loaded admin/student in the session"""
+    if not current_app.config.get('PRINCIPAL_CACHE', True):
+        return
+
+    principal_type = 'admin' if isinstance(user, Admin) else 'student'
+    principal_id = user.get_id()
+
+    session[SESSION_KEY] = {
+        'uid': principal_id,
+        'type': principal_type,
+        'ver': get_principal_versions().get(principal_id, 0),
+        'at': int(time.time()),
+        'fields': {field: getattr(user, field) for field in CACHED_FIELDS[principal_type]}
+    }
+
+
+def load_cached_principal(user_id):
+    """Rebuild the admin/student for user_id from the session, or None if there is no valid entry"""
+    if not current_app.config.get('PRINCIPAL_CACHE', True):
+        return None
+
+    entry = session.get(SESSION_KEY)
+    if not entry or entry.get('uid') != user_id:
+        return None
+
+    # Expired, or revoked since it was cached
+    if time.time() - entry.get('at', 0) > current_app.config.get('PRINCIPAL_CACHE_MAX_AGE', 3600):
+        return None
+    if entry.get('ver') != get_principal_versions().get(user_id, 0):
+        return None
+
+    model = PRINCIPAL_MODELS.get(entry.get('type'))
+    if model is None:
+        return None
+
+    return attach_principal(model, entry['fields'])
+
+
+def attach_principal(model, fields):
+    """Attach an admin/student built from already-fetched columns to the session without a SELECT"""
+    principal = model(**fields)
+    make_transient_to_detached(principal)
+
+    # Columns not in fields (password, timestamps) load on first access
+    return db.session.merge(principal, load=False)
+
+
+def _principal_branch(model, priority, kind, key_column, match):
+    """One UNION branch of the login lookup, shaped the same for admins and students"""
+    is_admin = model is Admin
+    return db.select(
+        literal(priority).label('priority'), literal(kind).label('kind'), key_column.label('pk'),
+        null().label('reg_no') if is_admin else model.reg_no, model.dept_id, model.name,
+        null().label('session') if is_admin else model.session, model.email, model.password
+    ).where(match)
+
+
+# Built once; only the bound identifier changes between logins
+LOGIN_LOOKUP = union_all(
+    _principal_branch(Admin, 0, 'admin', Admin.id, Admin.email == bindparam('identifier')),
+    _principal_branch(User, 1, 'student', User.student_id, User.email == bindparam('identifier')),
+    _principal_branch(User, 2, 'student', User.student_id, User.student_id == bindparam('student_id'))
+).order_by('priority').limit(1)
+
+
+def resolve_principal(identifier):
+    """
+    Find the admin or student for a login identifier in one query
+    
+    Lookup order matches the login form: admin email, then student email,
+    then student ID. Each UNION branch hits a unique index.
+    
+    Returns:
+        Admin, User or None
+    """
+    if not identifier:
+        return None
+
+    # Only numeric identifiers can be student IDs
+    try:
+        student_id = int(identifier)
+    except ValueError:
+        student_id = None
+
+    row = db.session.execute(LOGIN_LOOKUP, {'identifier': identifier, 'student_id': student_id}).first()
+    if row is None:
+        return None
+
+    if row.kind == 'admin':
+        return attach_principal(Admin, {
+            'id': row.pk, 'name': row.name, 'dept_id': row.dept_id,
+            'email': row.email, 'password': row.password
+        })
+    return attach_principal(User, {
+        'student_id': row.pk, 'reg_no': row.reg_no, 'dept_id': row.dept_id, 'name': row.name,
+        'session': row.session, 'email': row.email, 'password': row.password
+    })
+
+
+def clear_cached_principal():
+    """Remove the cached principal from the session"""
+    session.pop(SESSION_KEY, None)
+
+
+def principal_key(model, pk):
+    """Principal ID (as get_id() returns it) of an admin/student primary key"""
+    return f"{'admin' if model is Admin else 'student'}_{pk}"
+
+
+def revoke_principals(db_session, principal_ids):
+    """
+    Bump the version counters of principal_ids in the caller's transaction
+
+    Cached copies stop being served once it commits: in this worker right
+    away, in others within PRINCIPAL_VERSION_TTL seconds. ORM changes to
+    REVOKING_FIELDS are handled by a flush hook; call this for bulk UPDATEs.
+    """
+    if principal_ids:
+        increment_counters(db_session, PrincipalVersion, principal_ids)
+        db_session.info['principals_revoked'] = True
+
+
+def revoke_principal(principal_id):
+    """Bump the version counter so cached copies of principal_id stop being served"""
+    revoke_principals(db.session, [principal_id])
+    db.session.commit()
+
+
+@db.event.listens_for(Session, 'before_flush')
+def _revoke_changed_principals(db_session, flush_context, instances):
+    # Counters change in the same transaction as the credentials they describe
+    changed = {obj.get_id() for obj in db_session.deleted if isinstance(obj, (Admin, User))}
+    changed.update(
+        obj.get_id() for obj in db_session.dirty
+        if isinstance(obj, (Admin, User)) and any(inspect(obj).attrs[field].history.has_changes() for field in REVOKING_FIELDS)
+    )
+    revoke_principals(db_session, changed)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _reload_principal_versions(db_session):
+    global _versions_loaded_at
+    if db_session.info.pop('principals_revoked', False):
+        _versions_loaded_at = 0.0
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _forget_revoked_principals(db_session):
+    db_session.info.pop('principals_revoked', None)
+
+
+@click.command('revoke-principal')
+@click.argument('principal_id')
+@with_appcontext
+def revoke_principal_command(principal_id):
+    """Invalidate cached logins for PRINCIPAL_ID (e.g. admin_1 or student_2252421061)"""
+    revoke_principal(principal_id)
+    click.echo(f'Revoked cached sessions for {principal_id}')
@@ -0,0 +1,147 @@
+"""
+Login Rate Limiting
+Token buckets per client IP and per login identifier, checked before any database query
+"""
+import os
+import sqlite3
+import threading
+import time
+from flask import current_app, request
+
+# Buckets idle this long are full again and can be dropped
+IDLE_SECONDS = 3600
+PRUNE_EVERY = 1000
+
+
+def consume(limits, states, now):
+    """
+    Take one token from every bucket, or from none
+
+    Args:
+        limits: list of (key, capacity, tokens per second)
+        states: {key: (tokens, updated)} as last stored
+        now: current unix time
+
+    Returns:
+        tuple: (allowed, seconds until allowed, {key: (tokens, updated)} to store)
+    """
+    new_states = {}
+    retry_after = 0
+    for key, capacity, rate in limits:
+        tokens = capacity
+        if key in states:
+            tokens, updated = states[key]
+            tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            retry_after = max(retry_after, (1 - tokens) / rate)
+        new_states[key] = (tokens - 1, now)
+
+    if retry_after:
+        return False, retry_after, {}
+    return True, 0, new_states
+
+
+class MemoryBucketStore:
+    """Buckets held in this process (development server / single worker)"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._takes = 0
+
+    def take(self, limits, now):
+        with self._lock:
+            states = {key: self._buckets[key] for key, _, _ in limits if key in self._buckets}
+            allowed, retry_after, new_states = consume(limits, states, now)
+            self._buckets.update(new_states)
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                self._buckets = {key: state for key, state in self._buckets.items()
+                                 if state[1] >= now - IDLE_SECONDS}
+        return allowed, retry_after
+
+
+class FileBucketStore:
+    """Buckets in a local SQLite file shared by every worker process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('pragma journal_mode=wal')
+            conn.execute('pragma synchronous=normal')
+            conn.execute('create table if not exists buckets '
+                         '(key text primary key, tokens real not null, updated real not null)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def take(self, limits, now):
+        conn = self._connection()
+        keys = [key for key, _, _ in limits]
+
+        conn.execute('begin immediate')
+        try:
+            rows = conn.execute(
+                f'select key, tokens, updated from buckets where key in ({", ".join("?" * len(keys))})', keys
+            ).fetchall()
+            allowed, retry_after, new_states = consume(limits, {key: (tokens, updated) for key, tokens, updated in rows}, now)
+            conn.executemany(
+                'insert into buckets (key, tokens, updated) values (?, ?, ?) '
+                'on conflict(key) do update set tokens = excluded.tokens, updated = excluded.updated',
+                [(key, tokens, updated) for key, (tokens, updated) in new_states.items()]
+            )
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                conn.execute('delete from buckets where updated < ?', (now - IDLE_SECONDS,))
+            conn.execute('commit')
+        except Exception:
+            conn.execute('rollback')
+            raise
+        return allowed, retry_after
+
+
+def get_bucket_store():
+    """Return the app's bucket store, created from RATE_LIMIT_STORAGE on first use"""
+    store = current_app.extensions.get('rate_limit_store')
+    if store is None:
+        storage = current_app.config.get('RATE_LIMIT_STORAGE', 'memory')
+        store = MemoryBucketStore() if storage == 'memory' else FileBucketStore(storage)
+        current_app.extensions['rate_limit_store'] = store
+    return store
+
+
+def check_login_rate_limit(identifier):
+    """
+    Spend one login attempt for the client IP and the submitted identifier
+
+    The client IP is request.remote_addr, which ProxyFix sets from
+    X-Forwarded-For when TRUSTED_PROXY_HOPS is configured.
+
+    Returns:
+        int: 0 if the attempt may proceed, otherwise seconds to wait
+    """
+    config = current_app.config
+    if not config.get('LOGIN_RATE_LIMIT', True):
+        return 0
+
+    limits = [(f'ip:{request.remote_addr}', config['LOGIN_IP_BURST'], config['LOGIN_IP_PER_MINUTE'] / 60)]
+    if identifier:
+        limits.append((f'id:{identifier.strip().lower()}',
+                       config['LOGIN_IDENTIFIER_BURST'], config['LOGIN_IDENTIFIER_PER_MINUTE'] / 60))
+
+    try:
+        allowed, retry_after = get_bucket_store().take(limits, time.time())
+    except Exception as e:
+        # Never lock everyone out because the limiter store is unavailable
+        print(f"Rate limiter unavailable: {str(e)}")
+        return 0
+
+    return 0 if allowed else max(1, int(retry_after + 0.999))
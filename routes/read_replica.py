@@ -0,0 +1,121 @@
+"""
+Read Replica
+Sends the reads of reports and analytics to REPLICA_DATABASE_URL while it is reachable and within REPLICA_MAX_LAG seconds
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g
+from sqlalchemy.exc import DBAPIError, OperationalError
+from extensions import db
+
+REPLICA_BIND = 'replica'
+
+
+def replica_lag(connection):
+    """
+    Seconds the replica is behind its source
+
+    Returns 0 where the database cannot tell (not a MySQL replica, e.g. a
+    SQLite stand-in) and None when replication is stopped.
+    """
+    if connection.dialect.name != 'mysql':
+        return 0
+    try:
+        row = connection.exec_driver_sql('SHOW REPLICA STATUS').mappings().first()
+        column = 'Seconds_Behind_Source'
+    except DBAPIError:
+        # MySQL before 8.0.22
+        row = connection.exec_driver_sql('SHOW SLAVE STATUS').mappings().first()
+        column = 'Seconds_Behind_Master'
+    return row[column] if row is not None else 0
+
+
+class ReadReplica:
+    """
+    Health of one worker's replica engine
+
+    The lag is checked at most every REPLICA_CHECK_INTERVAL seconds; a
+    replica that is too far behind, stopped or unreachable is skipped
+    (reads go to the primary) until the next check, and an unreachable
+    one for REPLICA_RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._usable = False
+        self._checked_at = None
+        self._down_until = 0
+
+    def engine_for_reads(self):
+        """The replica engine, or None to read from the primary"""
+        now = time.monotonic()
+        if now < self._down_until:
+            return None
+        config = self.app.config
+        if self._checked_at is None or now - self._checked_at >= config['REPLICA_CHECK_INTERVAL']:
+            with self._lock:
+                if self._checked_at is None or now - self._checked_at >= config['REPLICA_CHECK_INTERVAL']:
+                    self._check(now)
+        return db.engines[REPLICA_BIND] if self._usable else None
+
+    def _check(self, now):
+        try:
+            with db.engines[REPLICA_BIND].connect() as connection:
+                lag = replica_lag(connection)
+        except DBAPIError as e:
+            self.mark_down(f"Read replica unavailable, reading from the primary: {str(e)}")
+            return
+        self._checked_at = now
+        self._usable = lag is not None and lag <= self.app.config['REPLICA_MAX_LAG']
+        if not self._usable:
+            print(f"Read replica {'stopped' if lag is None else f'{lag} s behind'}, reading from the primary")
+
+    def mark_down(self, reason):
+        """Skip the replica for REPLICA_RETRY_INTERVAL seconds"""
+        print(reason)
+        self._usable = False
+        self._checked_at = time.monotonic()
+        self._down_until = self._checked_at + self.app.config['REPLICA_RETRY_INTERVAL']
+
+
+@contextmanager
+def replica_reads():
+    """Route the session's SELECTs inside the block to the read replica (if configured and fresh)"""
+    previous = g.get('_replica_reads', False)
+    g._replica_reads = True
+    try:
+        yield
+    finally:
+        g._replica_reads = previous
+
+
+def read_replica(func):
+    """
+    Run a read-only view or function with its reads on the replica
+
+    If a replica query fails, the replica is skipped for a while and the
+    function runs again on the primary. Place it below @login_required so
+    the logged-in user is loaded from the primary.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        g._replica_used = False
+        try:
+            with replica_reads():
+                return func(*args, **kwargs)
+        except OperationalError as e:
+            if not g.pop('_replica_used', False) or 'read_replica' not in current_app.extensions:
+                raise
+            db.session.rollback()
+            current_app.extensions['read_replica'].mark_down(f"Read replica query failed, retrying on the primary: {str(e)}")
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def init_read_replica(app):
+    """Enable replica reads when SQLALCHEMY_BINDS has a 'replica' entry (set from REPLICA_DATABASE_URL)"""
+    if REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        app.extensions['read_replica'] = ReadReplica(app)
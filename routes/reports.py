@@ -4,17 +4,12 @@ Handles Excel and PDF export for students, scholarships, and stipends
 """
 from flask import Blueprint, send_file, flash, redirect, url_for
 from flask_login import login_required, current_user
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4, landscape, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
 from datetime import datetime
 import io
-from models import User, AcademicRecord, Scholarship, Stipend, Department, Admin
+from models import User, Scholarship, Stipend, Department, Admin
 from extensions import db
+from routes.roster import get_roster
+from routes.read_replica import read_replica
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/admin')
 
@@ -23,16 +18,18 @@ reports_bp = Blueprint('reports', __name__, url_prefix='/admin')
 
 @reports_bp.route('/reports/students/excel')
 @login_required
+@read_replica
 def export_students_excel():
     """Export students list to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
     
-    # Get students from admin's department
-    students = db.session.query(User, AcademicRecord).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == current_user.dept_id).all()
+    # Get students from admin's department (cached roster snapshot)
+    students = get_roster(current_user.dept_id).rows()
     
     department = current_user.get_department()
     
@@ -75,16 +72,13 @@ def export_students_excel():
         cell.border = border
     
     # Data rows
-    for student, academic_record in students:
+    for student in students:
         ws.append([
             student.student_id,
             student.name,
             student.email,
-            round(academic_record.cgpa, 2) if academic_record.cgpa else 'N/A',
-            round(academic_record.semester_1_gpa, 2) if academic_record.semester_1_gpa else 'N/A',
-            round(academic_record.semester_2_gpa, 2) if academic_record.semester_2_gpa else 'N/A',
-            round(academic_record.semester_3_gpa, 2) if academic_record.semester_3_gpa else 'N/A',
-            round(academic_record.semester_4_gpa, 2) if academic_record.semester_4_gpa else 'N/A'
+            round(student.cgpa, 2) if student.cgpa else 'N/A',
+            *[round(gpa, 2) if gpa else 'N/A' for gpa in student.semester_gpas[:4]]
         ])
     
     # Style data rows
@@ -117,16 +111,21 @@ def export_students_excel():
 
 @reports_bp.route('/reports/students/pdf')
 @login_required
+@read_replica
 def export_students_pdf():
     """Export students list to PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
     
-    # Get students from admin's department
-    students = db.session.query(User, AcademicRecord).join(
-        AcademicRecord, User.student_id == AcademicRecord.student_id
-    ).filter(User.dept_id == current_user.dept_id).all()
+    # Get students from admin's department (cached roster snapshot)
+    students = get_roster(current_user.dept_id).rows()
     
     department = current_user.get_department()
     
@@ -172,12 +171,12 @@ def export_students_pdf():
         Paragraph('<b>CGPA</b>', cell_style)
     ]]
     
-    for student, academic_record in students:
+    for student in students:
         data.append([
             Paragraph(str(student.student_id), cell_style),
             Paragraph(student.name, cell_style),
             Paragraph(student.email, cell_style),
-            Paragraph(f"{academic_record.cgpa:.2f}" if academic_record.cgpa else 'N/A', cell_style)
+            Paragraph(f"{student.cgpa:.2f}" if student.cgpa else 'N/A', cell_style)
         ])
     
     # Create table with adjusted column widths for portrait
@@ -219,8 +218,12 @@ def export_students_pdf():
 
 @reports_bp.route('/reports/scholarships/excel')
 @login_required
+@read_replica
 def export_scholarships_excel():
     """Export awarded scholarships to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
@@ -323,8 +326,15 @@ def export_scholarships_excel():
 
 @reports_bp.route('/reports/scholarships/pdf')
 @login_required
+@read_replica
 def export_scholarships_pdf():
     """Export awarded scholarships to PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
@@ -437,8 +447,12 @@ def export_scholarships_pdf():
 
 @reports_bp.route('/reports/stipends/excel')
 @login_required
+@read_replica
 def export_stipends_excel():
     """Export awarded stipends to Excel"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
@@ -541,8 +555,15 @@ def export_stipends_excel():
 
 @reports_bp.route('/reports/stipends/pdf')
 @login_required
+@read_replica
 def export_stipends_pdf():
     """Export awarded stipends to PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    
     if not isinstance(current_user, Admin):
         flash('Access denied', 'danger')
         return redirect(url_for('main.home'))
@@ -0,0 +1,168 @@
+"""
+Department Roster Snapshots
+Read-only column arrays of a department's students and academic records, cached per department
+"""
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from models import AcademicRecord, User, RosterVersion
+from extensions import db
+from routes.counters import increment_counters
+
+SEMESTERS = 8
+
+# One student as handed to templates and exports (stands in for User + AcademicRecord)
+RosterRow = namedtuple('RosterRow', [
+    'student_id', 'reg_no', 'name', 'email', 'session', 'cgpa', 'semester_gpas',
+    'current_semester', 'last_completed_semester', 'last_semester_gpa'
+])
+
+_SEMESTER_COLUMNS = [getattr(AcademicRecord, f'semester_{i}_gpa') for i in range(1, SEMESTERS + 1)]
+
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
+
+
+class RosterSnapshot:
+    """
+    Every student of one department that has an academic record, from one query
+
+    Numeric columns are NumPy arrays (missing GPAs are NaN) so eligibility
+    scans and histograms work on whole columns; names, emails and sessions
+    are plain lists. Rows are ordered by student_id.
+    """
+
+    __slots__ = ('dept_id', 'version', 'built_at', 'student_ids', 'reg_nos', 'names', 'emails', 'sessions',
+                 'cgpa', 'semester_gpas', 'current_semester', 'last_completed_semester', 'last_semester_gpa')
+
+    def __init__(self, dept_id, version, rows):
+        self.dept_id = dept_id
+        self.version = version
+        self.built_at = time.monotonic()
+
+        count = len(rows)
+        self.student_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        self.reg_nos = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+        self.names = [row[2] for row in rows]
+        self.emails = [row[3] for row in rows]
+        self.sessions = [row[4] for row in rows]
+        self.cgpa = np.array([row[5] for row in rows], dtype=np.float64)
+        self.semester_gpas = np.array([row[6:6 + SEMESTERS] for row in rows], dtype=np.float64).reshape(count, SEMESTERS)
+        self.current_semester = np.fromiter((row[6 + SEMESTERS] for row in rows), dtype=np.int64, count=count)
+
+        # Same rules as AcademicRecord.get_last_completed_semester / get_last_semester_gpa
+        self.last_completed_semester = np.maximum(self.current_semester - 1, 0)
+        columns = np.clip(self.last_completed_semester - 1, 0, SEMESTERS - 1)
+        self.last_semester_gpa = np.where(
+            (self.last_completed_semester >= 1) & (self.last_completed_semester <= SEMESTERS),
+            self.semester_gpas[np.arange(count), columns],
+            np.nan
+        )
+
+        for column in (self.student_ids, self.reg_nos, self.cgpa, self.semester_gpas, self.current_semester,
+                       self.last_completed_semester, self.last_semester_gpa):
+            column.flags.writeable = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def positions(self, student_ids):
+        """Row positions for student_ids (-1 where a student is not on the roster)"""
+        student_ids = np.asarray(student_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(student_ids.shape, -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.student_ids, student_ids), len(self) - 1)
+        return np.where(self.student_ids[found] == student_ids, found, -1)
+
+    def row(self, i):
+        """One student as a RosterRow (None for missing GPAs)"""
+        return RosterRow(
+            int(self.student_ids[i]), int(self.reg_nos[i]), self.names[i], self.emails[i], self.sessions[i],
+            _optional(self.cgpa[i]), tuple(_optional(gpa) for gpa in self.semester_gpas[i]),
+            int(self.current_semester[i]), int(self.last_completed_semester[i]), _optional(self.last_semester_gpa[i])
+        )
+
+    def rows(self, indices=None):
+        """RosterRows for the given positions (default: everyone)"""
+        return [self.row(i) for i in (range(len(self)) if indices is None else indices)]
+
+
+def roster_version(dept_id):
+    """Current change counter for a department's roster"""
+    return db.session.query(RosterVersion.version).filter_by(dept_id=dept_id).scalar() or 0
+
+
+def load_roster(dept_id, version):
+    """Build a snapshot from a single User join AcademicRecord query"""
+    rows = db.session.query(
+        User.student_id, User.reg_no, User.name, User.email, User.session,
+        AcademicRecord.cgpa, *_SEMESTER_COLUMNS, AcademicRecord.current_semester
+    ).join(
+        AcademicRecord, User.student_id == AcademicRecord.student_id
+    ).filter(User.dept_id == dept_id).order_by(User.student_id).all()
+    return RosterSnapshot(dept_id, version, rows)
+
+
+def get_roster(dept_id):
+    """
+    Return the department's roster snapshot
+
+    The cached snapshot is reused while the department's change counter
+    is unchanged (one primary key lookup) and is rebuilt at least every
+    ROSTER_SNAPSHOT_MAX_AGE seconds to pick up edits made outside the app.
+    """
+    cache = current_app.extensions.setdefault('roster_snapshots', {})
+    lock = current_app.extensions.setdefault('roster_snapshots_lock', threading.Lock())
+
+    version = roster_version(dept_id)
+    max_age = current_app.config.get('ROSTER_SNAPSHOT_MAX_AGE', 600)
+    snapshot = cache.get(dept_id)
+    if snapshot is not None and snapshot.version == version and time.monotonic() - snapshot.built_at < max_age:
+        return snapshot
+
+    snapshot = load_roster(dept_id, version)
+    with lock:
+        # A read from a lagging replica must not replace a newer snapshot
+        cached = cache.get(dept_id)
+        if cached is None or cached.version <= snapshot.version:
+            cache[dept_id] = snapshot
+    return snapshot
+
+
+def _changed_departments(session):
+    """Departments whose roster a pending flush will change"""
+    dept_ids = set()
+    record_students = set()
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, User):
+            dept_ids.add(obj.dept_id)
+        elif isinstance(obj, AcademicRecord):
+            record_students.add(obj.student_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            # A department move changes both rosters
+            dept_ids.update(inspect(obj).attrs.dept_id.history.deleted or ())
+            dept_ids.add(obj.dept_id)
+        elif isinstance(obj, AcademicRecord) and session.is_modified(obj):
+            record_students.add(obj.student_id)
+
+    if record_students:
+        with session.no_autoflush:
+            dept_ids.update(dept_id for dept_id, in session.query(User.dept_id).filter(
+                User.student_id.in_(record_students)
+            ))
+    dept_ids.discard(None)
+    return dept_ids
+
+
+@db.event.listens_for(Session, 'before_flush')
+def _bump_roster_versions(session, flush_context, instances):
+    # Counters change in the same transaction as the rows they describe (one upsert, safe for a new department)
+    increment_counters(session, RosterVersion, _changed_departments(session))
@@ -0,0 +1,336 @@
+"""
+Student Search Index
+In-process trigram index over student name, email, ID and registration number
+"""
+import re
+import threading
+import time
+import uuid
+from array import array
+from collections import defaultdict
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy.orm import Session, object_session
+from models import User
+from extensions import db
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Fraction of query trigrams a student must contain to be returned
+MIN_COVERAGE = 0.4
+
+# Rebuild the posting arrays once this many updates are waiting in the overlay
+COMPACT_RATIO = 0.1
+
+
+def normalize(text):
+    """Lowercase and reduce to space-separated alphanumeric words"""
+    return _NON_ALNUM.sub(' ', str(text).lower()).strip()
+
+
+def trigrams(text):
+    """Trigrams of every word, padded at the start so short input matches word prefixes"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word}'
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def document_text(name, email, student_id, reg_no):
+    """Searchable text for a student (the shared email domain is left out)"""
+    return normalize(f'{name} {email.split("@", 1)[0]} {student_id} {reg_no}')
+
+
+class StudentSearchIndex:
+    """
+    Trigram index for typo-tolerant, prefix-friendly student lookup
+
+    Postings are NumPy arrays of document ordinals. Updates append a new
+    ordinal to a small overlay and mark the old one dead; the arrays are
+    rebuilt once the overlay grows past COMPACT_RATIO of the index.
+
+    Each document also keeps the student's name and session so typeahead
+    suggestions are answered without touching the database. `version`
+    changes whenever the indexed content does.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+        self.last_updated_at = None
+        self.generation = ''
+        self.revision = 0
+        self._reset()
+
+    def _reset(self):
+        self.docs = []                  # ordinal -> (student_id, dept_id, text, name, session)
+        self.position = {}              # student_id -> live ordinal
+        self.alive = bytearray()
+        self.dept_ids = array('i')
+        self.postings = {}              # trigram -> np.int32 ordinals
+        self.overlay = defaultdict(list)
+        self.overlay_size = 0
+
+    def __len__(self):
+        return len(self.position)
+
+    @property
+    def version(self):
+        """Opaque token that changes whenever a search could return something different"""
+        return f'{self.generation}.{self.revision}'
+
+    def build(self, rows):
+        """Index (student_id, dept_id, name, email, reg_no, session) rows from scratch"""
+        self._build((student_id, dept_id, document_text(name, email, student_id, reg_no), name, session)
+                    for student_id, dept_id, name, email, reg_no, session in rows)
+        self.built_at = time.monotonic()
+
+    def _build(self, docs):
+        with self._lock:
+            self._reset()
+            postings = defaultdict(list)
+            for doc in docs:
+                ordinal = self._append(doc)
+                for gram in trigrams(doc[2]):
+                    postings[gram].append(ordinal)
+            self.postings = {gram: np.array(ordinals, dtype=np.int32) for gram, ordinals in postings.items()}
+            # Unique per build, so versions from different workers never collide
+            self.generation = uuid.uuid4().hex[:12]
+            self.revision = 0
+
+    def _append(self, doc):
+        student_id, dept_id = doc[0], doc[1]
+        ordinal = len(self.docs)
+        self.docs.append(doc)
+        self.position[student_id] = ordinal
+        self.alive.append(1)
+        self.dept_ids.append(dept_id)
+        return ordinal
+
+    def upsert(self, student_id, dept_id, name, email, reg_no, session):
+        """Add or replace one student"""
+        doc = (student_id, dept_id, document_text(name, email, student_id, reg_no), name, session)
+        with self._lock:
+            current = self.position.get(student_id)
+            if current is not None and self.docs[current] == doc:
+                # Refreshes re-read same-second rows; leave the version alone
+                return
+            self.remove(student_id)
+            ordinal = self._append(doc)
+            for gram in trigrams(doc[2]):
+                self.overlay[gram].append(ordinal)
+            self.overlay_size += 1
+            self.revision += 1
+            if self.overlay_size > max(100, COMPACT_RATIO * len(self.position)):
+                self.compact()
+
+    def remove(self, student_id):
+        """Drop one student (its postings are skipped until the next compaction)"""
+        with self._lock:
+            ordinal = self.position.pop(student_id, None)
+            if ordinal is not None:
+                self.alive[ordinal] = 0
+                self.revision += 1
+
+    def compact(self):
+        """Rebuild the posting arrays from the live documents"""
+        with self._lock:
+            generation, revision = self.generation, self.revision
+            self._build([self.docs[ordinal] for ordinal in self.position.values()])
+            # Same content, same version
+            self.generation, self.revision = generation, revision
+
+    def search(self, query, dept_id, limit=50, offset=0):
+        """
+        Rank a department's students against a search string
+
+        Candidates are scored by the share of query trigrams they contain,
+        then boosted when a word starts with (or equals) the query.
+
+        Returns:
+            tuple: ([student_id, ...] for the requested slice, total matches)
+        """
+        grams = trigrams(query)
+        needle = normalize(query)
+        if not grams:
+            return [], 0
+
+        with self._lock:
+            count = len(self.docs)
+            parts = [self.postings[gram] for gram in grams if gram in self.postings]
+            parts += [np.array(self.overlay[gram], dtype=np.int32) for gram in grams if gram in self.overlay]
+            if not parts:
+                return [], 0
+
+            hits = np.bincount(np.concatenate(parts), minlength=count)
+            mask = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+            mask &= np.frombuffer(self.dept_ids, dtype=np.int32) == dept_id
+
+            coverage = np.where(mask, hits / len(grams), 0.0)
+            candidates = np.flatnonzero(coverage >= MIN_COVERAGE)
+            total = int(candidates.size)
+            if not total:
+                return [], 0
+
+            # Only the best few need exact re-ranking
+            window = min(total, (offset + limit) * 4)
+            if window < total:
+                candidates = candidates[np.argpartition(-coverage[candidates], window - 1)[:window]]
+
+            ranked = []
+            for ordinal in candidates:
+                student_id, _, text = self.docs[ordinal][:3]
+                score = float(coverage[ordinal])
+                padded = f' {text} '
+                if f' {needle} ' in padded:
+                    score += 1.0
+                elif f' {needle}' in padded:
+                    score += 0.5
+                ranked.append((-score, len(text), student_id))
+
+        ranked.sort()
+        return [student_id for _, _, student_id in ranked[offset:offset + limit]], total
+
+    def suggest(self, query, dept_id, limit=8):
+        """Top matches as [(student_id, name, session), ...] straight from the index"""
+        student_ids, _ = self.search(query, dept_id, limit=limit)
+        with self._lock:
+            docs = [self.docs[self.position[student_id]] for student_id in student_ids if student_id in self.position]
+        return [(student_id, name, session) for student_id, _, _, name, session in docs]
+
+    def refresh(self, full=False):
+        """Rebuild from the students table, or pick up students changed since the last refresh (by updated_at)"""
+        query = db.session.query(User.student_id, User.dept_id, User.name, User.email, User.reg_no,
+                                 User.session, User.updated_at)
+        if not full:
+            if self.last_updated_at is None:
+                self.refreshed_at = time.monotonic()
+                return
+            # Same-second changes are re-read rather than missed
+            query = query.filter(User.updated_at >= self.last_updated_at)
+        rows = query.all()
+
+        with self._lock:
+            if full:
+                self.build(row[:6] for row in rows)
+            else:
+                for row in rows:
+                    self.upsert(*row[:6])
+
+            stamps = [row.updated_at for row in rows if row.updated_at is not None]
+            if self.last_updated_at is not None and not full:
+                stamps.append(self.last_updated_at)
+            self.last_updated_at = max(stamps) if stamps else self.last_updated_at
+            self.refreshed_at = time.monotonic()
+
+
+class SearchIndexRefresher:
+    """
+    Keeps one app's index current without making searches wait
+
+    Full builds (the first one, then every SEARCH_INDEX_REBUILD seconds)
+    run on a background thread, one at a time, into a new index that
+    replaces the served one when done. Incremental refreshes run on the
+    request thread that finds them due; others keep searching meanwhile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.index = None
+        self.thread = None
+        self._rebuild_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def current(self):
+        """The served index (None until the first build finishes), starting a rebuild or refresh when due"""
+        index = self.index
+        now = time.monotonic()
+        if index is None or now - index.built_at > self.app.config.get('SEARCH_INDEX_REBUILD', 3600):
+            # Full rebuild also drops students deleted outside the app
+            self.start_rebuild()
+        elif now - index.refreshed_at > self.app.config.get('SEARCH_INDEX_REFRESH', 30):
+            if self._refresh_lock.acquire(blocking=False):
+                try:
+                    index.refresh()
+                finally:
+                    self._refresh_lock.release()
+        return index
+
+    def start_rebuild(self):
+        """Build a new index on a background thread unless one is already being built"""
+        if not self._rebuild_lock.acquire(blocking=False):
+            return
+        try:
+            self.thread = threading.Thread(target=self._rebuild, name='search-index-rebuild', daemon=True)
+            self.thread.start()
+        except Exception:
+            self._rebuild_lock.release()
+            raise
+
+    def _rebuild(self):
+        try:
+            with self.app.app_context():
+                index = StudentSearchIndex()
+                index.refresh(full=True)
+                with self._refresh_lock:
+                    # Students saved while the build ran went to the old index
+                    index.refresh()
+                    self.index = index
+        except Exception as e:
+            print(f"Search index rebuild failed: {str(e)}")
+        finally:
+            self._rebuild_lock.release()
+
+
+def get_refresher():
+    """Return the app's SearchIndexRefresher"""
+    refresher = current_app.extensions.get('student_search_index')
+    if refresher is None:
+        refresher = current_app.extensions.setdefault('student_search_index',
+                                                      SearchIndexRefresher(current_app._get_current_object()))
+    return refresher
+
+
+def get_search_index():
+    """
+    Return the app's student index, or None while its first build is running
+
+    Built on a background thread on first use, rebuilt every
+    SEARCH_INDEX_REBUILD seconds and refreshed every SEARCH_INDEX_REFRESH.
+    """
+    return get_refresher().current()
+
+
+@db.event.listens_for(User, 'after_insert')
+@db.event.listens_for(User, 'after_update')
+def _queue_student(mapper, connection, target):
+    # Applied to the shared index only once the transaction commits
+    changes = object_session(target).info.setdefault('search_index_changes', {})
+    changes[target.student_id] = (target.dept_id, target.name, target.email, target.reg_no, target.session)
+
+
+@db.event.listens_for(User, 'after_delete')
+def _queue_student_removal(mapper, connection, target):
+    object_session(target).info.setdefault('search_index_changes', {})[target.student_id] = None
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _index_committed_students(db_session):
+    changes = db_session.info.pop('search_index_changes', None)
+    if not changes or not has_app_context():
+        return
+    refresher = current_app.extensions.get('student_search_index')
+    if refresher is None or refresher.index is None:
+        return
+    for student_id, fields in changes.items():
+        if fields is None:
+            refresher.index.remove(student_id)
+        else:
+            refresher.index.upsert(student_id, *fields)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _forget_student_changes(db_session):
+    db_session.info.pop('search_index_changes', None)
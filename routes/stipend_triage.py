@@ -0,0 +1,131 @@
+"""
+Stipend Triage
+Priority of pending stipend applications from financial need, last-semester GPA and requested type, ranked in SQL
+"""
+import math
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select
+from models import AcademicRecord, Application, IncomeRecord, User
+from extensions import db
+from routes.award_policy import get_award_policy, last_semester_gpa_expression
+
+MAX_GPA = 4.0
+
+
+def per_capita_income_expression():
+    """SQL for the applicant's monthly income per family member, from their most recent income record"""
+    return select(
+        IncomeRecord.amount / func.nullif(IncomeRecord.family_member, 0)
+    ).where(
+        IncomeRecord.student_id == Application.student_id
+    ).order_by(
+        IncomeRecord.date.desc(), IncomeRecord.id.desc()
+    ).limit(1).correlate(Application).scalar_subquery()
+
+
+def unit_interval(value, low, high):
+    """SQL for value scaled so low -> 0 and high -> 1, clamped to [0, 1] (NULL -> 0)"""
+    return case(
+        (value.is_(None), 0.0),
+        (value <= low, 0.0),
+        (value >= high, 1.0),
+        else_=(value - low) / (high - low)
+    )
+
+
+def priority_expression(policy, per_capita_income, gpa):
+    """
+    SQL for an application's triage priority, 0-100 (higher is reviewed first)
+
+    Weighted sum (STIPEND_TRIAGE_WEIGHTS) of:
+        need: 1 at no income, falling to 0 at STIPEND_TRIAGE_INCOME_CEILING
+              per family member (0 when no income is on record)
+        gpa:  0 at the lowest stipend GPA floor, 1 at 4.00
+        type: the requested stipend's amount relative to the largest stipend
+    """
+    config = current_app.config
+    weights = config['STIPEND_TRIAGE_WEIGHTS']
+    rules = policy.rules('stipend')
+    largest = max(rule.amount for rule in rules)
+
+    need = 1.0 - unit_interval(per_capita_income, 0.0, float(config['STIPEND_TRIAGE_INCOME_CEILING']))
+    need = case((per_capita_income.is_(None), 0.0), else_=need)
+    merit = unit_interval(gpa, min(rule.min_gpa for rule in rules), MAX_GPA)
+    requested = case({rule.type: rule.amount / largest for rule in rules}, value=Application.type, else_=0.0)
+
+    total = sum(weights.values())
+    score = (weights['need'] * need + weights['gpa'] * merit + weights['type'] * requested) * (100.0 / total)
+    return func.round(score, 2)
+
+
+def parse_cursor(after):
+    """
+    Position after which the next queue page starts
+
+    Args:
+        after: 'priority:application_id' of the last row of the previous page
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    priority, _, application_id = (after or '').partition(':')
+    priority = float(priority)
+    # nan/inf parse as floats but never compare as a position in the queue
+    if not math.isfinite(priority):
+        raise ValueError(f'priority must be finite, not {priority}')
+    return priority, int(application_id)
+
+
+def stipend_queue(dept_id, after=None, per_page=None):
+    """
+    One page of a department's pending stipend applications, highest priority first
+
+    Scored, sorted and cut to the page in a single query; pages are
+    addressed by keyset (priority, application id) so decisions taken on
+    earlier pages do not shift the later ones.
+
+    Returns:
+        dict: applications (application, student_name, last_semester_gpa,
+        per_capita_income, amount, priority), per_page, next_after
+    """
+    config = current_app.config
+    per_page = max(1, min(per_page or config['STIPEND_QUEUE_PAGE_SIZE'], config['STIPEND_QUEUE_MAX_PAGE_SIZE']))
+    policy = get_award_policy()
+
+    per_capita_income = per_capita_income_expression()
+    gpa = last_semester_gpa_expression()
+    priority = priority_expression(policy, per_capita_income, gpa)
+
+    query = db.session.query(
+        Application, User.name, gpa, per_capita_income, priority
+    ).join(
+        User, Application.student_id == User.student_id
+    ).outerjoin(
+        AcademicRecord, Application.student_id == AcademicRecord.student_id
+    ).filter(
+        User.dept_id == dept_id,
+        Application.status == 'Pending'
+    )
+
+    if after is not None:
+        last_priority, last_id = after
+        query = query.filter(or_(priority < last_priority, and_(priority == last_priority, Application.id > last_id)))
+
+    # Fetch one extra row to learn whether another page follows
+    rows = query.order_by(priority.desc(), Application.id).limit(per_page + 1).all()
+
+    applications = [{
+        'application': application,
+        'student_name': name,
+        'last_semester_gpa': last_semester_gpa,
+        'per_capita_income': income,
+        'amount': policy.amount(application.type),
+        'priority': float(score)
+    } for application, name, last_semester_gpa, income, score in rows[:per_page]]
+
+    last = applications[-1] if applications and len(rows) > per_page else None
+    return {
+        'applications': applications,
+        'per_page': per_page,
+        'next_after': f"{last['priority']}:{last['application'].id}" if last else None
+    }
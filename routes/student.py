@@ -2,82 +2,71 @@
 Student Routes
 Handles student-facing routes for scholarships and stipends
 """
-from flask import Blueprint, render_template, redirect, url_for, flash
+from concurrent.futures import TimeoutError
+from flask import Blueprint, render_template, redirect, url_for, flash, abort, current_app
 from flask_login import login_required, current_user
-from models import AcademicRecord, Admin, Scholarship, Stipend, Application, User
-from extensions import db
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
+from models import AcademicRecord, Admin
+from routes.award_policy import get_award_policy
+from routes.student_snapshot import get_student_snapshot
+from routes.gpa_charts import CHART_NAMES, get_chart, gpa_series, schedule_charts
+from routes.conditional import conditional, student_pages_version
 
 student_bp = Blueprint('student', __name__)
 
 
 @student_bp.route('/scholarships')
 @login_required
+@conditional(student_pages_version)
 def scholarships():
     """Student scholarships page - displays eligibility and awarded scholarships"""
     # Check if user is admin
     if isinstance(current_user, Admin):
         return redirect(url_for('admin.dashboard'))
     
-    # Get academic record
-    academic_record = AcademicRecord.query.filter_by(student_id=current_user.student_id).first()
+    # Academic standing, awards and applications in one snapshot
+    snapshot = get_student_snapshot(current_user.student_id)
     
     # Check eligibility based on LAST COMPLETED semester GPA
+    policy = get_award_policy()
     is_eligible = False
     eligible_for_chancellor = False
     last_semester_gpa = None
     last_completed_semester = None
     ineligibility_reason = None
     
-    if academic_record:
-        last_semester_gpa = academic_record.get_last_semester_gpa()
-        last_completed_semester = academic_record.get_last_completed_semester()
+    if snapshot.has_record:
+        last_semester_gpa = snapshot.last_semester_gpa
+        last_completed_semester = snapshot.last_completed_semester
         
         # Scholarships are awarded based on the last completed semester GPA
-        semester_name = f"Semester {last_completed_semester}" if last_completed_semester > 0 else None
+        scholarship_rule = policy.evaluate('scholarship', last_semester_gpa, last_completed_semester)
+        semester_name = snapshot.semester_name
         
-        if not semester_name or last_completed_semester <= 0:
+        if not semester_name:
             ineligibility_reason = 'first_semester'
         else:
-            # Check if already received scholarship for last completed semester
-            existing_scholarship = Scholarship.query.filter_by(
-                student_id=current_user.student_id,
-                semester=semester_name
-            ).first()
-            
-            # Check if already received stipend for last completed semester
-            existing_stipend = Stipend.query.filter_by(
-                student_id=current_user.student_id,
-                semester=semester_name
-            ).first()
+            # Check if already received scholarship or stipend for last completed semester
+            existing_scholarship = snapshot.award_for('scholarship', semester_name)
+            existing_stipend = snapshot.award_for('stipend', semester_name)
             
             # Check eligibility and set reason if not eligible
             if existing_scholarship:
                 ineligibility_reason = 'scholarship'
             elif existing_stipend:
                 ineligibility_reason = 'stipend'
-            elif last_semester_gpa and last_semester_gpa >= 3.8:
+            elif scholarship_rule:
                 is_eligible = True
-                # Check if eligible for Chancellor Scholarship
-                if last_semester_gpa >= 3.9:
-                    eligible_for_chancellor = True
+                # Check if eligible for the top scholarship (Chancellor Scholarship)
+                eligible_for_chancellor = scholarship_rule == policy.rules('scholarship')[-1]
             else:
                 ineligibility_reason = 'low_gpa_scholarship'
     
-    # Get awarded scholarships
-    scholarships = Scholarship.query.filter_by(student_id=current_user.student_id).order_by(Scholarship.awarded_at.desc()).all()
-    
     return render_template('student_scholarships.html',
                          user=current_user,
-                         academic_record=academic_record,
                          is_eligible=is_eligible,
                          eligible_for_chancellor=eligible_for_chancellor,
                          ineligibility_reason=ineligibility_reason,
-                         scholarships=scholarships,
+                         scholarships=snapshot.scholarships,
                          last_semester_gpa=last_semester_gpa,
                          last_completed_semester=last_completed_semester)
 
@@ -90,43 +79,41 @@ def stipends():
     if isinstance(current_user, Admin):
         return redirect(url_for('admin.dashboard'))
     
+    policy = get_award_policy()
     eligibility_criteria = [
         "Complete at least one semester.",
-        "Maintain a minimum GPA of 3.50 in the last completed semester.",
+        f"Maintain a minimum GPA of {policy.min_gpa('stipend'):.2f} in the last completed semester.",
         "No scholarship or stipend can be taken for the same semester.",
-        "Vice Chancellor Stipend needs GPA ≥ 3.75."
+        *[f"{rule.type} needs GPA ≥ {rule.min_gpa:g}." for rule in policy.rules('stipend')[1:]]
     ]
 
-    # Get academic record
-    academic_record = AcademicRecord.query.filter_by(student_id=current_user.student_id).first()
+    # Academic standing, awards and applications in one snapshot
+    snapshot = get_student_snapshot(current_user.student_id)
     
     # Check eligibility based on LAST COMPLETED semester GPA
     is_eligible = False
-    eligible_for_vc = False
+    stipend_options = []
     last_semester_gpa = None
     last_completed_semester = None
     ineligibility_reason = None
+    existing_scholarship = None
+    existing_stipend = None
     
-    if academic_record:
-        last_semester_gpa = academic_record.get_last_semester_gpa()
-        last_completed_semester = academic_record.get_last_completed_semester()
+    if snapshot.has_record:
+        last_semester_gpa = snapshot.last_semester_gpa
+        last_completed_semester = snapshot.last_completed_semester
         
-        # Awards are for the last completed semester
-        semester_name = f"Semester {last_completed_semester}" if last_completed_semester > 0 else None
+        # Awards are for the last completed semester; every stipend the GPA qualifies for can be chosen
+        stipend_options = [rule for rule in policy.rules('stipend')
+                           if policy.qualifies(rule, last_semester_gpa, last_completed_semester)]
+        semester_name = snapshot.semester_name
         
-        if not semester_name or last_completed_semester <= 0:
+        if not semester_name:
             ineligibility_reason = 'first_semester'
         else:
             # Check if already received scholarship or stipend for last completed semester
-            existing_scholarship = Scholarship.query.filter_by(
-                student_id=current_user.student_id,
-                semester=semester_name
-            ).first()
-            
-            existing_stipend = Stipend.query.filter_by(
-                student_id=current_user.student_id,
-                semester=semester_name
-            ).first()
+            existing_scholarship = snapshot.award_for('scholarship', semester_name)
+            existing_stipend = snapshot.award_for('stipend', semester_name)
             
             # Check eligibility and set reason if not eligible
             if existing_scholarship:
@@ -135,69 +122,36 @@ def stipends():
             elif existing_stipend:
                 ineligibility_reason = 'stipend'
                 is_eligible = False
-            elif last_semester_gpa and last_semester_gpa >= 3.5:
+            elif stipend_options:
                 is_eligible = True
-                # Check if eligible for Vice Chancellor Stipend
-                if last_semester_gpa >= 3.75:
-                    eligible_for_vc = True
             else:
                 ineligibility_reason = 'low_gpa'
                 is_eligible = False
     
-    # Get pending application
-    pending_application = Application.query.filter_by(
-        student_id=current_user.student_id,
-        status='Pending'
-    ).first()
-
-    # Check if already has award for last completed semester
-    has_current_semester_scholarship = None
-    has_current_semester_stipend = None
-    rejected_application = None
-    if last_completed_semester and last_completed_semester > 0:
-        semester_name = f"Semester {last_completed_semester}"
-        has_current_semester_scholarship = Scholarship.query.filter_by(
-            student_id=current_user.student_id,
-            semester=semester_name
-        ).first()
-        has_current_semester_stipend = Stipend.query.filter_by(
-            student_id=current_user.student_id,
-            semester=semester_name
-        ).first()
-        # Check for rejected application for current semester
-        rejected_application = Application.query.filter_by(
-            student_id=current_user.student_id,
-            semester=semester_name,
-            status='Rejected'
-        ).first()
+    # Pending application, and a rejected one for the last completed semester
+    pending_application = snapshot.pending_application
+    rejected_application = snapshot.rejected_application(snapshot.semester_name) if snapshot.semester_name else None
 
     can_proceed_with_application = (
         bool(last_completed_semester and last_completed_semester > 0)
-        and not has_current_semester_scholarship
-        and not has_current_semester_stipend
+        and not existing_scholarship
+        and not existing_stipend
         and is_eligible
         and pending_application is None
         and rejected_application is None
     )
     
-    # Get application history
-    applications = Application.query.filter_by(student_id=current_user.student_id).order_by(Application.created_at.desc()).all()
-    
-    # Get awarded stipends
-    stipends = Stipend.query.filter_by(student_id=current_user.student_id).order_by(Stipend.awarded_at.desc()).all()
-    
     return render_template('student_stipends.html',
                          user=current_user,
-                         academic_record=academic_record,
                          is_eligible=is_eligible,
-                         eligible_for_vc=eligible_for_vc,
+                         stipend_options=stipend_options,
                          ineligibility_reason=ineligibility_reason,
                          pending_application=pending_application,
                          can_proceed_with_application=can_proceed_with_application,
-                         applications=applications,
-                         stipends=stipends,
-                         has_current_semester_scholarship=has_current_semester_scholarship,
-                         has_current_semester_stipend=has_current_semester_stipend,
+                         applications=snapshot.applications,
+                         stipends=snapshot.stipends,
+                         has_current_semester_scholarship=existing_scholarship,
+                         has_current_semester_stipend=existing_stipend,
                          rejected_application=rejected_application,
                          last_semester_gpa=last_semester_gpa,
                          last_completed_semester=last_completed_semester,
@@ -206,6 +160,7 @@ def stipends():
 
 @student_bp.route('/academics')
 @login_required
+@conditional(student_pages_version)
 def academics():
     """Student academics page with detailed analytics"""
     # Check if user is admin
@@ -220,65 +175,10 @@ def academics():
         flash('No academic record found.', 'warning')
         return redirect(url_for('main.dashboard'))
     
-    # Generate GPA progression chart
-    semesters = []
-    gpas = []
-    for i in range(1, academic_record.current_semester):
-        gpa = getattr(academic_record, f'semester_{i}_gpa', None)
-        if gpa is not None:
-            semesters.append(f'S{i}')
-            gpas.append(gpa)
-    
-    plot_progression = None
-    plot_bar_chart = None
-    
-    if gpas:
-        # Calculate dynamic y-axis limits
-        highest_gpa = max(gpas)
-        lowest_gpa = min(gpas)
-        y_min = max(0, lowest_gpa - 0.1)  # Add padding below lowest
-        y_max = min(4.0, highest_gpa + 0.1)  # Add padding above highest
-        
-        # Line chart - GPA Progression
-        plt.figure(figsize=(7, 4))
-        plt.plot(semesters, gpas, marker='o', linewidth=2, markersize=8, color='#2196f3')
-        plt.axhline(y=academic_record.cgpa, color='#4caf50', linestyle='--', label=f'CGPA: {academic_record.cgpa:.2f}')
-        plt.xlabel('Semester', fontsize=10)
-        plt.ylabel('GPA', fontsize=10)
-        plt.ylim(y_min, y_max)
-        plt.legend(fontsize=9)
-        plt.grid(axis='y', alpha=0.3, linestyle='--')
-        
-        img = io.BytesIO()
-        plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-        img.seek(0)
-        plot_progression = base64.b64encode(img.getvalue()).decode()
-        plt.close()
-        
-        # Bar chart - Semester Comparison
-        plt.figure(figsize=(7, 4))
-        colors = ['#4caf50' if gpa >= 3.8 else '#2196f3' if gpa >= 3.5 else '#ff9800' if gpa >= 3.0 else '#f44336' for gpa in gpas]
-        bars = plt.bar(semesters, gpas, color=colors, alpha=0.8)
-        plt.axhline(y=academic_record.cgpa, color='#9c27b0', linestyle='--', linewidth=2, label=f'CGPA: {academic_record.cgpa:.2f}')
-        
-        # Add value labels on top of bars
-        for bar, gpa in zip(bars, gpas):
-            height = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2., height,
-                    f'{gpa:.2f}',
-                    ha='center', va='bottom', fontsize=9, fontweight='bold')
-        
-        plt.xlabel('Semester', fontsize=10)
-        plt.ylabel('GPA', fontsize=10)
-        plt.ylim(y_min, y_max)  # Extra padding for labels
-        plt.legend(fontsize=9)
-        plt.grid(axis='y', alpha=0.3, linestyle='--')
-        
-        img = io.BytesIO()
-        plt.savefig(img, format='png', bbox_inches='tight', dpi=100)
-        img.seek(0)
-        plot_bar_chart = base64.b64encode(img.getvalue()).decode()
-        plt.close()
+    # GPA charts are served from the chart cache; a missing one starts rendering in the background now
+    series = gpa_series(academic_record)
+    gpas = series.gpas
+    chart_key = schedule_charts(series) if gpas else None
     
     # Calculate statistics
     last_semester_gpa = academic_record.get_last_semester_gpa()
@@ -300,8 +200,9 @@ def academics():
             })
     
     # Get scholarship and stipend history
-    scholarships = Scholarship.query.filter_by(student_id=current_user.student_id).order_by(Scholarship.awarded_at.desc()).all()
-    stipends = Stipend.query.filter_by(student_id=current_user.student_id).order_by(Stipend.awarded_at.desc()).all()
+    snapshot = get_student_snapshot(current_user.student_id)
+    scholarships = snapshot.scholarships
+    stipends = snapshot.stipends
     
     total_scholarship_amount = sum(s.amount for s in scholarships)
     total_stipend_amount = sum(s.amount for s in stipends)
@@ -310,8 +211,7 @@ def academics():
                          user=current_user,
                          department=department,
                          academic_record=academic_record,
-                         plot_progression=plot_progression,
-                         plot_bar_chart=plot_bar_chart,
+                         chart_key=chart_key,
                          last_semester_gpa=last_semester_gpa,
                          last_completed_semester=last_completed_semester,
                          highest_gpa=highest_gpa_stat,
@@ -322,3 +222,32 @@ def academics():
                          stipends=stipends,
                          total_scholarship_amount=total_scholarship_amount,
                          total_stipend_amount=total_stipend_amount)
+
+
+@student_bp.route('/academics/charts/<key>/<name>.png')
+@login_required
+def academics_chart(key, name):
+    """One of the current student's GPA charts, by content key (immutable, so browsers keep it)"""
+    # Check if user is admin
+    if isinstance(current_user, Admin) or name not in CHART_NAMES:
+        abort(404)
+    
+    academic_record = AcademicRecord.query.filter_by(student_id=current_user.student_id).first()
+    if not academic_record:
+        abort(404)
+    
+    # Only the charts of the student's current record; an outdated key is gone
+    series = gpa_series(academic_record)
+    if not series.gpas or schedule_charts(series) != key:
+        abort(404)
+    
+    try:
+        png = get_chart(series, name)
+    except TimeoutError:
+        abort(503)
+    
+    response = current_app.response_class(png, mimetype='image/png')
+    response.cache_control.private = True
+    response.cache_control.max_age = 365 * 24 * 3600
+    response.cache_control.immutable = True
+    return response
@@ -4,8 +4,10 @@ Handles student application submissions
 """
 from flask import Blueprint, redirect, url_for, request, flash
 from flask_login import login_required, current_user
-from models import AcademicRecord, Admin, Scholarship, Stipend, Application, IncomeRecord
+from models import Admin, Application, IncomeRecord
 from extensions import db
+from routes.award_policy import get_award_policy
+from routes.student_snapshot import get_student_snapshot
 from datetime import datetime
 
 student_actions_bp = Blueprint('student_actions', __name__)
@@ -19,55 +21,35 @@ def apply_stipend():
     if isinstance(current_user, Admin):
         return redirect(url_for('admin.dashboard'))
     
-    # Get academic record
-    academic_record = AcademicRecord.query.filter_by(student_id=current_user.student_id).first()
+    # Academic standing, awards and applications, re-read since this guards a write
+    snapshot = get_student_snapshot(current_user.student_id, fresh=True)
     
     # Check eligibility again based on LAST COMPLETED semester
-    last_semester_gpa = academic_record.get_last_semester_gpa() if academic_record else None
-    last_completed_semester = academic_record.get_last_completed_semester() if academic_record else 0
+    policy = get_award_policy()
+    last_semester_gpa = snapshot.last_semester_gpa
+    last_completed_semester = snapshot.last_completed_semester
     
     if last_completed_semester <= 0:
         flash('You are not eligible for a stipend. No completed semester found.', 'danger')
         return redirect(url_for('student.stipends'))
     
-    if not last_semester_gpa or last_semester_gpa < 3.5:
-        flash('You are not eligible for a stipend. Minimum GPA required is 3.5', 'danger')
+    if not policy.evaluate('stipend', last_semester_gpa, last_completed_semester):
+        flash(f"You are not eligible for a stipend. Minimum GPA required is {policy.min_gpa('stipend'):g}", 'danger')
         return redirect(url_for('student.stipends'))
     
     # Check if already received scholarship or stipend for last completed semester
     semester_name = f"Semester {last_completed_semester}"
-    existing_scholarship = Scholarship.query.filter_by(
-        student_id=current_user.student_id,
-        semester=semester_name
-    ).first()
-    
-    existing_stipend = Stipend.query.filter_by(
-        student_id=current_user.student_id,
-        semester=semester_name
-    ).first()
-    
-    if existing_scholarship or existing_stipend:
+    if snapshot.has_blocking_award(policy, 'stipend', semester_name):
         flash('You have already received an award for this semester.', 'warning')
         return redirect(url_for('student.stipends'))
     
     # Check for pending application
-    pending_application = Application.query.filter_by(
-        student_id=current_user.student_id,
-        status='Pending'
-    ).first()
-    
-    if pending_application:
+    if snapshot.pending_application:
         flash('You already have a pending application.', 'warning')
         return redirect(url_for('student.stipends'))
     
     # Check for rejected application for the same semester
-    rejected_application = Application.query.filter_by(
-        student_id=current_user.student_id,
-        semester=semester_name,
-        status='Rejected'
-    ).first()
-    
-    if rejected_application:
+    if snapshot.rejected_application(semester_name):
         flash('You cannot apply again for this semester as your previous application was rejected.', 'danger')
         return redirect(url_for('student.stipends'))
     
@@ -82,12 +64,13 @@ def apply_stipend():
         return redirect(url_for('student.stipends'))
     
     # Validate stipend type based on GPA
-    if stipend_type == "Vice Chancellor Stipend" and last_semester_gpa < 3.75:
-        flash('You are not eligible for Vice Chancellor Stipend. Minimum GPA required is 3.75', 'danger')
+    rule = policy.rule(stipend_type)
+    if not rule or rule.kind != 'stipend':
+        flash('Invalid stipend type selected.', 'danger')
         return redirect(url_for('student.stipends'))
     
-    if stipend_type not in ["BUP Stipend", "Vice Chancellor Stipend"]:
-        flash('Invalid stipend type selected.', 'danger')
+    if not policy.qualifies(rule, last_semester_gpa, last_completed_semester):
+        flash(f'You are not eligible for {rule.type}. Minimum GPA required is {rule.min_gpa:g}', 'danger')
         return redirect(url_for('student.stipends'))
     
     try:
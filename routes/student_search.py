@@ -0,0 +1,191 @@
+"""
+Student Search
+Department student listing: keyset pages, index-friendly predicates, ranked text search and typeahead
+"""
+import re
+from flask import current_app
+from models import User
+from extensions import db
+from routes.search_index import get_search_index
+
+# Student IDs are 10-11 digits and registration numbers 12
+MAX_ID_DIGITS = 12
+
+# Academic sessions look like '2022-2023'
+SESSION_PATTERN = re.compile(r'^\d{4}(-\d{0,4})?$')
+
+# Shorter typeahead input matches too much to be useful
+SUGGEST_MIN_CHARS = 2
+
+
+def numeric_prefix_filter(column, digits):
+    """Match a BIGINT column whose decimal form starts with digits, as a set of index range scans"""
+    # No ID has a leading zero or more than MAX_ID_DIGITS digits (longer input would overflow BIGINT)
+    if digits.startswith('0') or len(digits) > MAX_ID_DIGITS:
+        return db.false()
+
+    prefix = int(digits)
+    conditions = [column == prefix]
+    for extra_digits in range(1, MAX_ID_DIGITS - len(digits) + 1):
+        scale = 10 ** extra_digits
+        conditions.append(column.between(prefix * scale, (prefix + 1) * scale - 1))
+    return db.or_(*conditions)
+
+
+def search_filter(term):
+    """
+    Filter for the admin search box
+
+    Numeric input is an exact/prefix match on the indexed student_id and
+    reg_no columns (and a prefix match on session, e.g. '2022').
+    Sessions ('2022-2023') are a prefix match; anything else is a
+    substring match on name, email and session.
+    """
+    if SESSION_PATTERN.match(term) and not term.isdigit():
+        return User.session.like(f'{term}%')
+
+    if term.isdigit():
+        return db.or_(
+            numeric_prefix_filter(User.student_id, term),
+            numeric_prefix_filter(User.reg_no, term),
+            User.session.like(f'{term}%')
+        )
+
+    pattern = f'%{term}%'
+    return db.or_(
+        User.name.ilike(pattern),
+        User.email.ilike(pattern),
+        User.session.ilike(pattern)
+    )
+
+
+def count_students(query, mode):
+    """
+    Count the rows of a student query
+
+    Args:
+        query: filtered student query
+        mode: 'exact', 'estimate' (stop counting at STUDENTS_COUNT_CAP) or 'none'
+
+    Returns:
+        tuple: (count or None, whether the count is a lower bound)
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'exact':
+        return query.order_by(None).count(), False
+
+    cap = current_app.config.get('STUDENTS_COUNT_CAP', 1000)
+    capped = query.order_by(None).with_entities(User.student_id).limit(cap).subquery()
+    count = db.session.query(db.func.count()).select_from(capped).scalar()
+    return count, count >= cap
+
+
+def uses_search_index(term):
+    """Whether a search term goes to the trigram index instead of SQL predicates"""
+    return (bool(term) and current_app.config.get('SEARCH_INDEX', True)
+            and not term.isdigit() and not SESSION_PATTERN.match(term))
+
+
+def ranked_students(index, dept_id, search, start, per_page):
+    """One page of index matches, best first, loaded with a single IN query"""
+    student_ids, total = index.search(search, dept_id, limit=per_page + 1, offset=start)
+    page_ids = student_ids[:per_page]
+
+    rows = User.query.filter(User.dept_id == dept_id, User.student_id.in_(page_ids)).all() if page_ids else []
+    by_id = {student.student_id: student for student in rows}
+
+    return {
+        'students': [by_id[student_id] for student_id in page_ids if student_id in by_id],
+        'per_page': per_page,
+        'ranked': True,
+        'next_start': start + per_page if len(student_ids) > per_page else None,
+        'prev_start': max(0, start - per_page) if start else None,
+        'total': total,
+        'total_is_estimate': False
+    }
+
+
+def paginate_students(dept_id, search='', after=None, before=None, per_page=None, count_mode=None, start=0):
+    """
+    One page of a department's students
+
+    Browsing and numeric searches are ordered by student_id and addressed
+    by keyset (the last/first student_id of the neighbouring page) rather
+    than OFFSET, so every page costs the same. Text searches are ranked
+    by the trigram index and paged by position (start).
+
+    Returns:
+        dict: students, per_page, next_after, prev_before (or next_start,
+        prev_start for ranked results), total, total_is_estimate
+    """
+    config = current_app.config
+    per_page = min(per_page or config.get('STUDENTS_PAGE_SIZE', 50), config.get('STUDENTS_MAX_PAGE_SIZE', 200))
+    count_mode = count_mode or config.get('STUDENTS_COUNT_MODE', 'estimate')
+
+    # Until the index is first built, text searches use the SQL predicates
+    index = get_search_index() if uses_search_index(search) else None
+    if index is not None:
+        return ranked_students(index, dept_id, search, start or 0, per_page)
+
+    query = User.query.filter(User.dept_id == dept_id)
+    if search:
+        query = query.filter(search_filter(search))
+
+    total, total_is_estimate = count_students(query, count_mode)
+
+    # Fetch one extra row to learn whether another page follows
+    if before is not None:
+        rows = query.filter(User.student_id < before).order_by(User.student_id.desc()).limit(per_page + 1).all()
+        has_more_before = len(rows) > per_page
+        students = list(reversed(rows[:per_page]))
+        has_prev, has_next = has_more_before, True
+    else:
+        if after is not None:
+            query = query.filter(User.student_id > after)
+        rows = query.order_by(User.student_id).limit(per_page + 1).all()
+        students = rows[:per_page]
+        has_prev, has_next = after is not None, len(rows) > per_page
+
+    return {
+        'students': students,
+        'per_page': per_page,
+        'ranked': False,
+        'next_after': students[-1].student_id if students and has_next else None,
+        'prev_before': students[0].student_id if students and has_prev else None,
+        'total': total,
+        'total_is_estimate': total_is_estimate
+    }
+
+
+def suggestion_version():
+    """Version of the data behind suggestions (None when they come from SQL)"""
+    if not current_app.config.get('SEARCH_INDEX', True):
+        return None
+    index = get_search_index()
+    return index.version if index is not None else None
+
+
+def suggest_students(dept_id, term, limit):
+    """
+    Typeahead matches for a department
+
+    Served from the trigram index (no database query) unless SEARCH_INDEX
+    is off or the index is still being built, in which case the search box
+    predicates are used.
+
+    Returns:
+        list: [{'id', 'name', 'session'}, ...] best match first
+    """
+    if len(term) < SUGGEST_MIN_CHARS:
+        return []
+
+    index = get_search_index() if current_app.config.get('SEARCH_INDEX', True) else None
+    if index is not None:
+        rows = index.suggest(term, dept_id, limit)
+    else:
+        rows = db.session.query(User.student_id, User.name, User.session).filter(
+            User.dept_id == dept_id, search_filter(term)
+        ).order_by(User.student_id).limit(limit).all()
+
+    return [{'id': student_id, 'name': name, 'session': session} for student_id, name, session in rows]
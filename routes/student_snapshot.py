@@ -0,0 +1,180 @@
+"""
+Student Eligibility Snapshots
+One student's academic standing, awards and applications from two queries, shared by the student pages
+"""
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, g, has_app_context, has_request_context, session
+from sqlalchemy import literal, null, union_all
+from sqlalchemy.orm import Session
+from models import AcademicRecord, Application, Scholarship, Stipend
+from extensions import db
+
+# Stands in for Scholarship/Stipend and Application rows in templates
+Award = namedtuple('Award', ['id', 'kind', 'type', 'amount', 'semester', 'awarded_at'])
+ApplicationEntry = namedtuple('ApplicationEntry', ['id', 'type', 'semester', 'status', 'created_at'])
+
+# Time of the student's own last write; snapshots built before it are not reused for them
+SESSION_KEY = '_snapshot_after'
+
+SNAPSHOT_MODELS = (AcademicRecord, Application, Scholarship, Stipend)
+
+
+class StudentSnapshot:
+    """
+    Everything the scholarship/stipend pages decide on for one student
+
+    Awards and applications are newest first, like the history lists.
+    """
+
+    __slots__ = ('student_id', 'built_at', 'has_record', 'last_semester_gpa', 'last_completed_semester',
+                 'scholarships', 'stipends', 'applications')
+
+    def __init__(self, student_id, record, rows):
+        self.student_id = student_id
+        self.built_at = time.time()
+        self.has_record = record is not None
+        self.last_semester_gpa = record.get_last_semester_gpa() if record else None
+        self.last_completed_semester = record.get_last_completed_semester() if record else 0
+
+        awards = {'scholarship': [], 'stipend': []}
+        applications = []
+        for kind, row_id, award_type, amount, semester, status, at in rows:
+            if kind == 'application':
+                applications.append(ApplicationEntry(row_id, award_type, semester, status, at))
+            else:
+                awards[kind].append(Award(row_id, kind, award_type, amount, semester, at))
+
+        newest_first = lambda item: (item[-1] is not None, item[-1], item.id)
+        self.scholarships = sorted(awards['scholarship'], key=newest_first, reverse=True)
+        self.stipends = sorted(awards['stipend'], key=newest_first, reverse=True)
+        self.applications = sorted(applications, key=newest_first, reverse=True)
+
+    @property
+    def semester_name(self):
+        """Name of the last completed semester, which awards and applications are for (None before one)"""
+        return f"Semester {self.last_completed_semester}" if self.last_completed_semester > 0 else None
+
+    def award_for(self, kind, semester_name):
+        """The student's scholarship/stipend for a semester (None if they have none)"""
+        awards = self.scholarships if kind == 'scholarship' else self.stipends
+        return next((award for award in awards if award.semester == semester_name), None)
+
+    def has_blocking_award(self, policy, kind, semester_name):
+        """Snapshot version of AwardPolicy.has_blocking_award"""
+        return any(self.award_for(other, semester_name) for other in policy.blocking_kinds(kind))
+
+    @property
+    def pending_application(self):
+        """The student's pending application (None if there is none)"""
+        return next((entry for entry in self.applications if entry.status == 'Pending'), None)
+
+    def rejected_application(self, semester_name):
+        """The student's rejected application for a semester (None if there is none)"""
+        return next((entry for entry in self.applications
+                     if entry.status == 'Rejected' and entry.semester == semester_name), None)
+
+
+def load_student_snapshot(student_id):
+    """Build a snapshot: the academic record, then one UNION ALL over scholarships, stipends and applications"""
+    record = AcademicRecord.query.filter_by(student_id=student_id).first()
+
+    def awards(kind, model):
+        return db.session.query(
+            literal(kind), model.id, model.type, model.amount, model.semester, null(), model.awarded_at
+        ).filter(model.student_id == student_id)
+
+    applications = db.session.query(
+        literal('application'), Application.id, Application.type, null(), Application.semester,
+        Application.status, Application.created_at
+    ).filter(Application.student_id == student_id)
+
+    rows = db.session.execute(union_all(
+        awards('scholarship', Scholarship).statement,
+        awards('stipend', Stipend).statement,
+        applications.statement
+    )).all()
+    return StudentSnapshot(student_id, record, rows)
+
+
+def _cache():
+    cache = current_app.extensions.setdefault('student_snapshots', {})
+    lock = current_app.extensions.setdefault('student_snapshots_lock', threading.Lock())
+    return cache, lock
+
+
+def get_student_snapshot(student_id, fresh=False):
+    """
+    Return a student's eligibility snapshot
+
+    Memoized for the request. Across requests a snapshot is reused for
+    STUDENT_SNAPSHOT_MAX_AGE seconds unless a commit in this worker
+    changed the student's rows, or the student wrote since it was built.
+
+    Args:
+        fresh: bypass the cross-request cache (for checks that guard a write)
+    """
+    memo = g.setdefault('student_snapshots', {})
+    if not fresh and student_id in memo:
+        return memo[student_id]
+
+    cache, lock = _cache()
+    max_age = current_app.config.get('STUDENT_SNAPSHOT_MAX_AGE', 30)
+    own_write = session.get(SESSION_KEY, 0)
+    snapshot = None if fresh else cache.get(student_id)
+    if snapshot is None or snapshot.built_at < own_write or time.time() - snapshot.built_at >= max_age:
+        snapshot = load_student_snapshot(student_id)
+        with lock:
+            if len(cache) >= current_app.config.get('STUDENT_SNAPSHOT_MAX_ENTRIES', 10000):
+                cache.clear()
+            cache[student_id] = snapshot
+
+    memo[student_id] = snapshot
+    return snapshot
+
+
+def invalidate_student_snapshots(student_ids):
+    """Drop cached snapshots of students whose awards, applications or record changed"""
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+    if has_request_context():
+        memo = g.get('student_snapshots', {})
+        for student_id in student_ids:
+            memo.pop(student_id, None)
+        # A student's own changes show on their next page, whichever worker serves it
+        if session.get('_user_id') in {f'student_{student_id}' for student_id in student_ids}:
+            session[SESSION_KEY] = time.time()
+    cache, lock = _cache()
+    with lock:
+        for student_id in student_ids:
+            cache.pop(student_id, None)
+
+
+def mark_students_changed(db_session, student_ids):
+    """Invalidate snapshots on commit for writes the ORM does not track (bulk INSERT/UPDATE statements)"""
+    db_session.info.setdefault('changed_students', set()).update(student_ids)
+
+
+@db.event.listens_for(Session, 'before_flush')
+def _collect_changed_students(db_session, flush_context, instances):
+    changed = {
+        obj.student_id
+        for obj in list(db_session.new) + list(db_session.dirty) + list(db_session.deleted)
+        if isinstance(obj, SNAPSHOT_MODELS)
+    }
+    if changed:
+        mark_students_changed(db_session, changed)
+
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_changed_students(db_session):
+    changed = db_session.info.pop('changed_students', None)
+    if changed and has_app_context():
+        invalidate_student_snapshots(changed)
+
+
+@db.event.listens_for(Session, 'after_rollback')
+def _forget_changed_students(db_session):
+    db_session.info.pop('changed_students', None)
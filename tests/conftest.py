@@ -0,0 +1,64 @@
+"""
+Test Fixtures
+Apps on a throwaway SQLite database seeded with two departments, an admin and a few students
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Import the project modules from the repository root, without MySQL or SMTP
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='ssmp-test-'), 'import.db'))
+os.environ['SEND_EMAILS'] = 'False'
+
+from app import create_app
+from config import DevelopmentConfig, config
+from extensions import db
+from models import AcademicRecord, Admin, Department, User
+
+FIRST_STUDENT_ID = 23524202000
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    Build an app with config overrides, e.g. make_app(LOGIN_IP_BURST=2)
+
+    Department 1 (admin@bup.edu.bd / admin) gets every student whose index
+    is not a multiple of 5, department 2 the rest.
+    """
+    def make(students=10, **settings):
+        settings.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + str(tmp_path / 'test.db'))
+        # Seeded passwords are legacy plaintext; no background rehash writes racing the tests
+        settings.setdefault('PASSWORD_REHASH_ON_LOGIN', False)
+        config['testing'] = type('TestingConfig', (DevelopmentConfig,), dict(TESTING=True, SEND_EMAILS=False, **settings))
+        app = create_app('testing')
+
+        with app.app_context():
+            # Only the primary: the replica bind, when configured, is a copy made by the test
+            db.create_all(bind_key=None)
+            db.session.add(Department(id=1, name='CSE', faculty='FST', budget=200000.0))
+            db.session.add(Department(id=2, name='ICT', faculty='FST', budget=200000.0))
+            db.session.add(Admin(id=1, name='Admin', dept_id=1, email='admin@bup.edu.bd', password='admin'))
+            for i in range(students):
+                student_id = FIRST_STUDENT_ID + i
+                db.session.add(User(student_id=student_id, reg_no=104201230000 + i, dept_id=1 if i % 5 else 2,
+                                    name=f'STUDENT {i}', session='2022-2023',
+                                    email=f'{student_id}@student.bup.edu.bd', password='admin'))
+                db.session.add(AcademicRecord(reg_no=104201230000 + i, student_id=student_id, cgpa=3.5,
+                                              semester_4_gpa=3.5 + i % 5 / 10, current_semester=5))
+            db.session.commit()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+def login(client, identifier='admin@bup.edu.bd', password='admin', **kwargs):
+    """POST the login form"""
+    return client.post('/login', data={'email': identifier, 'password': password}, **kwargs)
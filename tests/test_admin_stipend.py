@@ -0,0 +1,151 @@
+"""
+Admin Stipend Tests
+"""
+import pytest
+from sqlalchemy import update
+
+from conftest import FIRST_STUDENT_ID, login
+from extensions import db
+from models import Application, Stipend
+from routes.admin_stipend import claim_pending
+
+
+@pytest.fixture
+def retired_application(app):
+    """A pending application for a stipend type that AWARD_POLICY no longer lists"""
+    with app.app_context():
+        application = Application(student_id=FIRST_STUDENT_ID + 1, type='General Stipend',
+                                  semester='Semester 4', status='Pending')
+        db.session.add(application)
+        db.session.commit()
+        return application.id
+
+
+def test_pages_show_retired_type_without_amount(app, retired_application):
+    client = app.test_client()
+    login(client)
+
+    for path in ('/admin/stipends/applications', f'/admin/stipends/application/{retired_application}',
+                 '/admin/stipends/application-history'):
+        response = client.get(path)
+        assert response.status_code == 200, path
+        assert b'No longer offered' in response.data, path
+
+    response = client.get('/admin/stipends/queue')
+    assert response.status_code == 200
+    assert response.get_json()['applications'][0]['amount'] is None
+
+
+def test_approve_refuses_retired_type(app, retired_application):
+    client = app.test_client()
+    login(client)
+
+    response = client.post(f'/admin/stipends/approve/{retired_application}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'General Stipend is no longer offered'
+
+    response = client.post('/admin/stipends/batch', json={'action': 'approve', 'applicationIds': [retired_application]})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'id': retired_application, 'success': False, 'message': 'General Stipend is no longer offered'}
+    ]
+
+    with app.app_context():
+        assert db.session.get(Application, retired_application).status == 'Pending'
+        assert Stipend.query.count() == 0
+
+
+@pytest.fixture
+def pending_application(app):
+    """A pending BUP Stipend application from an eligible student"""
+    with app.app_context():
+        application = Application(student_id=FIRST_STUDENT_ID + 1, type='BUP Stipend',
+                                  semester='Semester 4', status='Pending')
+        db.session.add(application)
+        db.session.commit()
+        return application.id
+
+
+def test_claim_skips_application_decided_concurrently(app, pending_application):
+    with app.app_context():
+        # Read as Pending, then rejected by another request before this one claims it
+        assert db.session.get(Application, pending_application).status == 'Pending'
+        with db.engine.begin() as connection:
+            connection.execute(update(Application).where(Application.id == pending_application).values(status='Rejected'))
+
+        assert claim_pending([pending_application], 'Approved') == set()
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Application, pending_application).status == 'Rejected'
+
+
+def test_reject_after_approve_is_refused(app, pending_application):
+    client = app.test_client()
+    login(client)
+
+    response = client.post(f'/admin/stipends/approve/{pending_application}')
+    assert response.status_code == 200, response.get_json()
+
+    response = client.post(f'/admin/stipends/reject/{pending_application}')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Application is already approved'
+
+    with app.app_context():
+        assert db.session.get(Application, pending_application).status == 'Approved'
+        assert Stipend.query.count() == 1
+
+
+def test_batch_skips_applications_decided_concurrently(app, pending_application, monkeypatch):
+    import routes.admin_stipend as admin_stipend
+
+    with app.app_context():
+        other = Application(student_id=FIRST_STUDENT_ID + 2, type='BUP Stipend',
+                            semester='Semester 4', status='Pending')
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+
+    lock_pending = admin_stipend.lock_pending
+
+    def rejected_meanwhile(application_ids):
+        # Another request rejects one of them after the batch has read it as Pending
+        db.session.execute(update(Application).where(Application.id == pending_application).values(status='Rejected'))
+        return lock_pending(application_ids)
+
+    monkeypatch.setattr(admin_stipend, 'lock_pending', rejected_meanwhile)
+    client = app.test_client()
+    login(client)
+
+    response = client.post('/admin/stipends/batch', json={'action': 'approve',
+                                                          'applicationIds': [pending_application, other_id]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['results'] == [
+        {'id': pending_application, 'success': False, 'message': 'Application has already been decided'},
+        {'id': other_id, 'success': True, 'message': 'Approved'}
+    ]
+    assert body['total_amount'] == 6000
+
+    with app.app_context():
+        assert db.session.get(Application, pending_application).status == 'Rejected'
+        assert db.session.get(Application, other_id).status == 'Approved'
+        assert [stipend.student_id for stipend in Stipend.query.all()] == [FIRST_STUDENT_ID + 2]
+        assert body['remaining_budget'] == 200000 - 6000
+
+
+def test_queue_rejects_out_of_range_paging(app, pending_application, retired_application):
+    client = app.test_client()
+    login(client)
+
+    response = client.get('/admin/stipends/queue?per_page=-5')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['per_page'] == 1
+    assert len(body['applications']) == 1
+
+    for after in ('nan:1', 'inf:1', '-inf:1'):
+        response = client.get(f'/admin/stipends/queue?after={after}')
+        assert response.status_code == 400, after
+
+    response = client.get('/admin/stipends/applications?after=nan:1')
+    assert response.status_code == 200
@@ -0,0 +1,66 @@
+"""
+Budget Ledger Tests
+"""
+from sqlalchemy import event
+
+from conftest import FIRST_STUDENT_ID, login
+from extensions import db
+from models import Application, BudgetBalance, BudgetEntry
+from routes.budget import allocate, get_balances, ledger_totals, materialize_balances
+
+FIELDS = ('semester', 'allocated', 'scholarships', 'stipends', 'reversed', 'balance')
+
+
+def rows(balances):
+    return sorted(tuple(getattr(balance, field) for field in FIELDS) for balance in balances)
+
+
+def approve_stipend(app, client, student_id):
+    with app.app_context():
+        application = Application(student_id=student_id, type='BUP Stipend', semester='Semester 4', status='Pending')
+        db.session.add(application)
+        db.session.commit()
+        application_id = application.id
+    response = client.post(f'/admin/stipends/approve/{application_id}')
+    assert response.status_code == 200, response.get_json()
+
+
+def test_approvals_keep_balances_current(app):
+    client = app.test_client()
+    login(client)
+
+    with app.app_context():
+        allocate(1, 1000, 'Top-up')
+        db.session.commit()
+        assert rows(BudgetBalance.query.filter_by(dept_id=1).all()) == rows(ledger_totals(1))
+
+    approve_stipend(app, client, FIRST_STUDENT_ID + 1)
+    approve_stipend(app, client, FIRST_STUDENT_ID + 2)
+
+    with app.app_context():
+        stored = BudgetBalance.query.filter_by(dept_id=1).all()
+        assert rows(stored) == rows(ledger_totals(1))
+        assert sum(balance.stipends for balance in stored) == 12000
+
+        # Every row is marked with the newest ledger entry it accounts for
+        newest = db.session.query(db.func.max(BudgetEntry.id)).filter_by(dept_id=1).scalar()
+        semester = next(balance for balance in stored if balance.semester == 'Semester 4')
+        assert semester.last_entry_id == newest
+
+
+def test_reading_balances_does_not_write(app):
+    client = app.test_client()
+    login(client)
+    with app.app_context():
+        materialize_balances(1)
+    approve_stipend(app, client, FIRST_STUDENT_ID + 1)
+
+    writes = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: writes.append(statement)
+                     if 'budget_balances' in statement and not statement.lstrip().upper().startswith('SELECT') else None)
+
+        assert sum(balance.stipends for balance in get_balances(1)) == 6000
+        assert client.get('/admin/dashboard').status_code == 200
+    assert writes == []
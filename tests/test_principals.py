@@ -0,0 +1,67 @@
+"""
+Cached Principal Tests
+"""
+import pytest
+
+from app import create_app
+from config import PLACEHOLDER_SECRET_KEY, ProductionConfig
+from conftest import FIRST_STUDENT_ID, login
+from extensions import db
+from models import Admin, PrincipalVersion, User
+from routes.counters import increment_counters
+
+
+def versions(app):
+    with app.app_context():
+        return dict(db.session.query(PrincipalVersion.principal_id, PrincipalVersion.version).all())
+
+
+def test_department_move_revokes_cached_admin(app):
+    client = app.test_client()
+    login(client)
+    assert b'STUDENT 1<' in client.get('/admin/students').data
+
+    with app.app_context():
+        db.session.get(Admin, 1).dept_id = 2
+        db.session.commit()
+
+    # Served from the database again, so the admin now sees department 2
+    data = client.get('/admin/students').data
+    assert b'STUDENT 5<' in data
+    assert b'STUDENT 1<' not in data
+
+
+def test_credential_changes_bump_versions(app):
+    with app.app_context():
+        student = db.session.get(User, FIRST_STUDENT_ID + 1)
+        student.name = 'RENAMED'
+        db.session.commit()
+    assert versions(app) == {}
+
+    with app.app_context():
+        db.session.get(User, FIRST_STUDENT_ID + 1).email = 'new@student.bup.edu.bd'
+        db.session.get(Admin, 1).password = 'changed'
+        db.session.commit()
+    assert versions(app) == {f'student_{FIRST_STUDENT_ID + 1}': 1, 'admin_1': 1}
+
+
+def test_hash_passwords_revokes(app):
+    result = app.test_cli_runner().invoke(args=['hash-passwords'])
+    assert result.exit_code == 0, result.output
+    assert versions(app)['admin_1'] == 1
+    assert versions(app)[f'student_{FIRST_STUDENT_ID}'] == 1
+
+
+def test_increment_creates_then_bumps(app):
+    with app.app_context():
+        increment_counters(db.session, PrincipalVersion, ['admin_9'])
+        increment_counters(db.session, PrincipalVersion, ['admin_9', 'admin_8'])
+        db.session.commit()
+    assert versions(app) == {'admin_9': 2, 'admin_8': 1}
+
+
+@pytest.mark.parametrize('secret_key', [None, '', PLACEHOLDER_SECRET_KEY])
+def test_production_refuses_placeholder_secret_key(monkeypatch, secret_key):
+    monkeypatch.setattr(ProductionConfig, 'SECRET_KEY', secret_key)
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app('production')
@@ -0,0 +1,31 @@
+"""
+Login Rate Limit Tests
+"""
+from conftest import login
+
+
+def test_ip_bucket_keys_on_forwarded_client(make_app):
+    app = make_app(TRUSTED_PROXY_HOPS=1, LOGIN_IP_BURST=2, LOGIN_IP_PER_MINUTE=1)
+    client = app.test_client()
+
+    for _ in range(2):
+        assert login(client, 'nobody@bup.edu.bd', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 302
+    assert login(client, 'nobody@bup.edu.bd', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 429
+
+    # Another client behind the same proxy has its own bucket
+    assert login(client, 'nobody@bup.edu.bd', headers={'X-Forwarded-For': '10.0.0.2'}).status_code == 302
+
+
+def test_forwarded_for_ignored_without_trusted_proxy(make_app):
+    app = make_app(TRUSTED_PROXY_HOPS=0, LOGIN_IP_BURST=2, LOGIN_IP_PER_MINUTE=1)
+    client = app.test_client()
+
+    for address in ('10.0.0.1', '10.0.0.2'):
+        assert login(client, 'nobody@bup.edu.bd', headers={'X-Forwarded-For': address}).status_code == 302
+    assert login(client, 'nobody@bup.edu.bd', headers={'X-Forwarded-For': '10.0.0.3'}).status_code == 429
+
+
+def test_ip_limit_looser_than_identifier_limit(app):
+    config = app.config
+    assert config['LOGIN_IP_BURST'] >= 10 * config['LOGIN_IDENTIFIER_BURST']
+    assert config['LOGIN_IP_PER_MINUTE'] >= 10 * config['LOGIN_IDENTIFIER_PER_MINUTE']
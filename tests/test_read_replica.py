@@ -0,0 +1,64 @@
+"""
+Read Replica Tests
+"""
+import shutil
+
+import pytest
+from sqlalchemy import event
+
+from conftest import FIRST_STUDENT_ID, login
+from extensions import db
+from models import Application, Department
+from routes.read_replica import replica_reads
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    """App whose replica is a copy of the seeded primary; counts the statements each engine runs"""
+    app = make_app(SQLALCHEMY_BINDS={'replica': 'sqlite:///' + str(tmp_path / 'replica.db')}, REPLICA_CHECK_INTERVAL=0)
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copy(tmp_path / 'test.db', tmp_path / 'replica.db')
+
+        app.statements = {'primary': [], 'replica': []}
+        for name, engine in (('primary', db.engines[None]), ('replica', db.engines['replica'])):
+            event.listen(engine, 'before_cursor_execute',
+                         lambda conn, cursor, statement, *args, name=name: app.statements[name].append(statement))
+    return app
+
+
+def test_write_inside_replica_reads_raises(app):
+    with app.test_request_context():
+        with replica_reads():
+            db.session.get(Department, 1).budget = 0
+            with pytest.raises(RuntimeError):
+                db.session.flush()
+        db.session.rollback()
+
+        with replica_reads(), pytest.raises(RuntimeError):
+            db.session.execute(db.update(Department).values(budget=0))
+
+
+def test_replica_pages_read_only_after_approval(replica_app):
+    client = replica_app.test_client()
+    login(client)
+
+    # An approval writes the ledger; the dashboard and reports that follow must not write anything
+    with replica_app.app_context():
+        application = Application(student_id=FIRST_STUDENT_ID + 1, type='BUP Stipend',
+                                  semester='Semester 4', status='Pending')
+        db.session.add(application)
+        db.session.commit()
+        application_id = application.id
+    assert client.post(f'/admin/stipends/approve/{application_id}').status_code == 200
+
+    for statements in replica_app.statements.values():
+        statements.clear()
+    for path in ('/admin/dashboard', '/admin/reports/students/excel', '/admin/reports/stipends/pdf'):
+        assert client.get(path).status_code == 200, path
+
+    assert replica_app.statements['replica']
+    writes = [statement for statements in replica_app.statements.values() for statement in statements
+              if statement.lstrip().split(None, 1)[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+    assert writes == []
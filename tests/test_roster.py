@@ -0,0 +1,24 @@
+"""
+Roster Version Tests
+"""
+from conftest import FIRST_STUDENT_ID
+from extensions import db
+from models import RosterVersion, User
+from routes.roster import roster_version
+
+
+def test_edits_bump_department_versions(app):
+    with app.app_context():
+        db.session.query(RosterVersion).delete()
+        db.session.commit()
+
+        db.session.get(User, FIRST_STUDENT_ID + 1).name = 'RENAMED'
+        db.session.commit()
+        db.session.get(User, FIRST_STUDENT_ID + 1).name = 'RENAMED AGAIN'
+        db.session.commit()
+        assert (roster_version(1), roster_version(2)) == (2, 0)
+
+        # A move changes both rosters
+        db.session.get(User, FIRST_STUDENT_ID + 1).dept_id = 2
+        db.session.commit()
+        assert (roster_version(1), roster_version(2)) == (3, 1)
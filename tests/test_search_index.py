@@ -0,0 +1,91 @@
+"""
+Search Index Tests
+"""
+import threading
+
+import pytest
+
+from conftest import FIRST_STUDENT_ID, login
+from extensions import db
+from models import User
+from routes import search_index
+from routes.search_index import StudentSearchIndex, get_refresher, get_search_index
+
+
+@pytest.fixture
+def held_builds(monkeypatch):
+    """Make full builds wait until the returned event is set; counts them in event.builds"""
+    release = threading.Event()
+    release.builds = 0
+    refresh = StudentSearchIndex.refresh
+
+    def held_refresh(index, full=False):
+        if full:
+            release.builds += 1
+            release.wait(10)
+        return refresh(index, full)
+
+    monkeypatch.setattr(search_index.StudentSearchIndex, 'refresh', held_refresh)
+    return release
+
+
+def test_first_search_does_not_wait_for_build(app, held_builds):
+    client = app.test_client()
+    login(client)
+
+    # Served by the SQL predicates while the index builds
+    response = client.get('/admin/students?search=STUDENT%203')
+    assert response.status_code == 200
+    assert b'STUDENT 3' in response.data
+
+    with app.app_context():
+        refresher = get_refresher()
+        assert get_search_index() is None
+
+        held_builds.set()
+        refresher.thread.join(10)
+        index = get_search_index()
+        assert index is not None
+        assert index.search('STUDENT 3', dept_id=1)[0]
+
+
+def test_rebuild_serves_old_index_until_swap(app, held_builds):
+    held_builds.set()
+    with app.app_context():
+        refresher = get_refresher()
+        get_search_index()
+        refresher.thread.join(10)
+        old = get_search_index()
+
+        held_builds.clear()
+        old.built_at -= app.config['SEARCH_INDEX_REBUILD'] + 1
+        for _ in range(3):
+            assert get_search_index() is old
+
+        held_builds.set()
+        refresher.thread.join(10)
+        assert held_builds.builds == 2
+        new = get_search_index()
+        assert new is not old
+        assert len(new) == len(old)
+
+
+def test_index_follows_commits_not_rollbacks(app, held_builds):
+    held_builds.set()
+    with app.app_context():
+        refresher = get_refresher()
+        get_search_index()
+        refresher.thread.join(10)
+        index = get_search_index()
+
+        student = db.session.get(User, FIRST_STUDENT_ID + 1)
+        student.name = 'ZEBULON'
+        db.session.flush()
+        assert not index.search('ZEBULON', dept_id=1)[0]
+        db.session.rollback()
+        assert not index.search('ZEBULON', dept_id=1)[0]
+        assert index.search('STUDENT 1', dept_id=1)[0][0] == FIRST_STUDENT_ID + 1
+
+        db.session.get(User, FIRST_STUDENT_ID + 1).name = 'ZEBULON'
+        db.session.commit()
+        assert index.search('ZEBULON', dept_id=1)[0] == [FIRST_STUDENT_ID + 1]
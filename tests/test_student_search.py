@@ -0,0 +1,22 @@
+"""
+Student Search Tests
+"""
+from conftest import FIRST_STUDENT_ID, login
+
+
+def test_numeric_search_matches_id_prefix(app):
+    client = app.test_client()
+    login(client)
+
+    response = client.get(f'/admin/students?search={str(FIRST_STUDENT_ID)[:8]}')
+    assert response.status_code == 200
+    assert f'{FIRST_STUDENT_ID + 1}'.encode() in response.data
+
+
+def test_oversized_numeric_search(app):
+    client = app.test_client()
+    login(client)
+
+    response = client.get('/admin/students?search=999999999999999999999999')
+    assert response.status_code == 200
+    assert f'{FIRST_STUDENT_ID + 1}'.encode() not in response.data